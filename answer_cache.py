@@ -0,0 +1,319 @@
+"""
+Final-answer cache for questions that differ only in wording.
+
+"I have AAB in Maths, Physics and Chemistry, what engineering courses?" is
+asked many ways, and every one used to run the whole ReAct loop. Each
+question is reduced to a student profile (degree subject, A-level tariff
+points, entry year, fee status, the subjects the student holds and the
+universities it names) and a TF-IDF vector of its remaining words. A cached
+answer is reused only when the profile matches exactly and the cosine
+similarity of the wording reaches SIMILARITY_THRESHOLD, so the same wording
+with different grades, different A-level subjects, a different year or
+different universities still reaches the model.
+
+Entries live in memory with a TTL and LRU eviction, bucketed by profile so a
+lookup only scores questions about the same student. Questions that name no
+subject (follow-ups such as "what about Bristol?") are never cached or
+served. save() and load() keep the cache across runs as JSON.
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from prefetch import SUBJECT_ALIASES, SUBJECTS, predict_grades, predict_subject
+from tariffs import TARIFFS
+
+DEFAULT_ANSWER_CACHE_PATH = "answer_cache.json"
+# Cosine similarity of the question wording needed for a hit
+SIMILARITY_THRESHOLD = 0.75
+# Course requirements change every cycle; a week keeps answers current
+DEFAULT_TTL = 7 * 24 * 3600.0
+DEFAULT_MAX_ENTRIES = 2000
+
+# Filler that varies between phrasings without changing the request
+STOPWORDS = frozenset(
+    "a about am an and any are as at be but by can could do does for from get "
+    "good got grade grades have having i i'm if im in into is it look looking me my of on or "
+    "please should so some suitable that the their them then there these they "
+    "this to want was we what which with would you your".split()
+)
+# School subjects that are not also degree subjects in prefetch.SUBJECTS
+HELD_SUBJECTS = (
+    "Art", "Business", "Design and Technology", "Drama", "French",
+    "Further Mathematics", "German", "Media Studies", "Physical Education",
+    "Religious Studies", "Spanish", "Statistics",
+)
+HELD_SUBJECT_ALIASES = {"further maths": "Further Mathematics", "pe": "Physical Education"}
+# Degree and held subjects are both part of the profile, so subject names
+# are left out of the wording
+SUBJECT_WORDS = frozenset(
+    word
+    for name in SUBJECTS + HELD_SUBJECTS + tuple(SUBJECT_ALIASES) + tuple(HELD_SUBJECT_ALIASES)
+    for word in name.lower().split()
+)
+# Words used interchangeably for the same thing
+SYNONYMS = {
+    "course": "course", "courses": "course", "degree": "course",
+    "degrees": "course", "option": "course", "options": "course",
+    "programme": "course", "programmes": "course", "uni": "university",
+    "unis": "university", "universities": "university",
+}
+_held_names = {name.lower(): name for name in SUBJECTS + HELD_SUBJECTS}
+_held_names.update(SUBJECT_ALIASES)
+_held_names.update(HELD_SUBJECT_ALIASES)
+_held_subject_re = re.compile(
+    r"\b("
+    + "|".join(re.escape(name) for name in sorted(_held_names, key=len, reverse=True))
+    + r")\b",
+    re.IGNORECASE,
+)
+# Capitalised words that are not institution names
+NOT_INSTITUTIONS = frozenset(
+    "btec epq gcse gcses hello hi ib ok thanks uk ucas".split()
+)
+# Generic parts of an institution's name: "University of Leeds" is "Leeds"
+INSTITUTION_FILLER = frozenset("college of the uni universities university".split())
+_word_re = re.compile(r"[a-z][a-z']+")
+_proper_word_re = re.compile(r"\b(?:[A-Z][a-z]+|[A-Z]{2,5})\b")
+_offer_re = re.compile(r"(?<![\w*])(?:A\*|[A-E]){2,5}(?![\w*])")
+# "A A B" or "A*, A, B" written out grade by grade
+_spaced_offer_re = re.compile(r"(?<![\w*])(?:A\*|[A-E])(?:[ ,]+(?:A\*|[A-E])){2,3}(?![\w*])")
+_year_re = re.compile(r"\b(20[2-3]\d)\b")
+# "Maths A, Physics A*" style grades, when there is no offer string
+_subject_grade_re = re.compile(r"\b[A-Z][a-z]+\s*(?:\(\s*)?(A\*|[A-E])\b(?!\*)")
+_points_re = re.compile(r"\b(\d{2,3})\s*(?:ucas\s*)?(?:tariff\s*)?points\b", re.IGNORECASE)
+_fee_status_patterns = (
+    ("international", re.compile(r"\b(?:international|overseas|visa|non[- ]uk)\b", re.IGNORECASE)),
+    ("eu", re.compile(r"\b(?:eu|european)\b", re.IGNORECASE)),
+    ("home", re.compile(r"\bhome(?:[- ]fee| student| status)?\b|\buk student\b", re.IGNORECASE)),
+)
+
+
+def held_subjects(question, subject=None):
+    """Sorted names of the subjects a question mentions, less one mention of
+    the degree subject"""
+    named = Counter(_held_names[m.lower()] for m in _held_subject_re.findall(question))
+    if subject is not None:
+        named[subject] -= 1
+    return tuple(sorted(name for name, count in named.items() if count > 0))
+
+
+def institutions(question):
+    """Sorted, normalised names of the universities a question mentions.
+
+    Any capitalised word that is not a subject, a grade, a qualification or
+    filler counts, so "Leeds", "University of Leeds" and "Leeds Uni" are all
+    "leeds", and an unknown proper noun makes the profile more specific
+    rather than being ignored.
+    """
+    names = set()
+    for word in _proper_word_re.findall(question):
+        lowered = word.lower()
+        if (
+            lowered in STOPWORDS
+            or lowered in SUBJECT_WORDS
+            or lowered in NOT_INSTITUTIONS
+            or lowered in INSTITUTION_FILLER
+            or _offer_re.fullmatch(word)
+        ):
+            continue
+        names.add(lowered)
+    return tuple(sorted(names))
+
+
+def extract_profile(question):
+    """(subject, points, year, fee_status, held subjects, universities) for a
+    question; any of the first four may be None"""
+    question = _spaced_offer_re.sub(lambda m: re.sub(r"[ ,]", "", m.group(0)), question)
+    subject = predict_subject(question)
+    grades = predict_grades(question)
+    if grades is None:
+        found = _subject_grade_re.findall(question)
+        grades = "".join(found) if len(found) >= 2 else None
+    if grades is not None:
+        points = sum(TARIFFS["A-level"][g] for g in re.findall(r"A\*|[A-E]", grades))
+    else:
+        number = _points_re.search(question)
+        points = int(number.group(1)) if number else None
+    year = _year_re.search(question)
+    fee_status = next(
+        (status for status, pattern in _fee_status_patterns if pattern.search(question)),
+        None,
+    )
+    return (
+        subject,
+        points,
+        year.group(1) if year else None,
+        fee_status,
+        held_subjects(question, subject),
+        institutions(question),
+    )
+
+
+def _stem(word):
+    """Crude suffix stripping so "accepting" and "accept" count as one word"""
+    if word in SYNONYMS:
+        return SYNONYMS[word]
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4 and not word.endswith("ss"):
+            return word[: -len(suffix)]
+    return word
+
+
+def question_terms(question):
+    """Word counts of a question without stopwords, subjects, grades or numbers"""
+    text = _offer_re.sub(" ", _spaced_offer_re.sub(" ", question)).lower()
+    return Counter(
+        _stem(word)
+        for word in _word_re.findall(text)
+        if word not in STOPWORDS and word not in SUBJECT_WORDS
+    )
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "profile", "terms", "created")
+
+    def __init__(self, question, answer, profile, terms, created):
+        self.question = question
+        self.answer = answer
+        self.profile = profile
+        self.terms = terms
+        self.created = created
+
+
+class AnswerCache:
+    """Final answers keyed by student profile and TF-IDF question similarity"""
+
+    def __init__(
+        self,
+        threshold=SIMILARITY_THRESHOLD,
+        ttl=DEFAULT_TTL,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        clock=time.time,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        # id -> _Entry, least recently used first
+        self._entries = OrderedDict()
+        # profile -> ids of entries with that profile
+        self._by_profile = {}
+        # term -> number of cached questions containing it
+        self._document_frequency = Counter()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _idf(self, term):
+        # Smoothed so a term in every cached question still counts a little
+        return math.log((1 + len(self._entries)) / (1 + self._document_frequency[term])) + 1
+
+    def _vector(self, terms):
+        vector = {term: count * self._idf(term) for term, count in terms.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return vector, norm
+
+    def _similarity(self, query_vector, query_norm, terms):
+        vector, norm = self._vector(terms)
+        if not norm or not query_norm:
+            return 0.0
+        dot = sum(value * vector.get(term, 0.0) for term, value in query_vector.items())
+        return dot / (query_norm * norm)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_profile[entry.profile]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_profile[entry.profile]
+        self._document_frequency.subtract(entry.terms.keys())
+
+    def lookup(self, question):
+        """The cached answer for a question like this one, or None"""
+        profile = extract_profile(question)
+        if profile[0] is None:
+            return None
+        terms = question_terms(question)
+        now = self.clock()
+        with self._lock:
+            best_id, best_score = None, 0.0
+            query_vector, query_norm = self._vector(terms)
+            for entry_id in list(self._by_profile.get(profile, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                score = self._similarity(query_vector, query_norm, entry.terms)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].answer
+
+    def store(self, question, answer, created=None):
+        """Cache a final answer; questions without a subject are ignored"""
+        profile = extract_profile(question)
+        if profile[0] is None or not answer:
+            return False
+        terms = question_terms(question)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(
+                question, answer, profile, terms, self.clock() if created is None else created
+            )
+            self._by_profile.setdefault(profile, set()).add(entry_id)
+            self._document_frequency.update(terms.keys())
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def save(self, path=DEFAULT_ANSWER_CACHE_PATH):
+        """Write the unexpired entries, least recently used first, atomically"""
+        now = self.clock()
+        with self._lock:
+            records = [
+                {"question": e.question, "answer": e.answer, "created": e.created}
+                for e in self._entries.values()
+                if now - e.created <= self.ttl
+            ]
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"entries": records}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path=DEFAULT_ANSWER_CACHE_PATH, **kwargs):
+        """A cache holding the entries saved at path (empty if there is no file)"""
+        cache = cls(**kwargs)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)["entries"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return cache
+        for record in records:
+            cache.store(record["question"], record["answer"], created=record["created"])
+        return cache
@@ -0,0 +1,179 @@
+"""
+Asyncio counterpart of the ReAct agent in main.py.
+
+AsyncAgent talks to OpenRouter through AsyncOpenAI so many conversations can
+share one event loop. It honours the same cascade, max_tokens and native tool
+options as main.Agent. A turn's actions go through the same main.run_actions()
+as the synchronous loop, on a worker thread so they never block the loop.
+"""
+
+import asyncio
+import os
+import time
+
+import main
+import resilience
+import telemetry
+from connections import openai_async_http_client, request_timeout
+
+# Global async OpenRouter client
+async_client = None
+
+
+def load_async_client():
+    """Initialise the async OpenRouter client (and the shared Tavily client)"""
+    global async_client
+    main.load_dotenv_and_init_client()
+    from openai import AsyncOpenAI
+
+    # Retries are handled by the resilience layer, not the SDK
+    async_client = AsyncOpenAI(
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        base_url=os.getenv("OPENROUTER_BASE_URL", main.OPENROUTER_BASE_URL),
+        max_retries=0,
+        http_client=openai_async_http_client(),
+    )
+
+
+class AsyncAgent(main.Agent):
+    # Call the agent with a message
+    async def __call__(self, message):
+        self.messages.append({"role": "user", "content": message})
+        result = await self.execute()
+        self.messages.append({"role": "assistant", "content": result})
+        return result
+
+    # Execute the agent
+    async def execute(self, tools=None):
+        """Reply text, or with tools a dict of "content" and "tool_calls" """
+        if self.cascade is None:
+            return await self._execute_route(None, tools)
+        reply = await self._execute_route("fast", tools)
+        reason = main.escalation_reason(reply)
+        if reason is None:
+            return reply
+        self.cascade.escalated(reason)
+        return await self._execute_route("strong", tools)
+
+    async def _execute_route(self, route, tools=None):
+        model, fallback_models, max_tokens = self.route(route)
+        key, cached = self.cached_completion(tools, model)
+        if cached is not None:
+            return cached
+        if async_client is None:
+            raise Exception(
+                "Async OpenRouter client not initialised. Call load_async_client() first."
+            )
+        attributes = {"route": route} if route else {}
+        with telemetry.span("llm", model=model, **attributes) as llm_span:
+            started = time.perf_counter()
+            # Shares the synchronous agents' rate limit, backoff and deadline
+            extra = {"tools": tools} if tools else {}
+            if max_tokens:
+                extra["max_tokens"] = max_tokens
+            completion = await resilience.openrouter.call_async(
+                lambda model, timeout: self.create_completion_async(model, timeout, **extra),
+                variants=[model] + fallback_models,
+            )
+            llm_span.set("ttft_seconds", time.perf_counter() - started)
+            telemetry.record_usage(completion)
+        if route:
+            self.cascade.record(
+                route, time.perf_counter() - started, getattr(completion, "usage", None)
+            )
+        message = completion.choices[0].message
+        content = message.content if not tools else main.tool_reply(message)
+        if key is not None:
+            self.completion_cache.store(key, model, content)
+        return content
+
+    # One turn with native tool calling
+    async def call_tools(self, message=None):
+        """Async main.Agent.call_tools: returns (text, calls)"""
+        if message is not None:
+            self.messages.append({"role": "user", "content": message})
+        try:
+            reply = await self.execute(tools=main.action_tools())
+        except Exception as error:
+            if not main.tools_unsupported(error):
+                raise
+            self.use_tools = False
+            self.drop_tool_note()
+            reply = {"content": await self.execute(), "tool_calls": []}
+        text = reply["content"] or ""
+        assistant = {"role": "assistant", "content": text}
+        if reply["tool_calls"]:
+            assistant["tool_calls"] = reply["tool_calls"]
+        self.messages.append(assistant)
+        return text, [main.parse_tool_call(call) for call in reply["tool_calls"]]
+
+    async def create_completion_async(self, model, timeout, **kwargs):
+        return await async_client.chat.completions.create(
+            model=model,
+            temperature=main.TEMPERATURE,
+            messages=self.request_messages(model),
+            timeout=request_timeout(timeout),
+            **kwargs,
+        )
+
+
+async def async_query(
+    question, agent, max_turns=5, verbose=True, route=False, answer_cache=None
+):
+    """Async version of main.query; returns the final answer text or None"""
+    log = print if verbose else (lambda *args, **kwargs: None)
+    log(f"Question: {question}\n")
+    with telemetry.span("query"):
+        if route:
+            answer = main.answer_locally(question, agent, log)
+            if answer is not None:
+                return answer
+        if answer_cache is not None:
+            answer = main.answer_from_cache(question, agent, answer_cache, log)
+            if answer is not None:
+                return answer
+        answer = await _react_loop(question, agent, max_turns, log)
+        if answer is not None and answer_cache is not None:
+            answer_cache.store(question, answer)
+        return answer
+
+
+async def _react_loop(question, agent, max_turns, log):
+    """The turns of async_query(); returns the answer or None"""
+    next_prompt = question
+    for i in range(max_turns):
+        with telemetry.span("turn", turn=i + 1):
+            if getattr(agent, "use_tools", False):
+                result, calls = await agent.call_tools(next_prompt)
+                log(f"--- Turn {i + 1} ---")
+                log(result)
+                if calls:
+                    await asyncio.to_thread(main.run_tool_calls, agent, calls, None, log)
+                    next_prompt = None
+                    continue
+                if result and not main.parse_actions(result):
+                    answer = result.split("Answer:", 1)[-1].strip()
+                    log(f"\nFinal Answer: {answer}")
+                    return answer
+            else:
+                result = await agent(next_prompt)
+                log(f"--- Turn {i + 1} ---")
+                log(result)
+            actions = [m.groups() for m in main.parse_actions(result)]
+            if actions:
+                actions = actions[: main.MAX_ACTIONS_PER_TURN]
+                for action, action_input in actions:
+                    log(f"Action: {action}('{action_input}')")
+                observations = await asyncio.to_thread(main.run_actions, actions)
+                observation = main.merge_observations(actions, observations)
+                log(f"Observation: {observation}\n")
+                next_prompt = f"Observation: {observation}"
+            else:
+                if result.startswith("Answer:"):
+                    answer = result.split("Answer: ", 1)[1]
+                    log(f"\nFinal Answer: {answer}")
+                    return answer
+                log("No action taken and no clear answer. Stopping.")
+                return None
+    log("Max turns reached.")
+    return None
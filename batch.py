@@ -0,0 +1,224 @@
+"""
+Batch advising over a JSONL file of student questions.
+
+Each input line is a JSON object with a "question" and optionally an "id".
+Lines without an id get "line-<number>", so they never collide with an
+explicit numeric id, and a line that is not valid JSON or has no question
+gets an error record while the rest of the batch carries on. Every question
+runs through its own Agent on a bounded worker pool, with one rate limit
+shared by all workers (the OpenRouter limiter in resilience.py). Results are
+appended to the output JSONL as they finish, and the output doubles as the
+checkpoint: re-running the same command skips every id that already has an
+answer, so a run that dies halfway resumes where it stopped.
+
+Run with: python batch.py questions.jsonl results.jsonl --workers 8 --rate 2
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import resilience
+from answer_cache import AnswerCache
+from cascade import ModelCascade
+from llm_cache import DEFAULT_CACHE_DIR, MODES, CompletionCache
+from main import Agent, load_dotenv_and_init_client, prompt, query
+
+
+class BatchAgent(Agent):
+    """Agent that keeps no history on disk; results go to the batch output"""
+
+    def save_history(self, filename=None):
+        pass
+
+
+def read_questions(path):
+    """Yield (id, question, error) from a JSONL file without loading it all.
+
+    error is None for a usable line; otherwise question is None and error
+    says what was wrong with the line.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            fallback_id = f"line-{line_number}"
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield fallback_id, None, f"Invalid JSON on line {line_number}: {e}"
+                continue
+            if not isinstance(item, dict):
+                yield fallback_id, None, f"Line {line_number} is not a JSON object"
+                continue
+            item_id = str(item["id"]) if "id" in item else fallback_id
+            question = item.get("question")
+            if not isinstance(question, str) or not question.strip():
+                yield item_id, None, f"Line {line_number} has no question"
+                continue
+            yield item_id, question, None
+
+
+def completed_ids(path):
+    """Ids that already have an answer in the output (the checkpoint)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final line from an interrupted run
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def _ends_mid_line(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def advise(item_id, question, agent_factory, max_turns, answer_cache=None):
+    """Run one question through a fresh agent and build its output record"""
+    started = time.perf_counter()
+    record = {"id": item_id, "question": question}
+    try:
+        record["answer"] = query(
+            question,
+            agent_factory(),
+            max_turns=max_turns,
+            verbose=False,
+            route=True,
+            answer_cache=answer_cache,
+        )
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(
+    input_path,
+    output_path,
+    agent_factory,
+    workers=4,
+    max_turns=5,
+    progress=print,
+    answer_cache=None,
+):
+    """Advise every unanswered question in input_path; returns counts"""
+    done = completed_ids(output_path)
+    counts = {"skipped": 0, "answered": 0, "failed": 0}
+    # Keep the pool fed without reading the whole input into memory
+    max_in_flight = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(
+        output_path, "a", encoding="utf-8"
+    ) as out:
+        if _ends_mid_line(output_path):
+            out.write("\n")
+
+        def drain(pending, return_when):
+            finished, pending = wait(pending, return_when=return_when)
+            for future in finished:
+                write(future.result())
+            return pending
+
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            counts["failed" if "error" in record else "answered"] += 1
+            progress(f"[{record['id']}] done in {record['seconds']}s")
+
+        pending = set()
+        for item_id, question, error in read_questions(input_path):
+            if item_id in done:
+                counts["skipped"] += 1
+                continue
+            if error is not None:
+                write({"id": item_id, "question": question, "error": error, "seconds": 0.0})
+                continue
+            pending.add(
+                pool.submit(
+                    advise, item_id, question, agent_factory, max_turns, answer_cache
+                )
+            )
+            if len(pending) >= max_in_flight:
+                pending = drain(pending, FIRST_COMPLETED)
+        if pending:
+            drain(pending, ALL_COMPLETED)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch university advising")
+    parser.add_argument("input", help="JSONL file of {\"id\", \"question\"} objects")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=1.0, help="Model calls per second, all workers"
+    )
+    parser.add_argument("--max-turns", type=int, default=5)
+    parser.add_argument("--model", default="google/gemma-3n-e4b-it:free")
+    parser.add_argument(
+        "--llm-cache",
+        choices=MODES,
+        help="Record model replies to --llm-cache-dir, or replay them offline",
+    )
+    parser.add_argument("--llm-cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        "--tools", action="store_true", help="Use native tool calling where supported"
+    )
+    parser.add_argument(
+        "--strong-model",
+        help="Send final answers to this model; --model keeps the action turns",
+    )
+    parser.add_argument(
+        "--answer-cache",
+        help="JSON file of past answers; reworded repeats of a question reuse them",
+    )
+    args = parser.parse_args()
+
+    load_dotenv_and_init_client()
+    resilience.openrouter.limiter = resilience.TokenBucket(args.rate, args.workers)
+    # One cache shared by every worker; writes are atomic per file
+    cache = None
+    if args.llm_cache:
+        cache = CompletionCache(args.llm_cache_dir, mode=args.llm_cache)
+    answers = AnswerCache.load(args.answer_cache) if args.answer_cache else None
+    # One cascade for every worker, so its usage totals cover the whole run
+    cascade = ModelCascade(args.model, args.strong_model) if args.strong_model else None
+    counts = run_batch(
+        args.input,
+        args.output,
+        lambda: BatchAgent(
+            prompt,
+            model=args.model,
+            completion_cache=cache,
+            use_tools=args.tools,
+            cascade=cascade,
+        ),
+        workers=args.workers,
+        max_turns=args.max_turns,
+        answer_cache=answers,
+    )
+    if answers is not None:
+        answers.save(args.answer_cache)
+    print(
+        f"Answered {counts['answered']}, failed {counts['failed']}, "
+        f"skipped {counts['skipped']} already completed."
+    )
+    if cascade is not None:
+        print(json.dumps(cascade.stats(), indent=2))
@@ -0,0 +1,336 @@
+"""
+Micro-benchmarks with regression gating for the code that runs on every turn.
+
+Each benchmark is timed on synthetic inputs of growing size and its peak
+allocation is measured with tracemalloc. Timings are divided by a fixed
+calibration workload so baselines recorded on one machine remain comparable
+on another. Baselines live in bench_baseline.json; the run exits non-zero
+when any case regresses past the thresholds.
+
+Run with:
+  python bench.py                 # compare against the stored baseline
+  python bench.py --update        # record a new baseline
+  python bench.py -k calculate    # only benchmarks whose name contains "calculate"
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json"
+)
+# Allowed slowdown and extra peak memory relative to the baseline; shared CI
+# machines routinely jitter by 50%, so time only fails at twice the baseline
+TIME_THRESHOLD = 1.0
+MEMORY_THRESHOLD = 0.25
+# Memory differences below this are noise from the interpreter itself
+MEMORY_SLACK_BYTES = 8192
+# Absolute ceilings in seconds, checked on top of the relative baseline
+BUDGETS = {
+    # A fresh interpreter importing main, as the CLI and every test run do
+    "import_main[1]": 0.5,
+}
+
+# name -> (setup, sizes, number); setup(size) returns a zero-argument callable
+# to time, and number fixes the calls per timing run (None picks it for us)
+BENCHMARKS = {}
+
+
+def benchmark(name, sizes, number=None):
+    def register(setup):
+        BENCHMARKS[name] = (setup, sizes, number)
+        return setup
+
+    return register
+
+
+@benchmark("import_main", sizes=[1], number=3)
+def bench_import_main(size):
+    command = [sys.executable, "-c", "import main"]
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.run(command, cwd=directory, check=True)
+
+
+@benchmark("safe_calculate_deep", sizes=[10, 100, 250])
+def bench_safe_calculate(size):
+    from main import safe_calculate
+
+    expression = "(" * size + "48" + " + 40)" * size
+    return lambda: safe_calculate(expression)
+
+
+@benchmark("safe_calculate_deep_uncached", sizes=[10, 100, 250])
+def bench_safe_calculate_uncached(size):
+    from calculator import compile_expression
+    from main import safe_calculate
+
+    expression = "(" * size + "48" + " + 40)" * size
+
+    def run():
+        compile_expression.cache_clear()
+        safe_calculate(expression)
+
+    return run
+
+
+@benchmark("safe_calculate_long", sizes=[10, 50, 100])
+def bench_safe_calculate_long(size):
+    from main import safe_calculate
+
+    expression = " + ".join(["48 * 2 - 40 / 4"] * size)
+    return lambda: safe_calculate(expression)
+
+
+@benchmark("is_question", sizes=[1, 10, 100])
+def bench_is_question(size):
+    from main import is_question
+
+    statement = "I would like help with my personal statement " * size
+    return lambda: is_question(statement)
+
+
+@benchmark("route", sizes=[1, 10, 100])
+def bench_route(size):
+    from router import route
+
+    question = "Which universities offer Computer Science for my predicted grades? " * size
+    return lambda: route(question)
+
+
+@benchmark("get_ucas_points", sizes=[1, 100, 1000])
+def bench_get_ucas_points(size):
+    from main import get_ucas_points
+
+    grades = (["A*", "A", "B", "C", "D", "E"] * size)[:size]
+
+    def run():
+        for grade in grades:
+            get_ucas_points(grade)
+
+    return run
+
+
+@benchmark("calculate_ucas_total", sizes=[3, 30, 300])
+def bench_calculate_ucas_total(size):
+    from main import calculate_ucas_total
+
+    subjects = ["Maths A*", "Physics A", "Chemistry B", "English C"]
+    grades = ", ".join((subjects * size)[:size])
+    return lambda: calculate_ucas_total(grades)
+
+
+@benchmark("score_cohort", sizes=[1000, 10000, 100000])
+def bench_score_cohort(size):
+    from tariffs import score_cohort
+
+    applicants = [i // 4 for i in range(size)]
+    qualifications = (["A-level", "A-level", "A-level", "AS-level", "BTEC"] * size)[:size]
+    grades = (["A*", "A", "B", "C", "D", "E", "M", "P"] * size)[:size]
+    return lambda: score_cohort(applicants, qualifications, grades)
+
+
+@benchmark("catalogue_lookup", sizes=[1, 10, 100])
+def bench_catalogue_lookup(size):
+    from catalogue import CourseCatalogue
+
+    catalogue = CourseCatalogue.load()
+    queries = ["Computer Science 120 points", "Economics AAB", "Engineering 144"] * size
+    queries = queries[:size]
+
+    def run():
+        for query in queries:
+            catalogue.lookup(query)
+
+    return run
+
+
+@benchmark("parse_actions", sizes=[5, 50, 500])
+def bench_parse_actions(size):
+    from main import parse_actions
+
+    reply = "\n".join(
+        ["Thought: I should check the entry requirements for this course."] * size
+        + ['Action: search: "Computer Science entry requirements 2026"', "PAUSE"]
+    )
+    return lambda: parse_actions(reply)
+
+
+@benchmark("save_history_json", sizes=[10, 100, 1000])
+def bench_save_history_json(size):
+    from main import Agent
+
+    agent = Agent("system prompt")
+    agent.messages.extend(
+        {"role": "user", "content": f"Observation: result {i} " * 20}
+        for i in range(size)
+    )
+    path = os.path.join(_scratch_dir(), "history.json")
+    return lambda: agent.save_history(path)
+
+
+@benchmark("save_history_journal", sizes=[10, 100, 1000], number=500)
+def bench_save_history_journal(size):
+    from history_store import HistoryJournal
+    from main import Agent
+
+    journal = HistoryJournal(f"bench-{size}", directory=_scratch_dir())
+    agent = Agent("system prompt", history=journal)
+    agent.messages.extend(
+        {"role": "user", "content": f"Observation: result {i} " * 20}
+        for i in range(size)
+    )
+    agent.save_history()
+    journal.flush()
+
+    # Each timed call appends one turn, as query() does, and waits for the
+    # background write so writer-thread contention cannot skew the timing
+    def run():
+        agent.messages.append({"role": "assistant", "content": "Answer: ok"})
+        agent.save_history()
+        journal.flush()
+
+    return run
+
+
+_scratch = None
+
+
+def _scratch_dir():
+    global _scratch
+    if _scratch is None:
+        _scratch = tempfile.mkdtemp(prefix="advisor-bench-")
+    return _scratch
+
+
+def calibrate():
+    """Seconds for a fixed pure-Python workload, used to normalise timings"""
+
+    def workload():
+        total = 0
+        for i in range(2000):
+            total += i % 7
+        return total
+
+    return min(timeit.repeat(workload, number=100, repeat=30)) / 100
+
+
+def measure(fn, number=None, repeat=5):
+    """Best per-call time in seconds and peak traced allocation in bytes"""
+    timer = timeit.Timer(fn)
+    if number is None:
+        number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(selected=None):
+    """Run the registered benchmarks; returns {case: measurements}"""
+    calibration = calibrate()
+    measured = []
+    for name, (setup, sizes, number) in BENCHMARKS.items():
+        if selected and selected not in name:
+            continue
+        for size in sizes:
+            seconds, peak = measure(setup(size), number)
+            measured.append((f"{name}[{size}]", seconds, peak))
+    # Calibrate again afterwards and keep the quieter of the two readings
+    calibration = min(calibration, calibrate())
+    return {
+        case: {
+            "relative": seconds / calibration,
+            "seconds": seconds,
+            "peak_bytes": peak,
+        }
+        for case, seconds, peak in measured
+    }
+
+
+def compare(
+    results,
+    baseline,
+    time_threshold=TIME_THRESHOLD,
+    memory_threshold=MEMORY_THRESHOLD,
+    budgets=BUDGETS,
+):
+    """Return a list of human-readable regressions against the baseline"""
+    regressions = []
+    for case, result in results.items():
+        budget = budgets.get(case)
+        if budget is not None and result["seconds"] > budget:
+            regressions.append(
+                f"{case}: {result['seconds']:.3f}s is over its {budget}s budget"
+            )
+        base = baseline.get(case)
+        if base is None:
+            continue
+        allowed = base["relative"] * (1 + time_threshold)
+        if result["relative"] > allowed:
+            slowdown = result["relative"] / base["relative"]
+            regressions.append(f"{case}: {slowdown:.2f}x slower than baseline")
+        extra = result["peak_bytes"] - base["peak_bytes"]
+        limit = base["peak_bytes"] * (1 + memory_threshold)
+        if extra > MEMORY_SLACK_BYTES and result["peak_bytes"] > limit:
+            regressions.append(f"{case}: peak memory up {extra} bytes")
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot-path micro-benchmarks")
+    parser.add_argument("--update", action="store_true", help="Record a new baseline")
+    parser.add_argument("-k", dest="selected", help="Only run matching benchmarks")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD)
+    args = parser.parse_args()
+
+    try:
+        results = run_benchmarks(args.selected)
+    finally:
+        if _scratch is not None:
+            shutil.rmtree(_scratch, ignore_errors=True)
+    baseline = load_baseline()
+    for case, result in results.items():
+        base = baseline.get(case)
+        change = f"{result['relative'] / base['relative']:.2f}x" if base else "new"
+        print(
+            f"{case:32} {result['seconds'] * 1e6:10.2f} us  "
+            f"{result['peak_bytes']:8d} B  {change}"
+        )
+
+    if args.update:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        sys.exit(0)
+
+    regressions = compare(
+        results, baseline, args.time_threshold, args.memory_threshold
+    )
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions.")
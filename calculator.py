@@ -0,0 +1,135 @@
+"""
+Safe arithmetic for the calculate action.
+
+Expressions are tokenised once, compiled with a shunting-yard pass into a small
+postfix bytecode and memoised by their whitespace-free text, so repeated
+calculations skip parsing entirely. Evaluation is a single loop over the
+bytecode with an explicit stack; nothing is ever passed to eval(), and only
+numbers, + - * /, unary signs and parentheses are accepted.
+"""
+
+import re
+from functools import lru_cache
+
+MAX_EXPRESSION_LENGTH = 2000
+
+# Numbers may use grouping commas ("1,000") but only between 3-digit groups
+_number_pattern = r"\d{1,3}(?:,\d{3})+(?:\.\d*)?|\d+(?:\.\d*)?|\.\d+"
+_token_re = re.compile(rf"({_number_pattern})|([-+*/()])")
+_valid_re = re.compile(rf"(?:{_number_pattern}|[-+*/()])*")
+# Whitespace is dropped before compiling, so "3 4" must be caught first
+_split_number_re = re.compile(r"[\d.,]\s+[\d.]")
+
+# Binary operator precedence; unary signs bind tighter than * and /
+_precedence = {"+": 1, "-": 1, "*": 2, "/": 2, "neg": 3, "pos": 3}
+
+
+def tokenise(expression):
+    """Split whitespace-free expression text into floats and operator strings"""
+    # Every character must belong to a token; anything else is rejected
+    if not _valid_re.fullmatch(expression):
+        for position, character in enumerate(expression):
+            if not _token_re.match(expression, position):
+                raise ValueError(f"Unexpected character {character!r}")
+        raise ValueError("Malformed number")
+    return [
+        float(number.replace(",", "")) if number else operator
+        for number, operator in _token_re.findall(expression)
+    ]
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(normalised):
+    """Compile whitespace-free expression text to a postfix bytecode tuple"""
+    code = []
+    operators = []
+    # True where the next token must be an operand (start, after an operator or "(")
+    expect_operand = True
+    for token in tokenise(normalised):
+        if token.__class__ is float:
+            if not expect_operand:
+                raise ValueError("Missing operator between numbers")
+            code.append(token)
+            expect_operand = False
+        elif token == "(":
+            if not expect_operand:
+                raise ValueError("Missing operator before '('")
+            operators.append(token)
+        elif token == ")":
+            if expect_operand:
+                raise ValueError("Missing operand before ')'")
+            while operators and operators[-1] != "(":
+                code.append(operators.pop())
+            if not operators:
+                raise ValueError("Mismatched parentheses")
+            operators.pop()
+        elif expect_operand:
+            if token in "*/":
+                raise ValueError(f"Missing operand before '{token}'")
+            # Unary signs are right-associative, so nothing is popped for them
+            operators.append("neg" if token == "-" else "pos")
+        else:
+            precedence = _precedence[token]
+            while (
+                operators
+                and operators[-1] != "("
+                and _precedence[operators[-1]] >= precedence
+            ):
+                code.append(operators.pop())
+            operators.append(token)
+            expect_operand = True
+    if expect_operand:
+        raise ValueError("Expression is incomplete")
+    while operators:
+        operator = operators.pop()
+        if operator == "(":
+            raise ValueError("Mismatched parentheses")
+        code.append(operator)
+    return tuple(code)
+
+
+def run(code):
+    """Evaluate compiled bytecode"""
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for item in code:
+        if item.__class__ is float:
+            push(item)
+        elif item == "neg":
+            stack[-1] = -stack[-1]
+        elif item == "pos":
+            continue
+        else:
+            right = pop()
+            if item == "+":
+                stack[-1] += right
+            elif item == "-":
+                stack[-1] -= right
+            elif item == "*":
+                stack[-1] *= right
+            else:
+                if right == 0:
+                    raise ValueError("Division by zero")
+                stack[-1] /= right
+    return stack[0]
+
+
+def evaluate_expression(expression):
+    """Compile (or fetch the memoised compilation of) an expression and run it"""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError("Expression is too long")
+    if _split_number_re.search(expression):
+        raise ValueError("Missing operator between numbers")
+    normalised = "".join(expression.split())
+    if not normalised:
+        raise ValueError("Empty expression")
+    return run(compile_expression(normalised))
+
+
+def safe_calculate(expression):
+    """Safely evaluate mathematical expressions without using eval()"""
+    try:
+        return evaluate_expression(expression.strip())
+    except Exception as e:
+        return f"Error calculating: {str(e)}"
@@ -0,0 +1,83 @@
+"""
+Model cascade: a fast model for Thought/Action turns, a stronger one for answers.
+
+Most turns of the ReAct loop only pick the next action, which a small,
+low-latency model does well; the long, cited final answer is where a stronger
+model pays off. An Agent given a ModelCascade sends every turn to the fast
+route first, capped at fast_max_tokens. If that reply is a final Answer, or
+fails validation (no usable action and no answer, or an unknown action), the
+turn is redone on the strong route and the fast reply is dropped. When
+streaming, the fast stream is cut as soon as an "Answer:" line begins, before
+any of it is shown.
+
+Each route keeps its own model and fallbacks, so per-model request quirks
+(gemma's merged system prompt, cache_control markers) apply to whichever
+model serves the turn. Calls, latency and token use are totalled per route,
+and escalations per reason.
+"""
+
+import threading
+
+ROUTES = ("fast", "strong")
+# Thought/Action turns are short; an answer that hits this cap escalates anyway
+FAST_MAX_TOKENS = 512
+
+
+class Route:
+    def __init__(self, name, model, fallback_models=(), max_tokens=None):
+        self.name = name
+        self.model = model
+        self.fallback_models = list(fallback_models)
+        self.max_tokens = max_tokens
+
+
+class ModelCascade:
+    """Fast and strong routes plus per-route usage"""
+
+    def __init__(
+        self,
+        fast_model,
+        strong_model,
+        fast_fallbacks=(),
+        strong_fallbacks=(),
+        fast_max_tokens=FAST_MAX_TOKENS,
+    ):
+        self.routes = {
+            "fast": Route("fast", fast_model, fast_fallbacks, fast_max_tokens),
+            "strong": Route("strong", strong_model, strong_fallbacks),
+        }
+        self.usage = {
+            name: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+            for name in ROUTES
+        }
+        # reason -> count, e.g. {"answer": 3, "invalid": 1}
+        self.escalations = {}
+        self._lock = threading.Lock()
+
+    @property
+    def fast(self):
+        return self.routes["fast"]
+
+    @property
+    def strong(self):
+        return self.routes["strong"]
+
+    def record(self, route, seconds, usage=None):
+        """Add one call's latency and token counts to a route's totals"""
+        with self._lock:
+            totals = self.usage[route]
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            for key in ("prompt_tokens", "completion_tokens"):
+                totals[key] += getattr(usage, key, None) or 0
+
+    def escalated(self, reason):
+        with self._lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "routes": {name: dict(totals) for name, totals in self.usage.items()},
+                "escalations": dict(self.escalations),
+            }
@@ -0,0 +1,169 @@
+"""
+Local course catalogue behind the "lookup" action.
+
+Courses are loaded from a JSON data file into two indexes: an inverted index
+from keywords (course title, subject, university and extra keywords) to
+course ids, and a list of course ids sorted by tariff points. A lookup such
+as "Computer Science around 120 points" is a bisect over the tariff list
+intersected with the keyword postings, so it answers without a network call.
+
+Records may carry the date they were last checked against the course page.
+A query with no matches, a keyword the catalogue has never seen, or only
+stale matches returns None so the caller can fall back to a web search.
+Records without a date, and every record of a file marked "indicative" (such
+as the bundled sample), are reported as indicative rather than checked.
+"""
+
+import datetime
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+
+from tariffs import TARIFFS
+
+DEFAULT_CATALOGUE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "course_catalogue.json"
+)
+# Records older than this are treated as missing
+MAX_AGE_DAYS = 365
+# "~120 points" matches typical offers this many points either side
+TARIFF_TOLERANCE = 16
+MAX_RESULTS = 8
+
+# Words that describe the question rather than the course
+QUERY_STOPWORDS = frozenset(
+    "a about accepting accept an and are around at courses course degree degrees "
+    "entry for grades in near of offer offers on or points point requirements "
+    "the to tariff typical ucas uk university universities what which with "
+    "ba bsc beng meng msci hons".split()
+)
+
+_word_re = re.compile(r"[a-z0-9]+")
+_points_re = re.compile(r"\b(\d{2,3})\b")
+# A-level offers such as AAB or A*AA
+_offer_re = re.compile(r"(?<![\w*])((?:A\*|[A-E]){3})(?![\w*])")
+
+
+def offer_points(offer):
+    """Tariff points for an A-level offer string such as 'A*AA'"""
+    grades = re.findall(r"A\*|[A-E]", offer)
+    return sum(TARIFFS["A-level"][grade] for grade in grades)
+
+
+def keywords(text):
+    return [word for word in _word_re.findall(text.lower()) if word not in QUERY_STOPWORDS]
+
+
+class CourseCatalogue:
+    """Courses with a keyword inverted index and a sorted tariff index"""
+
+    def __init__(self, courses, max_age_days=MAX_AGE_DAYS, today=None, indicative=False):
+        self.courses = []
+        self.max_age_days = max_age_days
+        self.today = today
+        # Offers are approximate and were not checked against course pages
+        self.indicative = indicative
+        # keyword -> set of course ids
+        self.index = {}
+        for course in courses:
+            course = dict(course)
+            if "tariff" not in course:
+                course["tariff"] = offer_points(course["offer"])
+            course_id = len(self.courses)
+            self.courses.append(course)
+            text = " ".join(
+                [course["course"], course.get("subject", ""), course["university"]]
+                + course.get("keywords", [])
+            )
+            for word in keywords(text):
+                self.index.setdefault(word, set()).add(course_id)
+        # Parallel lists sorted by tariff, for bisecting a points range
+        by_tariff = sorted(range(len(self.courses)), key=lambda i: self.courses[i]["tariff"])
+        self.tariff_ids = by_tariff
+        self.tariffs = [self.courses[i]["tariff"] for i in by_tariff]
+
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOGUE_PATH, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        kwargs.setdefault("indicative", data.get("indicative", False))
+        return cls(data["courses"], **kwargs)
+
+    def in_tariff_range(self, low, high):
+        """Ids of courses whose tariff lies in [low, high]"""
+        start = bisect_left(self.tariffs, low)
+        end = bisect_right(self.tariffs, high)
+        return set(self.tariff_ids[start:end])
+
+    def is_checked(self, course):
+        return not self.indicative and "updated" in course
+
+    def is_stale(self, course):
+        if "updated" not in course:
+            return False
+        today = self.today or datetime.date.today()
+        updated = datetime.date.fromisoformat(course["updated"])
+        return (today - updated).days > self.max_age_days
+
+    def search(self, query):
+        """Matching course dicts (closest tariff first), or None for a gap"""
+        points = None
+        offer = _offer_re.search(query)
+        if offer:
+            points = offer_points(offer.group(1))
+            query = query[: offer.start()] + query[offer.end() :]
+        else:
+            number = _points_re.search(query)
+            if number:
+                points = int(number.group(1))
+                query = query[: number.start()] + query[number.end() :]
+
+        postings = []
+        for word in set(keywords(query)):
+            if word.isdigit():
+                continue
+            ids = self.index.get(word)
+            if ids is None:
+                # Asking about something the catalogue does not cover
+                return None
+            postings.append(ids)
+        if points is not None:
+            postings.append(
+                self.in_tariff_range(points - TARIFF_TOLERANCE, points + TARIFF_TOLERANCE)
+            )
+        if not postings:
+            return None
+        # Intersect from the smallest set so the work stays proportional to it
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for ids in postings[1:]:
+            matches &= ids
+        courses = [self.courses[i] for i in matches]
+        if not courses or any(self.is_stale(course) for course in courses):
+            return None
+        target = points if points is not None else 0
+        courses.sort(key=lambda c: (abs(c["tariff"] - target), -c["tariff"], c["university"]))
+        return courses[:MAX_RESULTS]
+
+    def lookup(self, query):
+        """Observation text for the matching courses, or None for a gap"""
+        courses = self.search(query)
+        if courses is None:
+            return None
+        if all(self.is_checked(course) for course in courses):
+            lines = ["Course catalogue matches (typical offers; verify on the official page):"]
+        else:
+            lines = [
+                "Course catalogue matches (indicative offers, not checked against "
+                "the course pages; confirm with a search before quoting them):"
+            ]
+        for course in courses:
+            checked = (
+                f" (checked {course['updated']})" if self.is_checked(course) else " (indicative)"
+            )
+            lines.append(
+                f"- {course['university']} — {course['course']}: typical offer "
+                f"{course['offer']} ({course['tariff']} points) — {course['url']}{checked}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,93 @@
+"""
+Shared pytest fixtures: a fake OpenRouter client for tests that drive Agent
+without the network
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+
+def completion(content=None, tool_calls=None, prompt_tokens=None, completion_tokens=None):
+    """A chat completion as the OpenAI SDK returns it"""
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    usage = None
+    if prompt_tokens is not None or completion_tokens is not None:
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens or 0, completion_tokens=completion_tokens or 0
+        )
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    """A streamed completion; records the pieces read and, optionally, events"""
+
+    def __init__(self, pieces, events=None):
+        self.pieces = [pieces] if isinstance(pieces, str) else list(pieces)
+        self.read = []
+        self.closed = False
+        self.events = events
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.read.append(piece)
+            if self.events is not None:
+                self.events.append(f"token:{piece!r}")
+            yield chunk(piece)
+
+    def close(self):
+        self.closed = True
+        if self.events is not None:
+            self.events.append("close")
+
+
+def fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class FakeOpenRouter:
+    """Replies to main.client requests from a script and records each request.
+
+    replies is a list served in order, or a dict of lists keyed by model. A
+    reply may be a completion, a FakeStream, a string (wrapped in a
+    completion) or an exception to raise.
+    """
+
+    completion = staticmethod(completion)
+    client = staticmethod(fake_client)
+    FakeStream = FakeStream
+
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.requests = []
+        self.replies = []
+
+    def serve(self, replies):
+        import main
+        import resilience
+
+        self.replies = replies
+        self.monkeypatch.setattr(resilience.openrouter, "limiter", None)
+        self.monkeypatch.setattr(main, "client", fake_client(self.create))
+        return self
+
+    def create(self, **kwargs):
+        # The SDK serialises messages at call time; later turns append to them
+        self.requests.append({**kwargs, "messages": list(kwargs["messages"])})
+        replies = self.replies
+        if isinstance(replies, dict):
+            replies = replies[kwargs["model"]]
+        reply = replies.pop(0)
+        if isinstance(reply, BaseException):
+            raise reply
+        return completion(reply) if isinstance(reply, str) else reply
+
+
+@pytest.fixture
+def openrouter(monkeypatch):
+    """FakeOpenRouter; call .serve(replies) to install it as main.client"""
+    return FakeOpenRouter(monkeypatch)
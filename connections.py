@@ -0,0 +1,162 @@
+"""
+Shared HTTP connection pools for the OpenRouter and Tavily clients, and a
+background warmer that keeps them hot while the student is typing.
+
+Both SDKs would otherwise open their own pools lazily, so the first model
+call of a session paid for DNS, TCP and TLS before any token came back, and
+keep-alive connections left idle at the input() prompt were dropped by the
+far end. Here the OpenAI client gets one tuned httpx pool (HTTP/2 when the h2
+package is installed) and Tavily a requests session with a sized adapter.
+Every request has separate connect and read timeouts. Warmer opens the
+connections as soon as the clients exist and pings them while the student
+is idle, so each question starts on a connection that is already open.
+
+httpx and requests are imported inside the functions that need them, so
+importing main stays cheap.
+"""
+
+import importlib.util
+import threading
+
+# A provider that cannot accept a connection in this long is treated as down
+CONNECT_TIMEOUT = 5.0
+# Reads default to the resilience layer's per-attempt timeout
+READ_TIMEOUT = 90.0
+WRITE_TIMEOUT = 10.0
+# Waiting for a free pooled connection
+POOL_TIMEOUT = 10.0
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+# Close pooled connections idle for longer than this
+KEEPALIVE_EXPIRY = 120.0
+# Idle ping interval; below the usual 60 s server-side keep-alive timeout
+PING_INTERVAL = 25.0
+
+
+def http2_available():
+    return importlib.util.find_spec("h2") is not None
+
+
+def request_timeout(seconds):
+    """httpx timeout reading for up to seconds, with a short connect phase"""
+    if seconds is None:
+        return None
+    import httpx
+
+    return httpx.Timeout(
+        seconds, connect=min(CONNECT_TIMEOUT, seconds), pool=min(POOL_TIMEOUT, seconds)
+    )
+
+
+def _httpx_options():
+    import httpx
+
+    return {
+        "http2": http2_available(),
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(
+            READ_TIMEOUT, connect=CONNECT_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT
+        ),
+    }
+
+
+def openai_http_client():
+    """Pooled httpx.Client to pass to OpenAI(http_client=...)"""
+    import httpx
+
+    return httpx.Client(**_httpx_options())
+
+
+def openai_async_http_client():
+    """Pooled httpx.AsyncClient to pass to AsyncOpenAI(http_client=...)"""
+    import httpx
+
+    return httpx.AsyncClient(**_httpx_options())
+
+
+def split_timeout(timeout):
+    """(connect, read) for a requests call given a single overall timeout"""
+    if timeout is None:
+        return (CONNECT_TIMEOUT, READ_TIMEOUT)
+    if isinstance(timeout, (int, float)):
+        return (min(CONNECT_TIMEOUT, timeout), timeout)
+    return timeout
+
+
+def tavily_session():
+    """requests.Session with a sized keep-alive pool to pass to TavilyClient"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class ConnectReadAdapter(HTTPAdapter):
+        # TavilyClient passes one number; split it into connect and read
+        def send(self, request, timeout=None, **kwargs):
+            return super().send(request, timeout=split_timeout(timeout), **kwargs)
+
+    session = requests.Session()
+    adapter = ConnectReadAdapter(
+        pool_connections=4, pool_maxsize=MAX_KEEPALIVE_CONNECTIONS
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Warmer:
+    """Background thread that opens connections and pings them while idle.
+
+    targets are zero-argument callables that each make one cheap request on a
+    pooled client. They run once when the warmer starts, then every interval
+    seconds while it is idle; busy() pauses pings while a question is being
+    answered, since the real requests keep the connections warm anyway.
+    """
+
+    def __init__(self, targets, interval=PING_INTERVAL):
+        self.targets = list(targets)
+        self.interval = interval
+        self.pings = 0
+        self.failures = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="connection-warmer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self):
+        # Connections are opened straight away, whatever the idle state
+        self.ping()
+        while not self._stopped.wait(self.interval):
+            if self._idle.is_set():
+                self.ping()
+
+    def ping(self):
+        for target in self.targets:
+            try:
+                target()
+                self.pings += 1
+            except Exception:
+                # A failed ping only means the next real call connects afresh
+                self.failures += 1
+
+    def idle(self):
+        """The student is typing: keep the connections alive"""
+        self._idle.set()
+
+    def busy(self):
+        """A question is running: stop pinging"""
+        self._idle.clear()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,139 @@
+"""
+Token-budgeted context window for Agent.messages.
+
+The full conversation stays in Agent.messages (and the history journal); only
+the request sent to the model is trimmed. The system prompt and the latest
+turns are always kept. Older turns are folded, a block at a time, into a
+rolling summary that is cached so each block is only ever summarised once.
+The summary is appended to the system message, so it is never mistaken for
+something the student wrote, and the kept turns always start with a user
+message.
+"""
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+
+DEFAULT_BUDGET = 8000
+SUMMARY_HEADER = "Summary of the earlier conversation (older turns omitted):"
+# Rough per-message overhead for role markers in chat formats
+MESSAGE_OVERHEAD = 4
+
+_sentence_end_re = re.compile(r"(?<=[.!?])\s")
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Cheap token estimate (about four characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    return count_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+
+
+def summarise_locally(messages, max_chars=240):
+    """Extractive summary: the opening sentence of each message, clipped"""
+    lines = []
+    for message in messages:
+        content = " ".join((message.get("content") or "").split())
+        if not content:
+            continue
+        first = _sentence_end_re.split(content, 1)[0]
+        if len(first) > max_chars:
+            first = first[: max_chars - 3].rstrip() + "..."
+        lines.append(f"- {message['role']}: {first}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Builds a request that fits a token budget from the full message list"""
+
+    def __init__(
+        self,
+        budget=DEFAULT_BUDGET,
+        keep_recent=6,
+        fold_size=4,
+        summary_budget=1000,
+        summariser=summarise_locally,
+    ):
+        self.budget = budget
+        # Latest messages that are always sent verbatim
+        self.keep_recent = keep_recent
+        # Older messages are folded in blocks of this many, so the summary
+        # (and anything cached on it) only changes once per block
+        self.fold_size = fold_size
+        self.summary_budget = summary_budget
+        self.summariser = summariser
+        self._block_summaries = {}
+        self.last_request_tokens = 0
+        self.folded_messages = 0
+
+    def build(self, messages):
+        """Return the messages to send: the system prompt (with any summary)
+        and the latest turns"""
+        head = messages[:1] if messages and messages[0]["role"] == "system" else []
+        body = messages[len(head):]
+        sizes = [message_tokens(m) for m in body]
+        head_tokens = sum(message_tokens(m) for m in head)
+        total = head_tokens + sum(sizes)
+        if total <= self.budget:
+            self.last_request_tokens = total
+            self.folded_messages = 0
+            return messages
+
+        # Walk back from the newest message, keeping as many as fit
+        available = self.budget - head_tokens - self.summary_budget
+        keep_from = len(body)
+        used = 0
+        while keep_from > 0:
+            size = sizes[keep_from - 1]
+            recent = len(body) - keep_from < self.keep_recent
+            if not recent and used + size > available:
+                break
+            used += size
+            keep_from -= 1
+        # Round up to a whole block so the summary stays cacheable, without
+        # folding any of the latest turns
+        fold = -(-keep_from // self.fold_size) * self.fold_size
+        fold = min(fold, max(len(body) - self.keep_recent, 0))
+        # The kept turns start with a user message: tool results must follow
+        # the assistant message that requested them, and a reply its question
+        while 0 < fold < len(body) and body[fold]["role"] != "user":
+            fold -= 1
+        if fold == 0:
+            self.last_request_tokens = total
+            self.folded_messages = 0
+            return messages
+
+        summary = f"{SUMMARY_HEADER}\n{self.summarise(body[:fold])}"
+        if head:
+            system = {**head[0], "content": f"{head[0]['content']}\n\n{summary}"}
+        else:
+            system = {"role": "system", "content": summary}
+        request = [system] + body[fold:]
+        self.folded_messages = fold
+        self.last_request_tokens = message_tokens(system) + sum(sizes[fold:])
+        return request
+
+    def summarise(self, messages):
+        """Rolling summary of messages, built from cached per-block summaries"""
+        parts = []
+        for start in range(0, len(messages), self.fold_size):
+            block = messages[start : start + self.fold_size]
+            key = hashlib.sha1(
+                json.dumps(block, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+            if key not in self._block_summaries:
+                self._block_summaries[key] = self.summariser(block)
+            parts.append(self._block_summaries[key])
+        # Keep the most recent block summaries that fit the summary budget
+        kept = []
+        used = 0
+        for part in reversed(parts):
+            used += count_tokens(part)
+            if used > self.summary_budget and kept:
+                break
+            kept.append(part)
+        return "\n".join(reversed(kept))
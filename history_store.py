@@ -0,0 +1,214 @@
+"""
+Append-only journaled conversation history.
+
+Each session gets its own JSONL file with one record per message. Appends are
+handed to a single background writer thread, so saving never blocks a turn.
+A {"_reset": true} record marks that the conversation was replaced; compaction
+rewrites the file without the records it made obsolete (and any line torn by a
+crash). Loading can read just the tail of the file, so resuming a long session
+does not parse its full past; a tail always starts at a user message.
+"""
+
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+
+DEFAULT_HISTORY_DIR = "history"
+RESET_RECORD = {"_reset": True}
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+_session_id_re = re.compile(r"^[\w.-]+$")
+
+
+class _JournalWriter:
+    """Single background thread performing every journal write in order"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="history-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, job):
+        self._queue.put(job)
+
+    def flush(self):
+        """Block until every submitted write has completed"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job()
+            except Exception as e:
+                print(f"History write failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _JournalWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+class HistoryJournal:
+    """Append-only JSONL journal of one session's messages"""
+
+    def __init__(
+        self, session_id="default", directory=DEFAULT_HISTORY_DIR, compact_every=500
+    ):
+        if not _session_id_re.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        self.session_id = session_id
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self.compact_every = compact_every
+        # Records written since the last compaction, and whether any are obsolete
+        self._since_compaction = 0
+        self._has_dead_records = False
+        os.makedirs(directory, exist_ok=True)
+        # After a crash mid-write, start the next record on a fresh line
+        self._needs_newline = _ends_mid_line(self.path)
+
+    def record(self, messages, journaled):
+        """Queue messages[journaled:] for appending and return the new count.
+
+        If the list shrank since the last call (it was replaced or folded), a
+        reset record is written followed by the whole list.
+        """
+        if journaled > len(messages):
+            records = [RESET_RECORD] + list(messages)
+            self._has_dead_records = True
+        else:
+            records = messages[journaled:]
+        if records:
+            lines = "".join(json.dumps(r) + "\n" for r in records)
+            if self._needs_newline:
+                lines = "\n" + lines
+                self._needs_newline = False
+            _get_writer().submit(lambda: self._append(lines))
+            self._since_compaction += len(records)
+            due = self._since_compaction >= self.compact_every
+            if self._has_dead_records and due:
+                self.compact()
+        return len(messages)
+
+    def compact(self):
+        """Queue a rewrite of the file that drops obsolete and torn records"""
+        self._since_compaction = 0
+        self._has_dead_records = False
+        _get_writer().submit(self._compact)
+
+    def flush(self):
+        _get_writer().flush()
+
+    def load(self, tail=None):
+        """Return the current messages, or only the last `tail` of them"""
+        if not os.path.exists(self.path):
+            return []
+        if tail is None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return _live_messages(f)
+        return self._load_tail(tail)
+
+    def _append(self, lines):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+
+    def _compact(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            messages = _live_messages(f)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(m) + "\n" for m in messages)
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic on POSIX and Windows, so a crash leaves the old or new file
+        os.replace(tmp_path, self.path)
+
+    def _load_tail(self, tail):
+        """Read backwards in blocks until `tail` messages (or a reset) are found.
+
+        A tail that stops short of the start begins at its first user message.
+        """
+        messages = []
+        cut = False
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b""
+            while position > 0 and len(messages) < tail:
+                step = min(_TAIL_BLOCK_SIZE, position)
+                position -= step
+                f.seek(position)
+                block = f.read(step) + remainder
+                lines = block.split(b"\n")
+                # The first line may be cut mid-record unless we reached the start
+                remainder = lines.pop(0) if position > 0 else b""
+                for index in range(len(lines) - 1, -1, -1):
+                    record = _parse(lines[index])
+                    if record is None:
+                        continue
+                    if record == RESET_RECORD:
+                        return messages[::-1]
+                    messages.append(record)
+                    if len(messages) == tail:
+                        cut = position > 0 or any(map(_parse, lines[:index]))
+                        break
+        messages.reverse()
+        if cut:
+            # Cut mid-conversation: start at a user turn, not an orphan tool
+            # result or assistant reply the API would reject
+            while messages and messages[0].get("role") != "user":
+                messages.pop(0)
+        return messages
+
+
+def _ends_mid_line(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def _parse(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None  # Torn write from a crash; skip it
+
+
+def _live_messages(lines):
+    messages = []
+    for line in lines:
+        record = _parse(line)
+        if record is None:
+            continue
+        if record == RESET_RECORD:
+            messages = []
+        else:
+            messages.append(record)
+    return messages
@@ -0,0 +1,91 @@
+"""
+Content-addressed cache of model completions, with record and replay modes.
+
+Each completion is stored as a small JSON file named by the SHA-256 of the
+model, temperature and the exact messages sent, so identical conversation
+prefixes map to the same file. Files are sharded by the first two hex digits
+and written atomically, which keeps the directory safe to share between
+threads and processes and easy to commit as a test fixture.
+
+Modes:
+  record  serve hits from disk; on a miss call the model and store the reply
+  replay  serve hits from disk; a miss raises CacheMiss and nothing is called
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = "llm_cache"
+MODES = ("record", "replay")
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when no completion was recorded for a request"""
+
+
+def completion_key(model, temperature, messages, tools=None):
+    """Stable hash of everything that determines the model's reply"""
+    request = {"model": model, "temperature": temperature, "messages": messages}
+    if tools:
+        request["tools"] = tools
+    payload = json.dumps(
+        request, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """On-disk completions keyed by completion_key()"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, mode="record"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}; expected one of {MODES}")
+        self.directory = directory
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def lookup(self, model, temperature, messages, tools=None):
+        """Return (key, content); content is None on a miss in record mode"""
+        key = completion_key(model, temperature, messages, tools)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except (FileNotFoundError, ValueError, KeyError):
+            content = None
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if content is None and self.mode == "replay":
+            raise CacheMiss(f"No recorded completion for {model} ({key[:12]})")
+        return key, content
+
+    def store(self, key, model, content):
+        """Write a completion; concurrent writers of one key leave a whole file"""
+        if self.mode == "replay":
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {"model": model, "content": content, "recorded_at": time.time()}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "mode": self.mode}
@@ -0,0 +1,419 @@
+"""
+End-to-end load test against local stand-ins for OpenRouter and Tavily.
+
+Two small HTTP servers speak just enough of the OpenRouter chat-completions
+protocol (plain and streamed) and the Tavily search protocol for the real
+OpenAI and Tavily clients. Each has a lognormal latency distribution set by
+its median and p95, an error rate, and the OpenRouter stand-in replays a
+canned ReAct script: the reply for a request is picked by how many
+observations the conversation already holds.
+
+The driver points main.py at the stand-ins, then runs N simulated students
+concurrently, each asking its questions one after another through the real
+Agent, query() and search_tavily(). Turn and query latencies come from the
+telemetry spans. Giving several user counts steps the load up so the point
+where throughput stops growing (or errors start) is easy to spot.
+
+Run with:
+  python loadtest.py --users 1 5 10 20 --questions 5
+  python loadtest.py --users 50 --llm-latency 0.8 --llm-p95 3 --llm-error-rate 0.02 --stream
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import main
+import resilience
+import telemetry
+from batch import BatchAgent
+
+# Replies in order: the first asks for searches, the last answers
+DEFAULT_SCRIPT = (
+    "Thought: I should check entry requirements for this subject.\n"
+    "Action: search: Computer Science degree entry requirements ABB 2026\n"
+    "Action: search: Computer Science courses 128 UCAS points 2026\n"
+    "PAUSE",
+    "Thought: I should confirm the student's UCAS points.\n"
+    "Action: calculate: 48 + 40 + 40\n"
+    "PAUSE",
+    "Answer: With 128 UCAS points, Computer Science courses asking ABB or "
+    "128 points are a good fit. Verify each offer on the official course page.",
+)
+DEFAULT_QUESTIONS = (
+    "I want to study Computer Science and I'm predicted ABB. Where should I apply?",
+    "Which Economics courses accept AAB for 2026 entry?",
+    "I have a BTEC Extended Diploma at DDM. Can I study Psychology?",
+    "What are good Mechanical Engineering options with A*AA?",
+)
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Latency:
+    """Lognormal delay with the given median and 95th percentile, in seconds"""
+
+    def __init__(self, median=0.0, p95=None):
+        self.median = median
+        p95 = median if p95 is None else max(p95, median)
+        self.sigma = math.log(p95 / median) / 1.645 if median > 0 else 0.0
+
+    def sample(self, rng):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(rng.gauss(0.0, self.sigma))
+
+
+class StandIn(ThreadingHTTPServer):
+    """Threaded local HTTP server; subclasses answer POSTs in respond()"""
+
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of new connections for a second
+    request_queue_size = 128
+
+    def __init__(self, latency=None, error_rate=0.0, error_status=503, seed=None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def draw(self):
+        """(delay, fail) for one request"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    def respond(self, handler, path, body):
+        raise NotImplementedError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        delay, fail = self.server.draw()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            status = self.server.error_status
+            self.send_json({"error": {"message": "stand-in error", "code": status}}, status)
+            return
+        self.server.respond(self, self.path, body)
+
+    def do_HEAD(self):
+        # Connection warm-up pings; not counted as requests
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OpenRouterStandIn(StandIn):
+    """Chat completions replaying a ReAct script, streamed or not"""
+
+    def __init__(self, script=DEFAULT_SCRIPT, **kwargs):
+        super().__init__(**kwargs)
+        self.script = list(script)
+
+    def reply_for(self, messages):
+        observations = sum(
+            1
+            for m in messages
+            if m.get("role") == "tool"
+            or (m.get("role") == "user" and str(m.get("content", "")).startswith("Observation:"))
+        )
+        return self.script[min(observations, len(self.script) - 1)]
+
+    def respond(self, handler, path, body):
+        if not path.endswith("/chat/completions"):
+            handler.send_json({"error": {"message": f"no route {path}"}}, 404)
+            return
+        reply = self.reply_for(body.get("messages", []))
+        model = body.get("model", "stand-in")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", [])),
+            "completion_tokens": len(reply) // 4,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if not body.get("stream"):
+            handler.send_json(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        pieces = [reply[i : i + 24] for i in range(0, len(reply), 24)]
+        events = [
+            {"choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+            for piece in pieces
+        ]
+        events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        events.append({"choices": [], "usage": usage})
+        try:
+            for event in events:
+                event.update(
+                    id=completion_id,
+                    object="chat.completion.chunk",
+                    created=int(time.time()),
+                    model=model,
+                )
+                handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                handler.wfile.flush()
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The agent closes the stream at PAUSE
+            pass
+        handler.close_connection = True
+
+
+class TavilyStandIn(StandIn):
+    """Search results shaped like Tavily's, echoing the query"""
+
+    results_per_query = 5
+
+    def respond(self, handler, path, body):
+        if not path.endswith("/search"):
+            handler.send_json({"error": {"message": f"no route {path}"}}, 404)
+            return
+        query = body.get("query", "")
+        results = [
+            {
+                "title": f"Example University {i} - {query}",
+                "url": f"https://example{i}.ac.uk/courses",
+                "content": f"Typical offer for {query}: ABB (128 UCAS points).",
+                "score": round(1.0 - i / 10, 2),
+            }
+            for i in range(1, self.results_per_query + 1)
+        ]
+        handler.send_json({"query": query, "results": results, "response_time": 0.0})
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def connect(openrouter_url, tavily_url):
+    """Point main's real clients at the stand-ins"""
+    os.environ["OPENROUTER_API_KEY"] = "loadtest"
+    os.environ["TAVILY_API_KEY"] = "loadtest"
+    os.environ["OPENROUTER_BASE_URL"] = f"{openrouter_url}/api/v1"
+    os.environ["TAVILY_BASE_URL"] = tavily_url
+    main.load_dotenv_and_init_client()
+
+
+def run_load(
+    users,
+    questions_per_user=3,
+    questions=DEFAULT_QUESTIONS,
+    stream=False,
+    max_turns=5,
+    model="google/gemma-3n-e4b-it:free",
+):
+    """Run users concurrent students against the connected clients; returns a report dict"""
+    telemetry.enable()
+    telemetry.clear()
+    failures = {}
+    answered = [0]
+    lock = threading.Lock()
+
+    def student(user):
+        for n in range(questions_per_user):
+            agent = BatchAgent(main.prompt, model=model)
+            question = questions[(user + n) % len(questions)]
+            try:
+                answer = main.query(
+                    question, agent, max_turns=max_turns, stream=stream, verbose=False
+                )
+            except Exception as e:
+                with lock:
+                    name = type(e).__name__
+                    failures[name] = failures.get(name, 0) + 1
+                continue
+            if answer is not None:
+                with lock:
+                    answered[0] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="student") as pool:
+        list(pool.map(student, range(users)))
+    elapsed = time.perf_counter() - start
+
+    spans = telemetry.finished_spans()
+    turns = [s["duration"] for s in spans if s["name"] == "turn"]
+    queries = [s["duration"] for s in spans if s["name"] == "query"]
+    total = users * questions_per_user
+    report = {
+        "users": users,
+        "queries": total,
+        "answered": answered[0],
+        "failed": sum(failures.values()),
+        "failures": failures,
+        "turns": len(turns),
+        "seconds": elapsed,
+        "queries_per_second": total / elapsed if elapsed else None,
+        "turns_per_second": len(turns) / elapsed if elapsed else None,
+    }
+    for name, durations in (("turn", turns), ("query", queries)):
+        for fraction in PERCENTILES:
+            report[f"{name}_p{round(fraction * 100)}"] = percentile(durations, fraction)
+    return report
+
+
+def format_row(report):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    return (
+        f"{report['users']:>5} {report['queries']:>7} {report['answered']:>8} "
+        f"{report['failed']:>6} {report['queries_per_second']:>8.2f} "
+        f"{report['turns_per_second']:>8.2f} {ms(report['turn_p50']):>7} "
+        f"{ms(report['turn_p95']):>7} {ms(report['turn_p99']):>7} "
+        f"{ms(report['query_p95']):>8}"
+    )
+
+
+HEADER = (
+    f"{'users':>5} {'queries':>7} {'answered':>8} {'failed':>6} {'query/s':>8} "
+    f"{'turn/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'query p95':>8}"
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the advisor against local stand-ins")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Concurrent students; several values step the load up")
+    parser.add_argument("--questions", type=int, default=3, help="Questions per student")
+    parser.add_argument("--stream", action="store_true", help="Stream model replies")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Median seconds per completion")
+    parser.add_argument("--llm-p95", type=float, default=1.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-status", type=int, default=503)
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Median seconds per search")
+    parser.add_argument("--search-p95", type=float, default=0.6)
+    parser.add_argument("--search-error-rate", type=float, default=0.0)
+    parser.add_argument("--script", help="JSON file with a list of canned model replies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--rate-limits", action="store_true",
+        help="Keep the client-side rate limiters (otherwise only the stand-ins limit throughput)",
+    )
+    parser.add_argument(
+        "--search-cache", action="store_true",
+        help="Keep the persistent search cache (otherwise every search reaches Tavily)",
+    )
+    parser.add_argument("--json", help="Write the reports to this JSON file")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    llm = OpenRouterStandIn(
+        script,
+        latency=Latency(args.llm_latency, args.llm_p95),
+        error_rate=args.llm_error_rate,
+        error_status=args.llm_error_status,
+        seed=args.seed,
+    )
+    search = TavilyStandIn(
+        latency=Latency(args.search_latency, args.search_p95),
+        error_rate=args.search_error_rate,
+        seed=args.seed + 1,
+    )
+    reports = []
+    with llm, search:
+        connect(llm.url, search.url)
+        if not args.search_cache:
+            main.search_cache = None
+        if not args.rate_limits:
+            resilience.openrouter.limiter = None
+            resilience.tavily.limiter = None
+        print(HEADER)
+        for users in args.users:
+            report = run_load(users, args.questions, stream=args.stream)
+            reports.append(report)
+            print(format_row(report), flush=True)
+            if report["failures"]:
+                print(f"      failures: {report['failures']}")
+        print(
+            f"Stand-ins served {llm.requests} completions ({llm.errors} injected errors) "
+            f"and {search.requests} searches ({search.errors} injected errors)."
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
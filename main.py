@@ -1,15 +1,51 @@
-import openai
 import re
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
-from tavily import TavilyClient
+import time
 import json
-
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+import resilience
+import telemetry
+from calculator import safe_calculate
+from cascade import ModelCascade
+from catalogue import DEFAULT_CATALOGUE_PATH, CourseCatalogue
+from connections import (
+    CONNECT_TIMEOUT,
+    Warmer,
+    openai_http_client,
+    request_timeout,
+    tavily_session,
+)
+from answer_cache import AnswerCache
+from context_window import ContextWindow
+from history_store import HistoryJournal
+from llm_cache import DEFAULT_CACHE_DIR, CompletionCache
+from observations import compact_observation
+from prefetch import SearchPrefetch
+from router import route as route_question
+from search_cache import DEFAULT_CACHE_PATH, SearchCache
+from tariff_tables import DEFAULT_TABLES_PATH, TariffTables
+from tariffs import TARIFFS
+
+# API endpoints; override to point the agent at a proxy or the load-test stand-ins
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+TAVILY_BASE_URL = "https://api.tavily.com"
 # Global OpenRouter client
 client = None
+# Connection pools shared by the OpenRouter and Tavily clients
+http_client = None
+search_session = None
 # Global Tavily client
 tavily_client = None
+# Global search result cache
+search_cache = None
+# Global local course catalogue, loaded on first lookup
+course_catalogue = None
+# Global qualification tariff tables, loaded on first use
+tariff_tables = None
+# Sampling temperature for every model call (part of the completion cache key)
+TEMPERATURE = 0.2
 
 
 def search_tavily(query):
@@ -17,16 +53,162 @@ def search_tavily(query):
         raise Exception(
             "Tavily client not initialised. Call load_dotenv_and_init_client() first."
         )
-    response = tavily_client.search(query)
-    return response
+    if search_cache is None:
+        return _fetch_search(query)
+    return search_cache.get_or_fetch(query, _fetch_search)
+
+
+def _fetch_search(query):
+    return resilience.tavily.call(
+        lambda _, timeout: tavily_client.search(query, timeout=timeout)
+    )
+
+
+# Model prefixes whose providers honour cache_control breakpoints through
+# OpenRouter; OpenAI and DeepSeek models cache long prefixes automatically
+PROMPT_CACHE_PREFIXES = ("anthropic/", "google/gemini")
+
+
+def supports_prompt_cache(model):
+    return model.lower().startswith(PROMPT_CACHE_PREFIXES)
+
+
+def cache_marked(message):
+    """Copy of a message with its text marked as a cacheable prompt prefix"""
+    part = {"type": "text", "text": message["content"]}
+    part["cache_control"] = {"type": "ephemeral"}
+    return {**message, "content": [part]}
+
+
+TOOL_MODE_NOTE = (
+    "Native tools are available for the actions above: call them instead of "
+    "writing Action and PAUSE lines (several at once if they are independent), "
+    "and reply with Answer: <your final answer> once you can answer."
+)
+# Argument name and description for each action offered as a native tool
+action_parameters = {
+    "search": (
+        "query",
+        "Search the web for current course information, official university "
+        "pages, entry requirements and application deadlines.",
+    ),
+    "lookup": (
+        "query",
+        "Look up typical offers in the local course catalogue by subject, "
+        "university and/or UCAS points or grades, e.g. 'Computer Science 120'.",
+    ),
+    "tariff": (
+        "grades",
+        "UCAS tariff points for IB, Scottish Highers and Advanced Highers, "
+        "BTEC Nationals, EPQ, Cambridge Pre-U, A-level and AS-level grades, "
+        "e.g. 'IB HL 7, 6, 6, SL 5, 5, 4' or 'Higher AAB, Advanced Higher A'.",
+    ),
+    "calculate": (
+        "expression",
+        "Evaluate an arithmetic expression, e.g. '(48 + 40 + 32)' for UCAS points.",
+    ),
+}
+
+
+def action_tools():
+    """known_actions as OpenAI tool definitions"""
+    tools = []
+    for name in known_actions:
+        parameter, description = action_parameters.get(
+            name, ("input", f"Run the {name} action.")
+        )
+        tools.append(
+            {
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "description": description,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {parameter: {"type": "string"}},
+                        "required": [parameter],
+                    },
+                },
+            }
+        )
+    return tools
+
+
+def tool_reply(message):
+    """A completion message's text and tool calls as plain, storable dicts"""
+    calls = [
+        {
+            "id": call.id,
+            "type": "function",
+            "function": {
+                "name": call.function.name,
+                "arguments": call.function.arguments,
+            },
+        }
+        for call in message.tool_calls or []
+    ]
+    return {"content": message.content, "tool_calls": calls}
+
+
+def parse_tool_call(call):
+    """(call_id, action, action_input) from a stored tool call"""
+    function = call["function"]
+    try:
+        arguments = json.loads(function["arguments"] or "{}")
+    except ValueError:
+        # Treat unparseable arguments as the raw input rather than failing
+        return call["id"], function["name"], function["arguments"]
+    if isinstance(arguments, dict):
+        values = [str(v) for v in arguments.values()]
+        action_input = values[0] if len(values) == 1 else json.dumps(arguments)
+    else:
+        action_input = str(arguments)
+    return call["id"], function["name"], action_input
+
+
+def tools_unsupported(error):
+    """Whether an error means the model cannot take tools at all"""
+    return resilience.status_code(error) in (400, 404) and "tool" in str(error).lower()
 
 
 class Agent:
     # Initialise the agent with a system prompt
-    def __init__(self, system="", model="google/gemma-3n-e4b-it:free"):
+    def __init__(
+        self,
+        system="",
+        model="google/gemma-3n-e4b-it:free",
+        history=None,
+        context=None,
+        fallback_models=(),
+        completion_cache=None,
+        use_tools=False,
+        cascade=None,
+    ):
+        # Optional ModelCascade: a fast model for action turns, a strong one
+        # for answers; its routes replace model and fallback_models
+        self.cascade = cascade
+        if cascade is not None:
+            model = cascade.fast.model
+            fallback_models = cascade.fast.fallback_models
+        # Offer known_actions as native tools instead of the text protocol
+        self.use_tools = use_tools
+        if use_tools and system:
+            system = f"{system}\n\n{TOOL_MODE_NOTE}"
         # Save system prompt and model
         self.system = system
         self.model = model
+        # Models tried in turn when retrying (and for hedged requests)
+        self.fallback_models = list(fallback_models)
+        # Keeps each request within a token budget by folding older turns
+        self.context = context if context is not None else ContextWindow()
+        # Optional CompletionCache for record/replay of model replies
+        self.completion_cache = completion_cache
+        # Optional HistoryJournal; without one, history is a single JSON file
+        self.history = history
+        # Number of messages already handed to the journal
+        self._journaled = 0
+        # Assembled requests per prefix style, extended as turns are added
+        self._requests = {}
         # Initialise messages list
         self.messages = []
         # If system prompt is not empty, add it to messages
@@ -34,10 +216,27 @@ class Agent:
             self.messages.append({"role": "system", "content": system})
 
     def save_history(self, filename="history.json"):
+        if self.history is not None:
+            # Append only the new messages; the write happens in the background
+            self._journaled = self.history.record(self.messages, self._journaled)
+            return
         with open(filename, "w") as f:
             json.dump(self.messages, f)
 
-    def load_history(self, filename="history.json"):
+    def load_history(self, filename="history.json", tail=None):
+        if self.history is not None:
+            messages = self.history.load(tail=tail)
+            if not messages:
+                return  # No history to load, start fresh
+            # A tail load may not reach the system prompt, and a stored one
+            # may predate a tool-mode switch; keep ours in front
+            if messages[0]["role"] == "system":
+                messages.pop(0)
+            if self.system:
+                messages.insert(0, {"role": "system", "content": self.system})
+            self.messages = messages
+            self._journaled = len(messages)
+            return
         try:
             with open(filename, "r") as f:
                 self.messages = json.load(f)
@@ -51,34 +250,316 @@ class Agent:
         self.messages.append({"role": "assistant", "content": result})
         return result
 
+    # Build the message list sent to the model
+    def request_messages(self, model=None):
+        """Messages to send. For gemma the system prompt is merged into the
+        first user message; for models with prompt caching it is marked as a
+        cacheable prefix. The rewritten prefix is built once per conversation
+        and later turns are appended to the same list, so callers must treat
+        the result as read-only."""
+        model = model or self.model
+        messages = self.context.build(self.messages)
+        if not messages or messages[0]["role"] != "system":
+            return messages
+        if "gemma" in model.lower():
+            # For Google models, must merge system message with the first user message
+            style, prefix_length = "merge", 2
+            if len(messages) < 2 or messages[1]["role"] != "user":
+                return messages[1:]
+        elif supports_prompt_cache(model):
+            style, prefix_length = "cache", 1
+        else:
+            return messages
+
+        state = self._requests.get(style)
+        prefix = messages[:prefix_length]
+        if state is None or any(a is not b for a, b in zip(state["prefix"], prefix)):
+            if style == "merge":
+                system_msg, first = prefix
+                content = f"SYSTEM: {system_msg['content']}\n\nUSER: {first['content']}"
+                head = {**first, "content": content}
+            else:
+                head = cache_marked(prefix[0])
+            state = self._requests[style] = {"prefix": prefix, "head": head}
+        elif state["source"] is messages and len(messages) >= state["sent"]:
+            # Same conversation, new turns only: extend the previous request
+            state["request"].extend(messages[state["sent"] :])
+            state["sent"] = len(messages)
+            return state["request"]
+        state["source"] = messages
+        state["sent"] = len(messages)
+        state["request"] = [state["head"]] + messages[prefix_length:]
+        return state["request"]
+
+    # Look up the reply to the current conversation in the completion cache
+    def cached_completion(self, tools=None, model=None):
+        """Return (key, content); key is None without a cache, content None on a miss"""
+        if self.completion_cache is None:
+            return None, None
+        model = model or self.model
+        return self.completion_cache.lookup(
+            model, TEMPERATURE, self.request_messages(model), tools=tools
+        )
+
+    def route(self, name=None):
+        """(model, fallback_models, max_tokens) for a cascade route, or the agent's own"""
+        if self.cascade is None or name is None:
+            return self.model, self.fallback_models, None
+        route = self.cascade.routes[name]
+        return route.model, route.fallback_models, route.max_tokens
+
     # Execute the agent
-    def execute(self):
+    def execute(self, tools=None):
+        """Reply text, or with tools a dict of "content" and "tool_calls" """
+        if self.cascade is None:
+            return self._execute_route(None, tools)
+        reply = self._execute_route("fast", tools)
+        reason = escalation_reason(reply)
+        if reason is None:
+            return reply
+        self.cascade.escalated(reason)
+        return self._execute_route("strong", tools)
+
+    def _execute_route(self, route, tools=None):
+        model, fallback_models, max_tokens = self.route(route)
+        key, cached = self.cached_completion(tools, model)
+        if cached is not None:
+            return cached
         if client is None:
             raise Exception(
                 "OpenRouter client not initialised. Call load_dotenv_and_init_client() first."
             )
-        # For Google models, must merge system message with the first user message
-
-        if "gemma" in self.model.lower():
-            messages = self.messages.copy()
-            if messages and messages[0]["role"] == "system":
-                system_msg = messages.pop(0)
-            if messages and messages[0]["role"] == "user":
-                # Prepend system message to the first user message
-                messages[0]["content"] = (
-                    f"SYSTEM: {system_msg['content']}\n\nUSER: {messages[0]['content']}"
-                )
+        attributes = {"route": route} if route else {}
+        with telemetry.span("llm", model=model, **attributes) as llm_span:
+            started = time.perf_counter()
+            # Rate limited, retried with backoff and optionally hedged
+            extra = {"tools": tools} if tools else {}
+            if max_tokens:
+                extra["max_tokens"] = max_tokens
+            completion = resilience.openrouter.call(
+                lambda model, timeout: self.create_completion(model, timeout, **extra),
+                variants=[model] + fallback_models,
+            )
+            # Without streaming the first token arrives with the last
+            llm_span.set("ttft_seconds", time.perf_counter() - started)
+            telemetry.record_usage(completion)
+        if route:
+            self.cascade.record(
+                route, time.perf_counter() - started, getattr(completion, "usage", None)
+            )
+        message = completion.choices[0].message
+        content = message.content if not tools else tool_reply(message)
+        if key is not None:
+            self.completion_cache.store(key, model, content)
+        return content
+
+    # One turn with native tool calling
+    def call_tools(self, message=None):
+        """Returns (text, calls): calls lists (call_id, action, action_input)
+        and is empty when the model replied in text. Models without tool
+        support switch the agent back to the text protocol."""
+        if message is not None:
+            self.messages.append({"role": "user", "content": message})
+        try:
+            reply = self.execute(tools=action_tools())
+        except Exception as error:
+            if not tools_unsupported(error):
+                raise
+            self.use_tools = False
+            self.drop_tool_note()
+            reply = {"content": self.execute(), "tool_calls": []}
+        text = reply["content"] or ""
+        assistant = {"role": "assistant", "content": text}
+        if reply["tool_calls"]:
+            assistant["tool_calls"] = reply["tool_calls"]
+        self.messages.append(assistant)
+        return text, [parse_tool_call(call) for call in reply["tool_calls"]]
+
+    def drop_tool_note(self):
+        """Take TOOL_MODE_NOTE back out of the system prompt for the text protocol"""
+        note = f"\n\n{TOOL_MODE_NOTE}"
+        if not self.system.endswith(note):
+            return
+        self.system = self.system[: -len(note)]
+        if self.messages and self.messages[0]["role"] == "system":
+            # A new head object, so request_messages() rebuilds its prefix
+            self.messages[0] = {"role": "system", "content": self.system}
+
+    def add_tool_result(self, call_id, observation):
+        self.messages.append(
+            {"role": "tool", "tool_call_id": call_id, "content": observation}
+        )
+
+    def create_completion(self, model, timeout, **kwargs):
+        return client.chat.completions.create(
+            model=model,
+            temperature=TEMPERATURE,
+            messages=self.request_messages(model),
+            timeout=request_timeout(timeout),
+            **kwargs,
+        )
+
+    # Call the agent with a message, streaming the reply
+    def stream(self, message, on_token=None, on_action=None):
+        self.messages.append({"role": "user", "content": message})
+        result = self.execute_stream(on_token, on_action)
+        self.messages.append({"role": "assistant", "content": result})
+        return result
 
-            completion = client.chat.completions.create(
-                model=self.model, temperature=0.2, messages=messages
+    # Execute the agent as a stream, starting actions as soon as they are complete
+    def execute_stream(self, on_token=None, on_action=None):
+        """Stream the completion, calling on_token(text) for each delta and
+        on_action(action, action_input) as soon as each Action line is
+        complete. Generation is cancelled once PAUSE follows the actions.
+        With a cascade, a fast reply that turns into an answer is cut before
+        it is shown and the strong model streams the turn instead."""
+        if self.cascade is None:
+            return self._stream_route(None, on_token, on_action)
+        text = self._stream_route("fast", on_token, on_action, hold_answer=True)
+        reason = escalation_reason(text)
+        if reason is None:
+            return text
+        self.cascade.escalated(reason)
+        return self._stream_route("strong", on_token, on_action)
+
+    def _stream_route(self, route, on_token, on_action, hold_answer=False):
+        model, fallback_models, max_tokens = self.route(route)
+        key, cached = self.cached_completion(model=model)
+        if cached is not None:
+            if hold_answer and escalation_reason(cached) is not None:
+                return cached
+            return self._replay_stream(cached, on_token, on_action)
+        if client is None:
+            raise Exception(
+                "OpenRouter client not initialised. Call load_dotenv_and_init_client() first."
             )
-        else:
-            # Original behavior for other models
-            completion = client.chat.completions.create(
-                model=self.model, temperature=0.2, messages=self.messages
+        attributes = {"route": route} if route else {}
+        usage = []
+        started = time.perf_counter()
+        with telemetry.span("llm", model=model, stream=True, **attributes) as llm_span:
+            text = self._read_stream(
+                llm_span,
+                on_token,
+                on_action,
+                model=model,
+                fallback_models=fallback_models,
+                max_tokens=max_tokens,
+                hold_answer=hold_answer,
+                on_usage=usage.append,
+            )
+        if route:
+            self.cascade.record(
+                route, time.perf_counter() - started, usage[-1] if usage else None
             )
+        # A fast reply cut at its answer is incomplete, so it is not kept
+        if key is not None and not (hold_answer and escalation_reason(text) == "answer"):
+            self.completion_cache.store(key, model, text)
+        return text
+
+    def _replay_stream(self, text, on_token, on_action):
+        """Deliver a cached reply through the same callbacks as a live stream"""
+        if on_token:
+            on_token(text)
+        if on_action:
+            for line in text.splitlines():
+                if line.strip() == "PAUSE":
+                    break
+                match = action_re.match(line)
+                if match:
+                    on_action(*match.groups())
+        return text
+
+    def _read_stream(
+        self,
+        llm_span,
+        on_token,
+        on_action,
+        model=None,
+        fallback_models=None,
+        max_tokens=None,
+        hold_answer=False,
+        on_usage=None,
+    ):
+        """Read a reply stream. With hold_answer, text on a line that may be
+        starting "Answer:" is held back, and the stream stops once such a line
+        begins (before any action), returning the text so far unshown."""
+        model = model or self.model
+        if fallback_models is None:
+            fallback_models = self.fallback_models
+        extra = {"max_tokens": max_tokens} if max_tokens else {}
+        # Only opening the stream is retried; hedging a stream would bill twice
+        stream = resilience.openrouter.call(
+            lambda model, timeout: self.create_completion(
+                model, timeout, stream=True, **extra
+            ),
+            variants=[model] + fallback_models,
+            hedge=False,
+        )
+        started = time.perf_counter()
+        text = ""
+        line_start = 0
+        action_seen = False
+        # With hold_answer, how much of text has been passed to on_token
+        shown = 0
+
+        def show(end):
+            nonlocal shown
+            if on_token and end > shown:
+                on_token(text[shown:end])
+            shown = max(shown, end)
 
-        return completion.choices[0].message.content
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    telemetry.record_usage(chunk)
+                    if on_usage:
+                        on_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not text:
+                    llm_span.set("ttft_seconds", time.perf_counter() - started)
+                text += delta
+                if on_token and not hold_answer:
+                    on_token(delta)
+                # Inspect every line completed by this delta
+                while True:
+                    newline = text.find("\n", line_start)
+                    if newline == -1:
+                        break
+                    line = text[line_start:newline].rstrip("\r")
+                    if hold_answer and not action_seen and line.lstrip().startswith("Answer:"):
+                        show(line_start)
+                        return text
+                    line_start = newline + 1
+                    match = action_re.match(line)
+                    if match:
+                        action_seen = True
+                        if on_action:
+                            on_action(*match.groups())
+                    elif action_seen and line.strip() == "PAUSE":
+                        if hold_answer:
+                            show(newline)
+                        return text[:newline]
+                partial = text[line_start:].lstrip()
+                if hold_answer:
+                    if not action_seen and partial.startswith("Answer:"):
+                        show(line_start)
+                        return text
+                    # Hold a line that may still turn out to be "Answer:"
+                    maybe_answer = partial and "Answer:".startswith(partial)
+                    show(line_start if maybe_answer and not action_seen else len(text))
+                # PAUSE is often the final token, with no trailing newline
+                if action_seen and partial.strip() == "PAUSE":
+                    return text
+        finally:
+            # Closing the stream cancels any remaining generation
+            stream.close()
+        if hold_answer:
+            show(len(text))
+        return text
 
 
 # Add model as a class attribute
@@ -100,12 +581,19 @@ You operate in a strict ReAct loop with this output contract:
   PAUSE
 - When you have enough information to respond to the user, output ONLY:
   Answer: <your final answer to the user>
+If several independent lookups are needed (for example entry requirements at four universities), write one Action line for each before PAUSE; they run together and their observations come back numbered in the same order.
 Do not include both action and answer in the same turn. Do not output anything other than the fields shown above.
 
 Available actions:
 - search: Search the web for current course information (e.g., fees, modules), official university pages, typical entry requirements, and application deadlines.
   Example:
   Action: search: "Computer Science degree entry requirements site:ucas.com OR site:*.ac.uk 2026"
+- lookup: Look up typical offers in the local course catalogue by subject, university and/or UCAS points or grades. Faster than search; falls back to a web search when the catalogue has no match. Offers marked indicative have not been checked against the course page, so confirm them with search before quoting them as entry requirements.
+  Example:
+  Action: lookup: Computer Science 120 points
+- tariff: UCAS points for IB (HL/SL, Extended Essay, Theory of Knowledge), Scottish Highers and Advanced Highers, BTEC Nationals of any size, EPQ, Cambridge Pre-U, A-level and AS-level grades, from the local tariff tables. Name the qualification before each group of grades.
+  Example:
+  Action: tariff: IB HL 7, 6, 6, SL 5, 5, 4, Extended Essay B, TOK A
 - calculate: Perform calculations for grade averages, UCAS points, or other numerical assessments.
   Example:
   Action: calculate: (48 + 40 + 32)
@@ -117,7 +605,7 @@ Before searching, if key inputs are missing, ask concise clarifying questions (i
 
 UCAS tariff (A levels, 2017+ scale):
 - A* = 56, A = 48, B = 40, C = 32, D = 24, E = 16
-When relevant, calculate UCAS points explicitly and state the formula. If the student uses other qualifications (IB, BTEC, Scottish Highers, etc.), prefer searching for official equivalencies and cite sources.
+When relevant, calculate UCAS points explicitly and state the formula. If the student uses other qualifications (IB, BTEC, Scottish Highers, EPQ, Pre-U, etc.), use the tariff action rather than searching for equivalencies; search only for qualifications it does not recognise.
 
 Source quality and citations:
 - Prefer UCAS, official university pages (*.ac.uk), official policy pages, and major league table sites (Complete University Guide, Guardian, Times/Sunday Times, QS)
@@ -180,133 +668,348 @@ Answer: Sorry, I can't answer that. As an AI University Application Advisor, I a
 """.strip()
 
 
-def safe_calculate(expression):
-    """Safely evaluate mathematical expressions without using eval()"""
-    try:
-        # Remove any whitespace
-        expression = expression.strip()
-
-        # Check if this looks like a mathematical expression
-        # Allow more characters but still block dangerous ones
-        dangerous_chars = set(
-            "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_[]{}|\\`~@#$%^"
+# Create a dictionary of known actions
+def lookup_courses(query):
+    """Answer from the local course catalogue, searching the web for gaps"""
+    global course_catalogue
+    if course_catalogue is None:
+        course_catalogue = CourseCatalogue.load(
+            os.getenv("COURSE_CATALOGUE_PATH", DEFAULT_CATALOGUE_PATH)
         )
-        if any(c in dangerous_chars for c in expression):
-            raise ValueError("Expression contains potentially dangerous characters")
-
-        # Allow mathematical and safe characters
-        # This includes: numbers, basic operators, parentheses, spaces, dots, commas
-        safe_chars = set("0123456789+-*/()., ")
-        if not all(c in safe_chars for c in expression):
-            # If it contains other characters, it might not be a math expression
-            # Let's check if it's still safe to process
-            other_chars = set(expression) - safe_chars
-            if any(c in dangerous_chars for c in other_chars):
-                raise ValueError("Expression contains potentially dangerous characters")
-
-        # Use our safe parser for mathematical expressions
-        if "(" in expression or ")" in expression:
-            # Handle parentheses by evaluating inner expressions first
-            return evaluate_expression(expression)
-        else:
-            # Simple arithmetic without parentheses
-            return evaluate_simple_expression(expression)
-    except Exception as e:
-        return f"Error calculating: {str(e)}"
+    result = course_catalogue.lookup(query)
+    if result is None:
+        return search_tavily(f"{query} entry requirements")
+    return result
 
 
-def evaluate_simple_expression(expr):
-    """Evaluate simple arithmetic expressions without parentheses"""
-    # Split by operators, preserving them
-    import re
+def tariff_points(grades):
+    """Total and breakdown of UCAS points from the local tariff tables"""
+    global tariff_tables
+    if tariff_tables is None:
+        tariff_tables = TariffTables.load(
+            os.getenv("TARIFF_TABLES_PATH", DEFAULT_TABLES_PATH)
+        )
+    return tariff_tables.calculate(grades)
 
-    parts = re.split(r"([+\-*/])", expr.replace(" ", ""))
-    parts = [p for p in parts if p]
 
-    if len(parts) == 1:
-        return float(parts[0])
+known_actions = {
+    "calculate": safe_calculate,
+    "tariff": tariff_points,
+    "search": search_tavily,
+    "lookup": lookup_courses,
+}
 
-    # Handle multiplication and division first
-    i = 1
-    while i < len(parts) - 1:
-        if parts[i] in ["*", "/"]:
-            left = float(parts[i - 1])
-            right = float(parts[i + 1])
-            if parts[i] == "*":
-                result = left * right
-            else:
-                if right == 0:
-                    raise ValueError("Division by zero")
-                result = left / right
-            parts[i - 1 : i + 2] = [str(result)]
-            i -= 1
-        i += 2
-
-    # Handle addition and subtraction
-    result = float(parts[0])
-    for i in range(1, len(parts), 2):
-        if i + 1 < len(parts):
-            if parts[i] == "+":
-                result += float(parts[i + 1])
-            elif parts[i] == "-":
-                result -= float(parts[i + 1])
+action_re = re.compile(r"^Action: (\w+): (.*)$")
 
-    return result
 
+def parse_actions(result):
+    """Return the Action line matches in a model reply, in order"""
+    return [action_re.match(a) for a in result.split("\n") if action_re.match(a)]
+
+
+def escalation_reason(reply):
+    """Why a fast-route reply should be redone by the strong model, or None.
+
+    "answer" for a final answer, "invalid" for an unknown action or a reply
+    with neither an action nor an answer. Native tool replies are dicts, and
+    plain text without tool calls is their answer.
+    """
+    tool_reply_text = isinstance(reply, dict)
+    if tool_reply_text:
+        if reply["tool_calls"]:
+            names = [call["function"]["name"] for call in reply["tool_calls"]]
+            return None if all(name in known_actions for name in names) else "invalid"
+        reply = reply["content"]
+    text = reply or ""
+    actions = parse_actions(text)
+    if actions:
+        if all(match.group(1) in known_actions for match in actions):
+            return None
+        return "invalid"
+    if any(line.lstrip().startswith("Answer:") for line in text.splitlines()):
+        return "answer"
+    return "answer" if tool_reply_text and text.strip() else "invalid"
+
+# Shared worker pool for actions started while a reply is still streaming
+action_pool = None
+# Concurrent network-bound actions across every query in the process
+ACTION_WORKERS = 8
+# Shared deadline, in seconds, for all of one turn's actions
+ACTION_TIMEOUT = 30.0
+MAX_ACTIONS_PER_TURN = 8
+# Actions cheap enough to run inline instead of on the pool
+local_actions = {"calculate", "tariff"}
+
+
+def start_action(action, action_input):
+    """Run a known action on the shared worker pool; returns a Future.
+
+    The call runs in a copy of the caller's context under a pending span, so
+    what the provider's limiter records there (queue_seconds) is adopted by
+    the action span that collects the result.
+    """
+    global action_pool
+    if action_pool is None:
+        action_pool = ThreadPoolExecutor(
+            max_workers=ACTION_WORKERS, thread_name_prefix="action"
+        )
+    pending = telemetry.pending_span("action", action=action)
+    future = action_pool.submit(
+        contextvars.copy_context().run,
+        telemetry.run_in_span,
+        pending,
+        known_actions[action],
+        action_input,
+    )
+    future.span = pending
+    return future
 
-def evaluate_expression(expr):
-    """Evaluate expressions with parentheses"""
-    # Find innermost parentheses
-    while "(" in expr:
-        start = expr.rfind("(")
-        end = expr.find(")", start)
-        if end == -1:
-            raise ValueError("Mismatched parentheses")
 
-        inner_expr = expr[start + 1 : end]
-        inner_result = evaluate_simple_expression(inner_expr)
-        expr = expr[:start] + str(inner_result) + expr[end + 1 :]
+def print_token(text):
+    print(text, end="", flush=True)
 
-    return evaluate_simple_expression(expr)
 
+def _no_log(*args, **kwargs):
+    pass
 
-# Create a dictionary of known actions
-known_actions = {"calculate": safe_calculate, "search": search_tavily}
 
-action_re = re.compile(r"^Action: (\w+): (.*)$")
+def run_action(action, action_input, started=None, timeout=None, started_early=True):
+    """Run an action (or collect one already started) and compact its result.
+
+    started_early marks futures begun before the turn's actions were parsed
+    (mid-stream or prefetched), as opposed to this turn's pooled calls.
+    """
+    with telemetry.span("action", action=action) as action_span:
+        future = started.get((action, action_input)) if started else None
+        if future is not None:
+            if started_early:
+                action_span.set("started_early", True)
+            observation = future.result(timeout)
+            pending = getattr(future, "span", None)
+            queued = pending.attributes.get("queue_seconds") if pending else None
+            if queued is not None:
+                action_span.add("queue_seconds", queued)
+        else:
+            observation = known_actions[action](action_input)
+        observation = compact_observation(action, action_input, observation)
+        action_span.set("observation_chars", len(observation))
+    return observation
+
+
+def run_actions(actions, started=None, prefetched=None):
+    """Run a turn's (action, action_input) pairs concurrently.
+
+    Network-bound actions go to the shared pool (reusing any started early or
+    prefetched), local ones run inline, and all of them share one deadline.
+    Returns the observations in the order the actions were requested.
+    """
+    started = dict(started or {})
+    early = set(started)
+    for action, action_input in actions:
+        key = (action, action_input)
+        if key in started or action in local_actions or action not in known_actions:
+            continue
+        future = prefetched.claim(action, action_input) if prefetched else None
+        if future is not None:
+            early.add(key)
+        started[key] = future or start_action(action, action_input)
+    deadline = time.monotonic() + ACTION_TIMEOUT
+    observations = []
+    for action, action_input in actions:
+        if action not in known_actions:
+            # Tell the model instead of ending the session
+            observations.append(
+                f"Unknown action {action}; use one of: {', '.join(known_actions)}"
+            )
+            continue
+        remaining = max(deadline - time.monotonic(), 0)
+        try:
+            observation = run_action(
+                action, action_input, started, remaining, (action, action_input) in early
+            )
+        except FutureTimeout:
+            observation = f"{action} timed out after {ACTION_TIMEOUT:g}s"
+        except Exception as e:
+            observation = f"{action} failed: {e}"
+        observations.append(observation)
+    return observations
+
+
+def merge_observations(actions, observations):
+    """One observation for a turn; several actions are numbered in order"""
+    if len(observations) == 1:
+        return observations[0]
+    return "\n\n".join(
+        f"[{i}] {action}: {action_input}\n{observation}"
+        for i, ((action, action_input), observation) in enumerate(
+            zip(actions, observations), start=1
+        )
+    )
 
 
-def query(question, agent, max_turns=5):
-    print(f"Question: {question}\n")
+def run_tool_calls(agent, calls, prefetched=None, log=_no_log):
+    """Run every tool call of a turn together and add the results in order"""
+    actions = [(action, action_input) for _, action, action_input in calls]
+    for action, action_input in actions:
+        log(f"Action: {action}('{action_input}')")
+    observations = run_actions(actions, prefetched=prefetched)
+    for (call_id, _, _), observation in zip(calls, observations):
+        log(f"Observation: {observation}\n")
+        agent.add_tool_result(call_id, observation)
+
+
+def answer_locally(question, agent, log=_no_log):
+    """Answer off-topic, arithmetic and grade-only questions without the model.
+
+    Returns the answer, or None when the question needs the ReAct loop. Local
+    answers are still added to the conversation so follow-ups have context.
+    """
+    path, answer = route_question(question)
+    telemetry.current_span().set("route", path)
+    if answer is None:
+        return None
+    agent.messages.append({"role": "user", "content": question})
+    agent.messages.append({"role": "assistant", "content": f"Answer: {answer}"})
+    log(f"\nFinal Answer: {answer}")
+    return answer
+
+
+def answer_from_cache(question, agent, answer_cache, log=_no_log):
+    """Answer a rewording of an earlier question from the AnswerCache.
+
+    Returns the cached answer, or None on a miss. Like local answers, hits
+    are added to the conversation.
+    """
+    answer = answer_cache.lookup(question)
+    telemetry.current_span().set("answer_cache", "miss" if answer is None else "hit")
+    if answer is None:
+        return None
+    agent.messages.append({"role": "user", "content": question})
+    agent.messages.append({"role": "assistant", "content": f"Answer: {answer}"})
+    log(f"\nFinal Answer: {answer}")
+    return answer
+
+
+def query(
+    question,
+    agent,
+    max_turns=5,
+    stream=False,
+    verbose=True,
+    prefetch=False,
+    route=False,
+    answer_cache=None,
+):
+    """Run the ReAct loop for one question; returns the final answer text or None.
+
+    With prefetch=True the searches the question suggests start alongside the
+    first model call, and a matching search action reuses their results. With
+    route=True questions the router can answer locally never reach the model.
+    Agents with use_tools=True call actions natively (without streaming) and
+    may request several per turn; a plain text reply is the answer. With an
+    AnswerCache, a question matching an earlier one's profile and wording gets
+    the earlier answer, and new answers are added to it.
+    """
+    log = print if verbose else _no_log
+    log(f"Question: {question}\n")
+    with telemetry.span("query"):
+        if route:
+            answer = answer_locally(question, agent, log)
+            if answer is not None:
+                agent.save_history()
+                return answer
+        if answer_cache is not None:
+            answer = answer_from_cache(question, agent, answer_cache, log)
+            if answer is not None:
+                agent.save_history()
+                return answer
+        answer = react_loop(question, agent, max_turns, stream, verbose, prefetch, log)
+        if answer is not None and answer_cache is not None:
+            answer_cache.store(question, answer)
+        return answer
+
+
+def react_loop(question, agent, max_turns, stream, verbose, prefetch, log):
+    """The Thought/Action/Observation turns of query(); returns the answer or None"""
+    prefetched = None
+    if prefetch:
+        prefetched = SearchPrefetch(
+            question, lambda q: start_action("search", q)
+        )
     next_prompt = question
     for i in range(max_turns):
-        result = agent(next_prompt)
-        # Save history after each turn
-        agent.save_history()
-        print(f"--- Turn {i + 1} ---")
-        print(result)
-        actions = [action_re.match(a) for a in result.split("\n") if action_re.match(a)]
-        if actions:
-            action, action_input = actions[0].groups()
-            if action not in known_actions:
-                print(f"Unknown action: {action}: {action_input}")
-                return
-            print(f"Action: {action}('{action_input}')")
-            observation = known_actions[action](action_input)
-            print(f"Observation: {observation}\n")
-            next_prompt = f"Observation: {observation}"
-        else:
-            # If no action, the result might be the final answer or need further parsing
-            if result.startswith("Answer:"):
-                print(f"\nFinal Answer: {result.split('Answer: ', 1)[1]}")
+        with telemetry.span("turn", turn=i + 1):
+            # Actions already started, keyed by (action, action_input)
+            started = {}
+            if getattr(agent, "use_tools", False):
+                result, calls = agent.call_tools(next_prompt)
+                agent.save_history()
+                log(f"--- Turn {i + 1} ---")
+                log(result)
+                if calls:
+                    run_tool_calls(agent, calls, prefetched, log)
+                    next_prompt = None
+                    continue
+                if result and not parse_actions(result):
+                    answer = result.split("Answer:", 1)[-1].strip()
+                    log(f"\nFinal Answer: {answer}")
+                    return answer
+            elif stream:
+                log(f"--- Turn {i + 1} ---")
+
+                def on_action(action, action_input):
+                    if action in known_actions:
+                        # A matching prefetched search beats a fresh one
+                        future = (
+                            prefetched.claim(action, action_input) if prefetched else None
+                        )
+                        started[(action, action_input)] = future or start_action(
+                            action, action_input
+                        )
+
+                result = agent.stream(
+                    next_prompt,
+                    on_token=print_token if verbose else None,
+                    on_action=on_action,
+                )
+                log()
+                # Save history after each turn
+                agent.save_history()
             else:
-                print("No action taken and no clear answer. Stopping.")
-            return
-    print("Max turns reached.")
+                result = agent(next_prompt)
+                # Save history after each turn
+                agent.save_history()
+                log(f"--- Turn {i + 1} ---")
+                log(result)
+            actions = [m.groups() for m in parse_actions(result)]
+            if actions:
+                actions = actions[:MAX_ACTIONS_PER_TURN]
+                for action, action_input in actions:
+                    log(f"Action: {action}('{action_input}')")
+                observations = run_actions(actions, started, prefetched)
+                observation = merge_observations(actions, observations)
+                log(f"Observation: {observation}\n")
+                next_prompt = f"Observation: {observation}"
+            else:
+                # If no action, the result might be the final answer
+                if result.startswith("Answer:"):
+                    answer = result.split("Answer: ", 1)[1]
+                    log(f"\nFinal Answer: {answer}")
+                    return answer
+                log("No action taken and no clear answer. Stopping.")
+                return None
+    log("Max turns reached.")
+    return None
 
 
 def load_dotenv_and_init_client():
-    global client, tavily_client
+    global client, tavily_client, search_cache, http_client, search_session
+    # The SDKs take most of a second to import, so only load them here; the
+    # UCAS and calculator helpers stay importable without them
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    from tavily import TavilyClient
+
     _ = load_dotenv()
     api_key = os.getenv("OPENROUTER_API_KEY")
     tavily_api_key = os.getenv("TAVILY_API_KEY")
@@ -320,42 +1023,59 @@ def load_dotenv_and_init_client():
             "TAVILY_API_KEY not found in .env file or environment variables."
         )
 
-    client = OpenAI(api_key=api_key, base_url="https://openrouter.ai/api/v1")
-    tavily_client = TavilyClient(tavily_api_key)
+    # Retries are handled by the resilience layer, not the SDK
+    http_client = openai_http_client()
+    client = OpenAI(
+        api_key=api_key,
+        base_url=os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
+        max_retries=0,
+        http_client=http_client,
+    )
+    search_session = tavily_session()
+    tavily_client = TavilyClient(
+        tavily_api_key,
+        api_base_url=os.getenv("TAVILY_BASE_URL", TAVILY_BASE_URL),
+        session=search_session,
+    )
+    if search_cache is None:
+        search_cache = SearchCache(os.getenv("SEARCH_CACHE_PATH", DEFAULT_CACHE_PATH))
+
+
+def prewarm_connections():
+    """Open the provider connections now and keep them alive while idle.
+
+    Returns the started Warmer; call busy() while a question runs and idle()
+    while waiting for the next one.
+    """
+    openrouter_url = str(client.base_url)
+    tavily_url = tavily_client.base_url
+    # Any response will do: the point is a pooled, already-handshaken connection
+    return Warmer(
+        [
+            lambda: http_client.head(openrouter_url, timeout=CONNECT_TIMEOUT),
+            lambda: search_session.head(tavily_url, timeout=CONNECT_TIMEOUT),
+        ]
+    ).start()
+
+
+# Question words, matched anywhere in the input
+_question_word_re = re.compile(
+    r"\b(?:who|what|when|where|why|how|which|can|is|are|do|does|did|will|could|"
+    r"would|should)\b"
+)
+# Known non-question statements ending with '?'
+_non_question_re = re.compile(r"^(?:i have no more questions|that's all|no more questions)")
 
 
 def is_question(user_input):
-    # List of question words
-    question_words = [
-        "who",
-        "what",
-        "when",
-        "where",
-        "why",
-        "how",
-        "which",
-        "can",
-        "is",
-        "are",
-        "do",
-        "does",
-        "did",
-        "will",
-        "could",
-        "would",
-        "should",
-    ]
     # Lowercase input for easier matching
     input_lower = user_input.lower().strip()
     # Check for question word anywhere in the input
-    for word in question_words:
-        if re.search(rf"\b{word}\b", input_lower):
-            return True
+    if _question_word_re.search(input_lower):
+        return True
     # Optionally, filter out known non-question statements ending with '?'
-    non_questions = ["i have no more questions", "that's all", "no more questions"]
-    for statement in non_questions:
-        if input_lower.startswith(statement) and input_lower.endswith("?"):
-            return False
+    if _non_question_re.match(input_lower) and input_lower.endswith("?"):
+        return False
     # If it ends with a question mark, treat as a question (unless filtered above)
     if input_lower.endswith("?"):
         return True
@@ -364,14 +1084,8 @@ def is_question(user_input):
 
 def get_ucas_points(grade, subject_type="A-level"):
     """Get UCAS points for a given grade and subject type"""
-    ucas_points = {
-        "A-level": {"A*": 56, "A": 48, "B": 40, "C": 32, "D": 24, "E": 16},
-        "AS-level": {"A": 20, "B": 16, "C": 12, "D": 10, "E": 6},
-        "BTEC": {"D*": 56, "D": 48, "M": 32, "P": 16},
-    }
-
     try:
-        return ucas_points.get(subject_type, {}).get(grade.upper(), 0)
+        return TARIFFS.get(subject_type, {}).get(grade.upper(), 0)
     except:
         return 0
 
@@ -400,16 +1114,47 @@ def calculate_ucas_total(grades_input):
 if __name__ == "__main__":
     load_dotenv_and_init_client()
     # Initialise agent with model
-    agent_instance = Agent(prompt, model="google/gemma-3n-e4b-it:free")
-    agent_instance.load_history()
+    # One journal per session; set ADVISOR_SESSION to keep students apart
+    history = HistoryJournal(os.getenv("ADVISOR_SESSION", "default"))
+    # ADVISOR_TOOLS=1 uses native tool calling where the model supports it
+    agent_instance = Agent(
+        prompt,
+        model="google/gemma-3n-e4b-it:free",
+        history=history,
+        use_tools=os.getenv("ADVISOR_TOOLS") == "1",
+    )
+    # ADVISOR_STRONG_MODEL=<model> keeps gemma for action turns and sends
+    # final answers (and replies gemma gets wrong) to the stronger model
+    strong_model = os.getenv("ADVISOR_STRONG_MODEL")
+    if strong_model:
+        agent_instance.cascade = ModelCascade(agent_instance.model, strong_model)
+    # Resume from the most recent messages only
+    agent_instance.load_history(tail=50)
+    # ADVISOR_LLM_CACHE=record|replay stores or replays model replies on disk
+    cache_mode = os.getenv("ADVISOR_LLM_CACHE")
+    if cache_mode:
+        agent_instance.completion_cache = CompletionCache(
+            os.getenv("ADVISOR_LLM_CACHE_DIR", DEFAULT_CACHE_DIR), mode=cache_mode
+        )
+    # ADVISOR_ANSWER_CACHE=answers.json reuses answers to reworded repeat questions
+    answer_cache_path = os.getenv("ADVISOR_ANSWER_CACHE")
+    answer_cache = AnswerCache.load(answer_cache_path) if answer_cache_path else None
+    # ADVISOR_TRACE=traces.json records spans per turn and writes them on exit
+    trace_path = os.getenv("ADVISOR_TRACE")
+    if trace_path:
+        telemetry.enable(profile=os.getenv("ADVISOR_PROFILE") == "1")
 
     print("Welcome! I'm your personal University Application Advisor :)")
     print(
         "Ask me anything related to university applications. (Write 'exit' to exit. If you don't type a question, I'll end the conversation for you.)"
     )
 
+    # Handshakes happen while the student reads the welcome and types
+    warmer = prewarm_connections()
     while True:
+        warmer.idle()
         user_input = input("\nAsk a question:\n> ").strip()
+        warmer.busy()
         if user_input.lower() == "exit":
             print("Goodbye!")
             break
@@ -417,11 +1162,24 @@ if __name__ == "__main__":
             print("It looks like you have no questions for now. Goodbye.")
             break
         if is_question(user_input):
-            query(user_input, agent_instance)
+            query(
+                user_input,
+                agent_instance,
+                stream=True,
+                prefetch=True,
+                route=True,
+                answer_cache=answer_cache,
+            )
         else:
             print("It looks like you have no questions for now. Goodbye.")
             break
 
+    warmer.stop()
+    if answer_cache is not None:
+        answer_cache.save(answer_cache_path)
+    if trace_path:
+        telemetry.export_json(trace_path)
+
     # Can add other test calls here if needed, for example:
     # print("\n--- Another Example ---")
     # agent_instance_2 = Agent(prompt)
@@ -0,0 +1,142 @@
+"""
+Observation compaction between action execution and the next prompt.
+
+Raw Tavily responses carry URLs, scores and whole page blobs. Before a search
+result goes back to the model it is de-duplicated by URL, ranked with a
+preference for UCAS and *.ac.uk sources, cut down to the sentences relevant to
+the query, and rendered as a short, citation-ready list within a token budget.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+from context_window import count_tokens
+
+DEFAULT_OBSERVATION_BUDGET = 600
+SNIPPETS_PER_RESULT = 2
+MAX_SNIPPET_CHARS = 300
+
+# Bonus added to Tavily's relevance score for preferred sources
+DOMAIN_BOOSTS = [
+    ("ucas.com", 1.0),
+    (".ac.uk", 0.8),
+    ("gov.uk", 0.5),
+    ("thecompleteuniversityguide.co.uk", 0.3),
+    ("theguardian.com", 0.3),
+    ("thetimes.co.uk", 0.3),
+    ("topuniversities.com", 0.3),
+]
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with what which "
+    "ac site uk 2025 2026 2027 course courses degree university universities".split()
+)
+
+_word_re = re.compile(r"[a-z0-9*]+")
+_sentence_re = re.compile(r"(?<=[.!?])\s+")
+# Grades, tariff points, fees and dates are what students usually ask about
+_figure_re = re.compile(r"\b(?:[A-E]\*?){3}\b|\d")
+
+
+def normalise_url(url):
+    """Reduce a URL to host + path so trivial variants de-duplicate"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host + parts.path.rstrip("/")
+
+
+def domain_boost(url):
+    host = urlsplit(url).netloc.lower()
+    for suffix, boost in DOMAIN_BOOSTS:
+        if suffix[0] != "." and host == suffix:
+            return boost
+        if host.endswith(suffix if suffix[0] == "." else "." + suffix):
+            return boost
+    return 0.0
+
+
+def query_terms(query):
+    words = _word_re.findall(query.lower())
+    return {w for w in words if len(w) > 1 and w not in STOPWORDS}
+
+
+def relevant_snippets(content, terms, limit=SNIPPETS_PER_RESULT):
+    """Pick the sentences sharing most terms with the query, in original order"""
+    sentences = [s.strip() for s in _sentence_re.split(" ".join(content.split()))]
+    scored = []
+    for index, sentence in enumerate(sentences):
+        if not sentence:
+            continue
+        words = set(_word_re.findall(sentence.lower()))
+        score = len(words & terms) + (0.5 if _figure_re.search(sentence) else 0)
+        if score > 0:
+            scored.append((score, index, sentence))
+    best = sorted(scored, key=lambda item: (-item[0], item[1]))[:limit]
+    snippets = []
+    for _, _, sentence in sorted(best, key=lambda item: item[1]):
+        if len(sentence) > MAX_SNIPPET_CHARS:
+            sentence = sentence[: MAX_SNIPPET_CHARS - 3].rstrip() + "..."
+        snippets.append(sentence)
+    return snippets
+
+
+def compact_search_results(query, response, budget=DEFAULT_OBSERVATION_BUDGET):
+    """Render a Tavily response as a compact, citation-ready observation"""
+    if not isinstance(response, dict):
+        return str(response)
+    seen = set()
+    results = []
+    for result in response.get("results") or []:
+        url = result.get("url") or ""
+        key = normalise_url(url)
+        if not url or key in seen:
+            continue
+        seen.add(key)
+        score = (result.get("score") or 0) + domain_boost(url)
+        results.append((score, len(results), result))
+    results.sort(key=lambda item: (-item[0], item[1]))
+
+    terms = query_terms(query)
+    shown_query = query.strip().strip('"')
+    lines = [f'Search results for "{shown_query}":']
+    if response.get("answer"):
+        lines.append(f"Summary: {response['answer']}")
+    used = count_tokens("\n".join(lines))
+    if not results:
+        lines.append("No results found.")
+    for number, (_, _, result) in enumerate(results, start=1):
+        title = " ".join((result.get("title") or "Untitled").split())
+        entry = [f"[{number}] {title} — {result['url']}"]
+        for snippet in relevant_snippets(result.get("content") or "", terms):
+            entry.append(f"    {snippet}")
+        entry_tokens = count_tokens("\n".join(entry))
+        if used + entry_tokens > budget and number > 1:
+            lines.append(f"({len(results) - number + 1} lower-ranked results omitted)")
+            break
+        lines.extend(entry)
+        used += entry_tokens
+    return "\n".join(lines)
+
+
+# Per-action formatters; actions without one are passed through as text
+def compact_lookup_results(query, response):
+    """Catalogue matches are already compact; search fallbacks are compacted"""
+    if isinstance(response, str):
+        return response
+    return compact_search_results(query, response)
+
+
+observation_formatters = {
+    "search": compact_search_results,
+    "lookup": compact_lookup_results,
+}
+
+
+def compact_observation(action, action_input, observation):
+    """Turn an action's raw result into the text placed after 'Observation:'"""
+    formatter = observation_formatters.get(action)
+    if formatter is None:
+        return str(observation)
+    return formatter(action_input, observation)
@@ -0,0 +1,165 @@
+"""
+Speculative search prefetch for the first turn of a question.
+
+The first search is usually predictable from the question alone: the subject
+the student wants to study, their grades and the year of entry. Before the
+first model call, predict_searches() pulls those out with regular
+expressions and SearchPrefetch starts the likely searches in the background.
+When the model then asks for a search whose terms match a prefetched one,
+the in-flight (often already finished) result is used instead of a new
+round trip. Each prefetched search serves at most one real one, and never a
+query that names a particular university or other proper noun the
+prediction does not.
+"""
+
+import re
+
+from observations import query_terms
+from tariffs import TARIFFS
+
+# Degree subjects students commonly ask about; longer names are tried first
+SUBJECTS = (
+    "Accounting", "Aerospace Engineering", "Anthropology", "Archaeology",
+    "Architecture", "Biochemistry", "Biology", "Biomedical Science",
+    "Business Management", "Chemical Engineering", "Chemistry",
+    "Civil Engineering", "Classics", "Computer Science", "Criminology",
+    "Dentistry", "Economics", "Electrical Engineering", "Engineering",
+    "English Literature", "English", "Film Studies", "Finance", "Geography",
+    "Geology", "History", "Law", "Linguistics", "Management", "Marketing",
+    "Mathematics", "Mechanical Engineering", "Medicine", "Midwifery", "Music",
+    "Nursing", "Pharmacy", "Philosophy", "Physics", "Physiotherapy",
+    "Politics", "Psychology", "Sociology", "Software Engineering",
+    "Veterinary Medicine", "Zoology",
+)
+SUBJECT_ALIASES = {
+    "cs": "Computer Science",
+    "comp sci": "Computer Science",
+    "computing": "Computer Science",
+    "maths": "Mathematics",
+    "math": "Mathematics",
+    "medical school": "Medicine",
+    "vet": "Veterinary Medicine",
+}
+# A prefetched search serves a real one when their terms overlap at least
+# this much (twice the shared terms over both term counts)
+MATCH_THRESHOLD = 0.75
+# Words that point a query at particular institutions; query_terms drops
+# some of them as stopwords, so they are looked for in the raw query
+INSTITUTION_WORDS = frozenset((
+    "academy", "campus", "college", "institute", "kcl", "lse", "school", "soas",
+    "uea", "ucl", "uni", "universities", "university",
+))
+
+_subject_names = sorted(
+    [(name.lower(), name) for name in SUBJECTS] + list(SUBJECT_ALIASES.items()),
+    key=lambda item: -len(item[0]),
+)
+_subject_re = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name, _ in _subject_names) + r")\b",
+    re.IGNORECASE,
+)
+_subject_lookup = dict(_subject_names)
+# The degree subject follows phrases like these; A-level subjects usually don't
+_intent_re = re.compile(
+    r"\b(?:study|studying|read|reading|degree in|course in|courses in|"
+    r"interested in|apply for|applying for|apply to study)\s+",
+    re.IGNORECASE,
+)
+# ...or comes straight before words like these
+_course_word_re = re.compile(r"\s+(?:courses?|degrees?|programmes?)\b", re.IGNORECASE)
+_bracketed_grade_re = re.compile(r"\(\s*(A\*|[A-E])\s*\)")
+_offer_re = re.compile(r"(?<![\w*])((?:A\*|[A-E]){3,4})(?![\w*])")
+_year_re = re.compile(r"\b(20[2-3]\d)\b")
+_raw_word_re = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+
+
+def predict_subject(question):
+    """The degree subject named after an intent phrase or before "courses",
+    else the only one named"""
+    for intent in _intent_re.finditer(question):
+        match = _subject_re.match(question, intent.end())
+        if match:
+            return _subject_lookup[match.group(1).lower()]
+    matches = list(_subject_re.finditer(question))
+    for match in matches:
+        if _course_word_re.match(question, match.end()):
+            return _subject_lookup[match.group(1).lower()]
+    named = {_subject_lookup[m.group(1).lower()] for m in matches}
+    return named.pop() if len(named) == 1 else None
+
+
+def predict_grades(question):
+    """A-level grades as an offer string such as 'ABC', or None"""
+    grades = _bracketed_grade_re.findall(question)
+    if not grades:
+        offer = _offer_re.search(question)
+        if not offer:
+            return None
+        grades = re.findall(r"A\*|[A-E]", offer.group(1))
+    order = list(TARIFFS["A-level"])
+    return "".join(sorted(grades, key=order.index))
+
+
+def predict_searches(question):
+    """Search queries the model is likely to issue first for this question"""
+    subject = predict_subject(question)
+    if subject is None:
+        return []
+    year = _year_re.search(question)
+    year = f" {year.group(1)}" if year else ""
+    grades = predict_grades(question)
+    if grades is None:
+        return [f"{subject} degree entry requirements{year}"]
+    points = sum(TARIFFS["A-level"][grade] for grade in re.findall(r"A\*|[A-E]", grades))
+    return [
+        f"{subject} degree entry requirements {grades}{year}",
+        f"{subject} courses {points} UCAS points{year}",
+    ]
+
+
+def specific_terms(query):
+    """Lowercased proper nouns (capitalised words) and institution words in a query"""
+    return {
+        word.lower()
+        for word in _raw_word_re.findall(query)
+        if word.lower() in INSTITUTION_WORDS or (word[0].isupper() and word[1:].islower())
+    }
+
+
+def match_score(predicted, terms, specific=frozenset()):
+    """Overlap of two term sets, or 0.0 when the real query names something
+    specific (a university, a city) that the prediction does not"""
+    if not predicted or not terms or specific - predicted:
+        return 0.0
+    return 2 * len(predicted & terms) / (len(predicted) + len(terms))
+
+
+class SearchPrefetch:
+    """Searches started ahead of the model, claimable by matching queries"""
+
+    def __init__(self, question, start):
+        # start(query) begins a search and returns a Future
+        self.pending = [
+            (query_terms(query), start(query)) for query in predict_searches(question)
+        ]
+        self.hits = 0
+
+    def claim(self, action, action_input):
+        """Future for a prefetched search matching this action, or None.
+
+        A claimed search is removed, so it serves only one action.
+        """
+        if action != "search":
+            return None
+        terms = query_terms(action_input)
+        specific = specific_terms(action_input)
+        best, best_score = None, 0.0
+        for entry in self.pending:
+            score = match_score(entry[0], terms, specific)
+            if score >= MATCH_THRESHOLD and score > best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None
+        self.pending.remove(best)
+        self.hits += 1
+        return best[1]
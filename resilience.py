@@ -0,0 +1,363 @@
+"""
+Shared resilience layer for calls to OpenRouter and Tavily.
+
+Each provider gets a CallPolicy combining:
+- a token-bucket rate limiter shared by every thread in the process
+- jittered exponential backoff that honours Retry-After
+- a per-attempt timeout and an overall deadline across retries
+- optional hedging: once an attempt runs past a latency percentile, a
+  duplicate request (or the next fallback model) is started and whichever
+  finishes first wins
+
+call() blocks the calling thread; call_async() applies the same policy,
+limiter and counters to coroutines, waiting with asyncio.sleep so the event
+loop keeps serving other sessions.
+
+The layer does not import either SDK; errors are classified by their status
+code, Retry-After header and exception type name.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import telemetry
+
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    """Token bucket shared across threads: `rate` calls per second"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token; returns 0, or how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Block until a call is allowed; returns False if timeout passes first"""
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait_for = self._take()
+            if not wait_for:
+                return True
+            if give_up is not None and time.monotonic() + wait_for > give_up:
+                return False
+            time.sleep(wait_for)
+
+    async def acquire_async(self, timeout=None):
+        """acquire() for coroutines: waits without blocking the event loop"""
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait_for = self._take()
+            if not wait_for:
+                return True
+            if give_up is not None and time.monotonic() + wait_for > give_up:
+                return False
+            await asyncio.sleep(wait_for)
+
+
+class LatencyTracker:
+    """Sliding window of recent call durations"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        """Latency at the given fraction (0-1), or None with too few samples"""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def retry_after(error):
+    """Seconds requested by a Retry-After header on the error, if any"""
+    # Tavily's keyless limit error carries the value itself
+    seconds = getattr(error, "retry_after_seconds", None)
+    if seconds is not None:
+        return max(0.0, float(seconds))
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP dates are rare here; email.utils is only imported when one arrives
+    import email.utils
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection drops and 5xx responses are retried"""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    # Tavily reports a 429 as UsageLimitExceededError, without a status code
+    return any(
+        part in name for part in ("Timeout", "Connection", "RateLimit", "UsageLimit")
+    )
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0, error=None):
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, min(cap, base * (2**attempt)))
+    requested = retry_after(error) if error is not None else None
+    if requested is not None:
+        delay = max(delay, requested)
+    return delay
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(
+                max_workers=16, thread_name_prefix="hedge"
+            )
+        return _hedge_pool
+
+
+class CallPolicy:
+    """Rate limit, retries, deadlines and hedging for one provider"""
+
+    def __init__(
+        self,
+        name,
+        rate=1.0,
+        burst=5,
+        max_retries=4,
+        timeout=60.0,
+        deadline=180.0,
+        base_delay=0.5,
+        max_delay=20.0,
+        hedge_percentile=None,
+        sleep=time.sleep,
+        async_sleep=asyncio.sleep,
+    ):
+        self.name = name
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max_retries
+        # Longest a single attempt may take, and the whole call with retries
+        self.timeout = timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # e.g. 0.95 hedges any attempt slower than the recent p95
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "failures": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def call(self, make_call, variants=(None,), hedge=True):
+        """Call make_call(variant, timeout) until it succeeds or retries run out.
+
+        Retry n starts from variants[n % len(variants)], so extra variants act
+        as fallbacks (e.g. alternative models); hedges use the next variant.
+        """
+        self._count("calls")
+        give_up = time.monotonic() + self.deadline
+        variants = list(variants)
+        attempt = 0
+        while True:
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{self.name} call exceeded its deadline")
+            if self.limiter is not None:
+                queued = time.monotonic()
+                allowed = self.limiter.acquire(remaining)
+                telemetry.current_span().add(
+                    "queue_seconds", time.monotonic() - queued
+                )
+                if not allowed:
+                    raise DeadlineExceeded(
+                        f"{self.name} rate limit wait exceeded its deadline"
+                    )
+            timeout = min(self.timeout, max(give_up - time.monotonic(), 0.001))
+            primary = variants[attempt % len(variants)]
+            backup = variants[(attempt + 1) % len(variants)]
+            self._count("attempts")
+            try:
+                if hedge and self.hedge_percentile is not None:
+                    return self._hedged(make_call, primary, backup, timeout)
+                return self._timed(make_call, primary, timeout)
+            except Exception as error:
+                self.sleep(self._retry_delay(attempt, error, give_up))
+                attempt += 1
+
+    async def call_async(self, make_call, variants=(None,), hedge=True):
+        """call() for coroutines: await make_call(variant, timeout) with the
+        same limiter, retries, deadline and hedging"""
+        self._count("calls")
+        give_up = time.monotonic() + self.deadline
+        variants = list(variants)
+        attempt = 0
+        while True:
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"{self.name} call exceeded its deadline")
+            if self.limiter is not None:
+                queued = time.monotonic()
+                allowed = await self.limiter.acquire_async(remaining)
+                telemetry.current_span().add(
+                    "queue_seconds", time.monotonic() - queued
+                )
+                if not allowed:
+                    raise DeadlineExceeded(
+                        f"{self.name} rate limit wait exceeded its deadline"
+                    )
+            timeout = min(self.timeout, max(give_up - time.monotonic(), 0.001))
+            primary = variants[attempt % len(variants)]
+            backup = variants[(attempt + 1) % len(variants)]
+            self._count("attempts")
+            try:
+                if hedge and self.hedge_percentile is not None:
+                    return await self._hedged_async(make_call, primary, backup, timeout)
+                return await self._timed_async(make_call, primary, timeout)
+            except Exception as error:
+                await self.async_sleep(self._retry_delay(attempt, error, give_up))
+                attempt += 1
+
+    def _retry_delay(self, attempt, error, give_up):
+        """Backoff before the next attempt; re-raises error if there is none"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count("failures")
+            raise error
+        delay = backoff_delay(attempt, self.base_delay, self.max_delay, error)
+        if time.monotonic() + delay >= give_up:
+            self._count("failures")
+            raise error
+        self._count("retries")
+        return delay
+
+    def _timed(self, make_call, variant, timeout):
+        started = time.monotonic()
+        result = make_call(variant, timeout)
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def _hedged(self, make_call, primary, backup, timeout):
+        hedge_after = self.latency.percentile(self.hedge_percentile)
+        if hedge_after is None:
+            return self._timed(make_call, primary, timeout)
+        pool = _get_hedge_pool()
+        first = pool.submit(self._timed, make_call, primary, timeout)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = pool.submit(self._timed, make_call, backup, timeout)
+        pending = [first, second]
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    # The losing request is left to finish in the background
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _timed_async(self, make_call, variant, timeout):
+        started = time.monotonic()
+        result = await asyncio.wait_for(make_call(variant, timeout), timeout)
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _hedged_async(self, make_call, primary, backup, timeout):
+        hedge_after = self.latency.percentile(self.hedge_percentile)
+        if hedge_after is None:
+            return await self._timed_async(make_call, primary, timeout)
+        first = asyncio.ensure_future(self._timed_async(make_call, primary, timeout))
+        done, _ = await asyncio.wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = asyncio.ensure_future(self._timed_async(make_call, backup, timeout))
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        self._count("hedge_wins")
+                    # Unlike threads, the losing request can be cancelled
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+
+# OpenRouter's free tier allows about 20 requests a minute
+openrouter = CallPolicy(
+    "openrouter", rate=20 / 60, burst=5, timeout=90.0, deadline=240.0
+)
+tavily = CallPolicy("tavily", rate=5.0, burst=10, timeout=20.0, deadline=60.0)
@@ -0,0 +1,233 @@
+"""
+Pre-LLM router: answers what it can locally before the ReAct loop runs.
+
+route(question) sends each question down one of four paths:
+- refuse:     clearly off-topic input gets the advisor's canned refusal
+- arithmetic: a bare sum such as "what is 48 + 40 + 32?" goes to the calculator
+- ucas:       "what are my UCAS points for A*AB?" is scored with the A-level,
+              AS-level and BTEC tables in tariff_tables.json
+- agent:      everything else, i.e. real advising questions, reaches the model
+
+Topic detection is a small lexicon of admissions and off-topic terms: a
+question needs some off-topic signal and no admissions vocabulary at all
+before it is refused, so anything ambiguous still goes to the model. A grade
+question is only answered locally when every word in it is a grade, a
+subject, a qualification name or filler such as "how many points is"; grades
+for any other qualification (IB, Scottish Highers, Pre-U, EPQ), a named BTEC
+size, A-level grades mixed with AS grades or any word it does not know send
+the question to the model, which scores it with the tariff action.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+from calculator import safe_calculate
+from prefetch import SUBJECTS, SUBJECT_ALIASES
+from tariff_tables import DEFAULT_TABLES_PATH, TariffTables
+
+# Must match the refusal the system prompt asks the model for
+REFUSAL = (
+    "Sorry, I can't answer that. As an AI University Application Advisor, I am "
+    "designed to assist with higher education applications and related academic "
+    "guidance."
+)
+
+ON_TOPIC_TERMS = (
+    "a level", "a levels", "a-level", "a-levels", "academic", "accommodation",
+    "admission", "admissions", "alevel", "alevels", "application", "applications",
+    "apply", "applying", "as level", "as-level", "btec", "bursary", "campus",
+    "clearing", "college", "course", "courses", "deadline", "deadlines", "degree",
+    "degrees", "entry requirements", "exam", "exams", "foundation year", "gcse",
+    "gcses", "grade", "grades", "ib", "interview", "league table", "masters",
+    "offer", "offers", "open day", "oxbridge", "personal statement", "phd",
+    "placement", "points", "postgraduate", "predicted", "ranking", "rankings",
+    "reference", "russell group", "scholarship", "scholarships", "school",
+    "sixth form", "statement", "student", "students", "student finance", "study",
+    "studying", "subject", "subjects", "tariff", "tuition", "ucas",
+    "undergraduate", "uni", "universities", "university",
+) + tuple(name.lower() for name in SUBJECTS) + tuple(SUBJECT_ALIASES)
+
+OFF_TOPIC_TERMS = (
+    "bitcoin", "boyfriend", "celebrity", "crypto", "cryptocurrency", "dating",
+    "football", "girlfriend", "horoscope", "joke", "jokes", "lottery", "lyrics",
+    "movie", "movies", "netflix", "poem", "premier league", "recipe", "recipes",
+    "restaurant", "song", "songs", "stock", "stocks", "weather", "tell me a story",
+)
+
+
+def _terms_re(terms):
+    ordered = sorted(set(terms), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(t) for t in ordered) + r")\b")
+
+
+_on_topic_re = _terms_re(ON_TOPIC_TERMS)
+_off_topic_re = _terms_re(OFF_TOPIC_TERMS)
+_arithmetic_re = re.compile(
+    r"^(?:(?:what(?:'s| is)|calculate|compute|work out|how much is)\s+)?"
+    r"(?P<expression>[\d\s.,()+\-*/x×÷]*\d[\d\s.,()]*[+\-*/x×÷][\d\s.,()+\-*/x×÷]*\d[\s)]*)"
+    r"\s*[?=.!]*$",
+    re.IGNORECASE,
+)
+_points_question_re = re.compile(
+    r"\b(?:ucas|tariff)\b.*\bpoints?\b|\bhow many (?:ucas )?points\b|"
+    r"\b(?:ucas|tariff) (?:score|total)\b",
+    re.IGNORECASE,
+)
+# Anything asking for advice rather than a sum goes to the model
+_advice_re = re.compile(
+    r"\b(?:courses?|universit(?:y|ies)|uni|degree|recommend|options?|apply|"
+    r"study|should|consider|entry requirements|offers?|chances?|enough)\b",
+    re.IGNORECASE,
+)
+# Qualifications graded with letters that would otherwise read as A-levels
+_other_qualification_re = re.compile(
+    r"\b(?:ib|international baccalaureate|scottish|highers?|advanced highers?|"
+    r"pre[- ]?u|epq|extended project|extended essay|theory of knowledge|tok|"
+    r"t[- ]levels?)\b",
+    re.IGNORECASE,
+)
+# Qualification names, replaced by a "{name}" token before the question is read
+_qualification_name_re = re.compile(
+    r"\b(?:(?P<as>(?i:as[ -]?levels?)|AS)|(?P<a>(?i:a[ -]?levels?|a2s?))|"
+    r"(?P<btec>(?i:btecs?)))\b"
+)
+_qualification_tokens = {"as": "{AS-level}", "a": "{A-level}", "btec": "{BTEC}"}
+# BTEC sizes score differently; "BTEC" alone is an Extended Certificate
+_btec_size_re = re.compile(
+    r"\b(?:national|certificate|diploma|extended|foundation|subsidiary|award)\b",
+    re.IGNORECASE,
+)
+_token_re = re.compile(r"\{[^}]+\}|[\w*']+|,")
+_grades_re = {
+    "A-level": re.compile(r"(?:A\*|[A-E])+"),
+    "AS-level": re.compile(r"(?:A\*|[A-E])+"),
+    "BTEC": re.compile(r"(?:D\*|[DMP])+"),
+}
+_subject_word_re = re.compile(r"[A-Z][a-z]+")
+# Everything else a grade-only question may say; any other word means the
+# question is about more than the grades and goes to the model
+FILLER_WORDS = frozenset("""
+    a about all altogether an and are as at be calculate can combined could did
+    do does for get give got grade grades have how i i'm if in is it many me
+    much my of on or overall plus point points score scores so tariff tell the
+    them these this total ucas want what what's whats with work worth would you
+""".split())
+
+
+def topic_score(text):
+    """(admissions terms, off-topic terms) found in the text"""
+    lowered = text.lower()
+    return len(_on_topic_re.findall(lowered)), len(_off_topic_re.findall(lowered))
+
+
+def is_off_topic(text):
+    on_topic, off_topic = topic_score(text)
+    return off_topic > 0 and on_topic == 0
+
+
+def arithmetic_answer(question):
+    """Answer a bare arithmetic question, or None"""
+    match = _arithmetic_re.match(question.strip())
+    if not match:
+        return None
+    expression = match.group("expression").strip()
+    normalised = re.sub(r"[x×]", "*", expression.replace("÷", "/"))
+    result = safe_calculate(normalised)
+    if isinstance(result, str):
+        return None
+    if float(result).is_integer():
+        result = int(result)
+    return f"{expression} = {result}"
+
+
+@lru_cache(maxsize=None)
+def _load_tables(path):
+    return TariffTables.load(path)
+
+
+def _grade_groups(question):
+    """(qualification, [[(subject, grades)]]) for a grade-only question, or None.
+
+    Grades separated only by subjects and commas form one group; any word
+    between them starts another.
+    """
+    text = _qualification_name_re.sub(
+        lambda match: f" {_qualification_tokens[match.lastgroup]} ", question
+    )
+    tokens = _token_re.findall(text)
+    named = {token[1:-1] for token in tokens if token.startswith("{")}
+    if len(named) > 1:
+        return None
+    qualification = named.pop() if named else "A-level"
+    grades_re = _grades_re[qualification]
+    groups, group, subject = [], [], []
+    for token in tokens:
+        if grades_re.fullmatch(token):
+            group.append((" ".join(subject), token))
+            subject = []
+        elif _subject_word_re.fullmatch(token) and token.lower() not in FILLER_WORDS:
+            subject.append(token)
+        elif subject:
+            # A subject with no grade after it
+            return None
+        elif token != ",":
+            if not token.startswith("{") and token.lower() not in FILLER_WORDS:
+                return None
+            if group:
+                groups.append(group)
+                group = []
+    if subject:
+        return None
+    if group:
+        groups.append(group)
+    return qualification, groups
+
+
+def ucas_answer(question):
+    """Answer a question that only asks for the tariff of some grades, or None"""
+    if not _points_question_re.search(question) or _advice_re.search(question):
+        return None
+    if _other_qualification_re.search(question):
+        return None
+    parsed = _grade_groups(question)
+    if parsed is None or not parsed[1]:
+        return None
+    qualification, groups = parsed
+    if qualification == "BTEC" and _btec_size_re.search(question):
+        return None
+    if qualification == "AS-level" and len(groups) > 1:
+        # "A*AB and AS B": only some of the grades are AS-levels
+        return None
+    pairs = [pair for group in groups for pair in group]
+    tables = _load_tables(os.getenv("TARIFF_TABLES_PATH", DEFAULT_TABLES_PATH))
+    items = "; ".join(f"{subject} {grades}".strip() for subject, grades in pairs)
+    total, rows, unrecognised = tables.score(f"{qualification} {items}")
+    if unrecognised or not rows:
+        return None
+    if any(subject for subject, _ in pairs):
+        breakdown = "\n".join(
+            f"- {subject}: {grade} = {points} points" if subject
+            else f"- {grade} = {points} points"
+            for subject, _, grade, points in rows
+        )
+        return f"Your {qualification} grades are worth {total} UCAS points:\n{breakdown}"
+    sums = " + ".join(str(row[3]) for row in rows)
+    name = rows[0][1] if qualification == "BTEC" else qualification
+    return (
+        f"{''.join(row[2] for row in rows)} at {name} is worth {total} UCAS points "
+        f"({sums} = {total})."
+    )
+
+
+def route(question):
+    """Return (path, answer); answer is None when the question needs the model"""
+    if is_off_topic(question):
+        return "refuse", REFUSAL
+    answer = arithmetic_answer(question)
+    if answer is not None:
+        return "arithmetic", answer
+    answer = ucas_answer(question)
+    if answer is not None:
+        return "ucas", answer
+    return "agent", None
@@ -0,0 +1,192 @@
+"""
+Persistent TTL/LRU cache for web search results.
+
+Entries live in a bounded in-memory LRU backed by a SQLite file, so repeat
+searches are served from memory and survive restarts. Each entry carries its
+own TTL; once it expires it is still served for a grace period while a
+background refresh fetches a fresh copy (stale-while-revalidate). Entries
+past that grace period are purged from the file when the cache is opened and
+every PURGE_EVERY writes, so it does not grow without bound.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = "search_cache.sqlite3"
+# Entry requirements and course pages change slowly, so a few hours is safe
+DEFAULT_TTL = 6 * 60 * 60
+# How long an expired entry may still be served while it is refreshed
+DEFAULT_STALE_TTL = 24 * 60 * 60
+# Writes between purges of entries past their stale window
+PURGE_EVERY = 500
+
+_whitespace_re = re.compile(r"\s+")
+
+
+def normalise_query(query):
+    """Normalise a search query so trivially different phrasings share an entry"""
+    query = query.strip().strip("\"'").strip()
+    query = _whitespace_re.sub(" ", query).lower()
+    return query.rstrip("?.! ")
+
+
+class SearchCache:
+    """Bounded LRU of search results in front of a SQLite store"""
+
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_entries=256,
+        ttl=DEFAULT_TTL,
+        stale_ttl=DEFAULT_STALE_TTL,
+        clock=time.time,
+        purge_every=PURGE_EVERY,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.purge_every = purge_every
+        self._writes = 0
+        # key -> (value, expires_at, stale_until)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.purge_expired()
+
+    def get_or_fetch(self, query, fetch):
+        """Return the cached result for query, calling fetch(query) on a miss"""
+        key = normalise_query(query)
+        now = self.clock()
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                value, expires_at, stale_until = entry
+                if now < expires_at:
+                    self.hits += 1
+                    return value
+                if now < stale_until:
+                    self.stale_hits += 1
+                    self._start_refresh(key, query, fetch)
+                    return value
+            self.misses += 1
+        value = fetch(query)
+        self.put(query, value)
+        return value
+
+    def get(self, query):
+        """Return a fresh cached result for query, or None"""
+        key = normalise_query(query)
+        with self._lock:
+            entry = self._lookup(key)
+        if entry is not None and self.clock() < entry[1]:
+            return entry[0]
+        return None
+
+    def put(self, query, value, ttl=None):
+        """Store a result, optionally with its own TTL in seconds"""
+        key = normalise_query(query)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self.clock() + ttl
+        stale_until = expires_at + self.stale_ttl
+        with self._lock:
+            self._remember(key, (value, expires_at, stale_until))
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, stale_until),
+            )
+            self._writes += 1
+            if self.purge_every and self._writes >= self.purge_every:
+                self._purge()
+            self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "refreshes": self.refreshes,
+                "memory_entries": len(self._memory),
+            }
+
+    def purge_expired(self):
+        """Delete entries that are past their stale window from disk"""
+        with self._lock:
+            self._purge()
+            self._db.commit()
+
+    def join_refreshes(self, timeout=None):
+        """Wait for in-flight background refreshes to finish"""
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    def close(self):
+        self.join_refreshes()
+        with self._lock:
+            self._db.close()
+
+    # Callers must hold self._lock for the helpers below
+
+    def _lookup(self, key):
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        row = self._db.execute(
+            "SELECT value, expires_at, stale_until FROM search_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1], row[2])
+        self._remember(key, entry)
+        return entry
+
+    def _purge(self):
+        self._writes = 0
+        self._db.execute("DELETE FROM search_cache WHERE stale_until <= ?", (self.clock(),))
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _start_refresh(self, key, query, fetch):
+        if key in self._refreshing:
+            return
+
+        def refresh():
+            try:
+                self.put(query, fetch(query))
+                with self._lock:
+                    self.refreshes += 1
+            except Exception:
+                pass  # Keep serving the stale copy; the next request retries
+            finally:
+                with self._lock:
+                    self._refreshing.pop(key, None)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        self._refreshing[key] = thread
+        thread.start()
@@ -0,0 +1,426 @@
+"""
+Local HTTP/WebSocket service hosting many advising sessions on one event loop.
+
+Each session owns its own AsyncAgent (and so its own messages list). Sessions
+that sit idle are written to disk and dropped from memory, then restored
+transparently on their next request.
+
+Endpoints:
+  POST   /sessions                 -> {"session_id": ...}
+  POST   /sessions/<id>/messages   {"question": ...} -> {"answer": ..., "reply": ...}
+  GET    /sessions/<id>            -> {"session_id": ..., "messages": <count>}
+  DELETE /sessions/<id>
+  GET    /sessions/<id>/ws         WebSocket; each text message is a question
+  GET    /health
+  GET    /metrics                  Prometheus text format (with --telemetry)
+
+Run with: python service.py --port 8000
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from functools import partial
+
+import main
+import telemetry
+from answer_cache import AnswerCache
+from async_agent import AsyncAgent, async_query, load_async_client
+
+DEFAULT_SESSION_DIR = "sessions"
+MAX_BODY_BYTES = 1024 * 1024
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+_session_id_re = re.compile(r"^[0-9a-f]{32}$")
+_route_re = re.compile(r"^/sessions/([^/]+)(/messages|/ws)?$")
+_reasons = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class Session:
+    def __init__(self, session_id, agent):
+        self.session_id = session_id
+        self.agent = agent
+        # One question at a time per session; other sessions are unaffected
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Open WebSockets hold this Session object, so it must stay in memory
+        self.sockets = 0
+
+
+class SessionManager:
+    """Keeps live sessions in memory and evicts idle ones to disk"""
+
+    def __init__(
+        self,
+        session_dir=DEFAULT_SESSION_DIR,
+        idle_timeout=600,
+        agent_factory=None,
+        # Off-topic and grade-only questions are answered without the model
+        query_fn=partial(async_query, route=True),
+        max_concurrent_queries=256,
+    ):
+        self.session_dir = session_dir
+        self.idle_timeout = idle_timeout
+        self.agent_factory = agent_factory or (lambda: AsyncAgent(main.prompt))
+        self.query_fn = query_fn
+        self.sessions = {}
+        # Bounds in-flight model calls across every session
+        self._query_slots = asyncio.Semaphore(max_concurrent_queries)
+        os.makedirs(session_dir, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    def create(self):
+        session_id = uuid.uuid4().hex
+        session = Session(session_id, self.agent_factory())
+        self.sessions[session_id] = session
+        return session
+
+    def get(self, session_id):
+        """Return a live session, restoring it from disk if it was evicted"""
+        if not _session_id_re.match(session_id):
+            return None
+        session = self.sessions.get(session_id)
+        if session is None:
+            path = self._path(session_id)
+            if not os.path.exists(path):
+                return None
+            agent = self.agent_factory()
+            agent.load_history(path)
+            session = Session(session_id, agent)
+            self.sessions[session_id] = session
+        session.last_used = time.monotonic()
+        return session
+
+    def delete(self, session_id):
+        if not _session_id_re.match(session_id):
+            return False
+        found = self.sessions.pop(session_id, None) is not None
+        path = self._path(session_id)
+        if os.path.exists(path):
+            os.remove(path)
+            found = True
+        return found
+
+    async def ask(self, session, question):
+        """Run one question through the session's agent"""
+        async with session.lock:
+            async with self._query_slots:
+                answer = await self.query_fn(question, session.agent, verbose=False)
+            session.last_used = time.monotonic()
+        messages = session.agent.messages
+        reply = messages[-1]["content"] if messages else None
+        return {"answer": answer, "reply": reply}
+
+    def evict_idle(self, now=None):
+        """Write idle sessions to disk and drop them from memory"""
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        for session_id, session in list(self.sessions.items()):
+            if (
+                session.lock.locked()
+                or session.sockets
+                or now - session.last_used < self.idle_timeout
+            ):
+                continue
+            session.agent.save_history(self._path(session_id))
+            del self.sessions[session_id]
+            evicted += 1
+        return evicted
+
+    def evict_all(self):
+        return self.evict_idle(now=float("inf"))
+
+    async def evict_loop(self, interval=30):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request; returns None when the peer closed"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _write_response(writer, status, payload=None, content_type="application/json"):
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+    else:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_reasons[status]}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def _read_frame(reader):
+    """Read one WebSocket frame; returns (opcode, payload, fin)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    if length > MAX_BODY_BYTES:
+        raise ValueError("frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload, bool(first & 0x80)
+
+
+class _CloseSocket(Exception):
+    """Ends a WebSocket with a close frame carrying this status code"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+async def _read_message(reader, writer):
+    """Read frames until a whole text message arrives and return its bytes.
+
+    Fragments are joined until the FIN frame, pings are answered in between,
+    and anything the service cannot take raises _CloseSocket: a close frame
+    (1000), a binary message (1003), a message over MAX_BODY_BYTES (1009) or
+    a broken fragment sequence (1002).
+    """
+    fragments, size = None, 0
+    while True:
+        try:
+            opcode, payload, fin = await _read_frame(reader)
+        except ValueError:
+            raise _CloseSocket(1009)
+        if opcode == 0x8:
+            raise _CloseSocket(1000)
+        if opcode == 0x9:
+            _write_frame(writer, payload, opcode=0xA)
+            await writer.drain()
+            continue
+        if opcode == 0xA:
+            continue
+        if opcode == 0x2:
+            raise _CloseSocket(1003)
+        if opcode == 0x1 and fragments is None:
+            fragments = []
+        elif opcode != 0x0 or fragments is None:
+            # A continuation with nothing to continue, a new message inside
+            # a fragmented one, or an unknown opcode
+            raise _CloseSocket(1002)
+        size += len(payload)
+        if size > MAX_BODY_BYTES:
+            raise _CloseSocket(1009)
+        fragments.append(payload)
+        if fin:
+            return b"".join(fragments)
+
+
+def _write_frame(writer, payload, opcode=0x1):
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 1 << 16:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+    writer.write(header + payload)
+
+
+async def _serve_websocket(manager, session, headers, writer, reader):
+    accept = base64.b64encode(
+        hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()).digest()
+    ).decode()
+    writer.write(
+        (
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode("latin-1")
+    )
+    await writer.drain()
+    session.sockets += 1
+    try:
+        while True:
+            try:
+                message = await _read_message(reader, writer)
+            except _CloseSocket as close:
+                _write_frame(writer, close.code.to_bytes(2, "big"), opcode=0x8)
+                await writer.drain()
+                return
+            # The socket is already upgraded, so errors go back as frames
+            try:
+                result = await manager.ask(session, message.decode("utf-8"))
+            except Exception as e:
+                result = {"error": str(e) or type(e).__name__}
+            _write_frame(writer, json.dumps(result).encode("utf-8"))
+            await writer.drain()
+    finally:
+        session.sockets -= 1
+        # The idle timeout starts when the last socket closes
+        session.last_used = time.monotonic()
+
+
+async def _dispatch(manager, method, path, headers, body, reader, writer):
+    """Route one request; returns False once the connection is taken over"""
+    if path == "/health" and method == "GET":
+        _write_response(writer, 200, {"active_sessions": len(manager.sessions)})
+        return True
+    if path == "/metrics" and method == "GET":
+        _write_response(
+            writer,
+            200,
+            telemetry.metrics.render_prometheus(),
+            content_type="text/plain; version=0.0.4",
+        )
+        return True
+    if path == "/sessions" and method == "POST":
+        session = manager.create()
+        _write_response(writer, 201, {"session_id": session.session_id})
+        return True
+    match = _route_re.match(path)
+    if not match:
+        _write_response(writer, 404, {"error": "not found"})
+        return True
+    session_id, suffix = match.groups()
+    if method == "DELETE" and suffix is None:
+        status = 204 if manager.delete(session_id) else 404
+        _write_response(writer, status)
+        return True
+    session = manager.get(session_id)
+    if session is None:
+        _write_response(writer, 404, {"error": "unknown session"})
+        return True
+    if suffix is None and method == "GET":
+        _write_response(
+            writer,
+            200,
+            {"session_id": session_id, "messages": len(session.agent.messages)},
+        )
+    elif suffix == "/messages" and method == "POST":
+        try:
+            question = json.loads(body or b"{}")["question"]
+        except (ValueError, KeyError, TypeError):
+            _write_response(writer, 400, {"error": "expected {\"question\": ...}"})
+            return True
+        _write_response(writer, 200, await manager.ask(session, question))
+    elif suffix == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+        await _serve_websocket(manager, session, headers, writer, reader)
+        return False
+    else:
+        _write_response(writer, 405, {"error": "method not allowed"})
+    return True
+
+
+async def handle_connection(manager, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except ValueError:
+                _write_response(writer, 413, {"error": "request too large"})
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            try:
+                keep_open = await _dispatch(
+                    manager, method, path, headers, body, reader, writer
+                )
+            except Exception as e:
+                _write_response(writer, 500, {"error": str(e)})
+                keep_open = True
+            await writer.drain()
+            if not keep_open or headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8000, manager=None, evict_interval=30):
+    manager = manager or SessionManager()
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(manager, r, w), host, port
+    )
+    evictor = asyncio.create_task(manager.evict_loop(evict_interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        evictor.cancel()
+        manager.evict_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--session-dir", default=DEFAULT_SESSION_DIR)
+    parser.add_argument("--idle-timeout", type=float, default=600)
+    parser.add_argument(
+        "--telemetry", action="store_true", help="Record spans and serve /metrics"
+    )
+    parser.add_argument(
+        "--answer-cache",
+        help="JSON file of past answers shared by all sessions; saved on exit",
+    )
+    args = parser.parse_args()
+
+    if args.telemetry:
+        telemetry.enable()
+
+    load_async_client()
+    answers = AnswerCache.load(args.answer_cache) if args.answer_cache else None
+
+    async def run():
+        manager = SessionManager(
+            args.session_dir,
+            idle_timeout=args.idle_timeout,
+            query_fn=partial(async_query, route=True, answer_cache=answers),
+        )
+        print(f"Serving advising sessions on http://{args.host}:{args.port}")
+        await serve(args.host, args.port, manager)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Goodbye!")
+    finally:
+        if answers is not None:
+            answers.save(args.answer_cache)
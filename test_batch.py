@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for batch advising (mock agents, no network)
+"""
+
+import json
+
+
+class MockAgent:
+    """Answers straight away, or fails on questions containing 'boom'"""
+
+    fail = True
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, message):
+        if "boom" in message and MockAgent.fail:
+            raise RuntimeError("model unavailable")
+        return f"Answer: advice for {message}"
+
+    def save_history(self, filename=None):
+        pass
+
+
+def write_questions(path, questions):
+    with open(path, "w") as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({"id": f"s{i}", "question": question}) + "\n")
+
+
+def read_records(path):
+    return [json.loads(line) for line in open(path)]
+
+
+def test_batch_writes_results_and_resumes(tmp_path):
+    """Completed ids are skipped on re-run; failed ones are retried"""
+    from batch import run_batch
+
+    print("\n=== TESTING BATCH ADVISING AND RESUME ===\n")
+
+    questions = [f"question {i}" for i in range(20)] + ["boom question"]
+    input_path = str(tmp_path / "in.jsonl")
+    output_path = str(tmp_path / "out.jsonl")
+    write_questions(input_path, questions)
+
+    MockAgent.fail = True
+    counts = run_batch(
+        input_path, output_path, MockAgent, workers=4, progress=lambda m: None
+    )
+    assert counts == {"skipped": 0, "answered": 20, "failed": 1}
+    records = read_records(output_path)
+    assert {r["id"] for r in records} == {f"s{i}" for i in range(21)}
+    assert all(r["answer"].startswith("advice for") for r in records if "error" not in r)
+
+    # Simulate a crash that tore the last line, then resume
+    with open(output_path, "a") as f:
+        f.write('{"id": "s3", "ans')
+    MockAgent.fail = False
+    counts = run_batch(
+        input_path, output_path, MockAgent, workers=4, progress=lambda m: None
+    )
+    assert counts == {"skipped": 20, "answered": 1, "failed": 0}
+    last = json.loads(open(output_path).read().splitlines()[-1])
+    assert last["id"] == "s20" and last["answer"] == "advice for boom question"
+
+
+def test_bad_lines_are_recorded_and_fallback_ids_are_distinct(tmp_path):
+    """A malformed line gets an error record without stopping the batch, and
+    lines without an id never collide with explicit ids"""
+    from batch import run_batch
+
+    input_path = tmp_path / "in.jsonl"
+    output_path = str(tmp_path / "out.jsonl")
+    input_path.write_text(
+        '{"id": 3, "question": "first"}\n'
+        '{"question": "second"}\n'
+        '{"question": "third"}\n'
+        '{"id": 5, "question": "fif\n'
+        '{"id": 6}\n'
+        '{"id": 7, "question": "last"}\n'
+    )
+    counts = run_batch(str(input_path), output_path, MockAgent, progress=lambda m: None)
+    assert counts == {"skipped": 0, "answered": 4, "failed": 2}
+    records = {r["id"]: r for r in read_records(output_path)}
+    assert records["3"]["answer"] == "advice for first"
+    assert records["line-3"]["answer"] == "advice for third"
+    assert records["line-4"]["error"].startswith("Invalid JSON on line 4")
+    assert records["6"]["error"] == "Line 5 has no question"
+    assert records["7"]["answer"] == "advice for last"
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark harness itself (the benchmarks run via `python bench.py`)
+"""
+
+
+def test_compare_flags_time_and_memory_regressions():
+    """Cases past the thresholds are reported; noise within them is not"""
+    from bench import compare
+
+    print("\n=== TESTING BENCHMARK REGRESSION GATE ===\n")
+
+    baseline = {
+        "fast[1]": {"relative": 1.0, "peak_bytes": 10000},
+        "lean[1]": {"relative": 1.0, "peak_bytes": 10000},
+        "steady[1]": {"relative": 1.0, "peak_bytes": 10000},
+    }
+    results = {
+        "fast[1]": {"relative": 2.0, "peak_bytes": 10000},
+        "lean[1]": {"relative": 1.0, "peak_bytes": 50000},
+        "steady[1]": {"relative": 1.2, "peak_bytes": 11000},
+        "new[1]": {"relative": 9.0, "peak_bytes": 99999},
+    }
+    regressions = compare(results, baseline, time_threshold=0.5, memory_threshold=0.25)
+    print(regressions)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("fast[1]: 2.00x slower")
+    assert regressions[1].startswith("lean[1]: peak memory up")
+
+
+def test_compare_enforces_absolute_budgets():
+    """A case over its budget fails even with no baseline to compare against"""
+    from bench import compare
+
+    results = {"startup[1]": {"relative": 1.0, "seconds": 0.8, "peak_bytes": 0}}
+    assert compare(results, {}, budgets={"startup[1]": 1.0}) == []
+    regressions = compare(results, {}, budgets={"startup[1]": 0.5})
+    assert regressions == ["startup[1]: 0.800s is over its 0.5s budget"]
+
+
+def test_every_benchmark_case_has_a_baseline():
+    """The committed baseline covers every registered case"""
+    from bench import BENCHMARKS, load_baseline
+
+    baseline = load_baseline()
+    for name, (_, sizes, _) in BENCHMARKS.items():
+        for size in sizes:
+            assert f"{name}[{size}]" in baseline, f"{name}[{size}] has no baseline"
+
+
+def test_benchmarks_run():
+    """Each benchmark's setup produces a callable that runs cleanly"""
+    from bench import BENCHMARKS, measure
+
+    for name, (setup, sizes, _) in BENCHMARKS.items():
+        seconds, peak = measure(setup(sizes[0]), number=1, repeat=1)
+        assert seconds > 0 and peak >= 0, name
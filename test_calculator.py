@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled arithmetic engine behind safe_calculate
+"""
+
+
+def test_precedence_unary_and_grouping_commas():
+    """Operator precedence, unary signs and digit-grouping commas all evaluate correctly"""
+    from calculator import safe_calculate
+
+    print("\n=== TESTING COMPILED CALCULATOR ===\n")
+
+    cases = [
+        ("1/3*3", 1.0),
+        ("10 - 4 - 3", 3.0),
+        ("-3 + 2", -1.0),
+        ("2 * -3", -6.0),
+        ("-(2 + 3) * 2", -10.0),
+        ("--4", 4.0),
+        ("+5 - +2", 3.0),
+        ("1,000 + 500", 1500.0),
+        ("1,234.5 * 2", 2469.0),
+        ("(56 + 48 + 48) / 3", 152 / 3),
+        (".5 + 1.", 1.5),
+    ]
+    for expression, expected in cases:
+        result = safe_calculate(expression)
+        print(f"  '{expression}' → {result}")
+        assert result == expected
+
+
+def test_invalid_and_dangerous_input_is_rejected():
+    """Anything that is not plain arithmetic returns an error string"""
+    from calculator import safe_calculate
+
+    for expression in [
+        "__import__('os')",
+        "2 ** 3",
+        "1,2",
+        "(1 + 2",
+        "1 + 2)",
+        "3 4",
+        "4 / (2 - 2)",
+        "",
+        "1 +",
+        "()",
+        "9" * 3000,
+    ]:
+        result = safe_calculate(expression)
+        assert isinstance(result, str) and result.startswith("Error calculating:"), expression
+
+
+def test_compiled_expressions_are_memoised():
+    """Whitespace variants share one compiled program"""
+    from calculator import compile_expression, evaluate_expression
+
+    compile_expression.cache_clear()
+    assert evaluate_expression("(48 + 40 + 32)") == 120.0
+    assert evaluate_expression("( 48+40+32 )") == 120.0
+    info = compile_expression.cache_info()
+    assert info.misses == 1 and info.hits == 1
+
+
+def test_deeply_nested_expressions():
+    """Deep nesting neither recurses nor rewrites the string"""
+    from calculator import evaluate_expression
+
+    depth = 400
+    expression = "(" * depth + "1" + "+1)" * depth
+    assert evaluate_expression(expression) == depth + 1
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the fast/strong model cascade (fake client, no network)
+"""
+
+FAST = "google/gemma-3n-e4b-it:free"
+STRONG = "anthropic/claude-sonnet-4"
+
+
+def test_action_turns_stay_fast_and_answers_escalate(openrouter):
+    """Thought/Action turns use the fast model; the final answer is rewritten by the strong one"""
+    import main
+    from cascade import ModelCascade
+
+    print("\n=== TESTING MODEL CASCADE ===\n")
+
+    completion = openrouter.completion
+    openrouter.serve({
+        FAST: [
+            completion("Thought: add up\nAction: calculate: 48 + 40 + 32\nPAUSE", prompt_tokens=100, completion_tokens=20),
+            completion("Thought: done\nAnswer: 120 points.", prompt_tokens=100, completion_tokens=8),
+        ],
+        STRONG: [completion("Answer: You have 120 UCAS points; consider ABB courses.", prompt_tokens=150, completion_tokens=60)],
+    })
+    cascade = ModelCascade(FAST, STRONG, fast_max_tokens=256)
+    agent = main.Agent("system prompt", cascade=cascade)
+    agent.save_history = lambda filename="history.json": None
+
+    answer = main.query("Points for ABC?", agent, max_turns=3, verbose=False)
+
+    requests = openrouter.requests
+    assert answer == "You have 120 UCAS points; consider ABB courses."
+    assert [r["model"] for r in requests] == [FAST, FAST, STRONG]
+    assert [r.get("max_tokens") for r in requests] == [256, 256, None]
+    # gemma gets the system prompt merged into the first user message...
+    assert requests[0]["messages"][0]["role"] == "user"
+    assert requests[0]["messages"][0]["content"].startswith("SYSTEM: system prompt")
+    # ...while the strong model keeps it as a cache-marked system message
+    assert requests[2]["messages"][0]["role"] == "system"
+    assert requests[2]["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    # The dropped fast answer never enters the conversation
+    assert "120 points." not in [m["content"] for m in agent.messages]
+    stats = cascade.stats()
+    assert stats["escalations"] == {"answer": 1}
+    assert stats["routes"]["fast"]["calls"] == 2
+    assert stats["routes"]["fast"]["completion_tokens"] == 28
+    assert stats["routes"]["strong"]["calls"] == 1
+    assert stats["routes"]["strong"]["prompt_tokens"] == 150
+
+
+def test_invalid_fast_replies_escalate():
+    """Replies with an unknown action, or neither action nor answer, go to the strong model"""
+    from main import escalation_reason
+
+    assert escalation_reason("Thought: x\nAction: search: CS ABB\nPAUSE") is None
+    assert escalation_reason("Thought: x\nAction: teleport: Oxford\nPAUSE") == "invalid"
+    assert escalation_reason("I think you should apply to Leeds.") == "invalid"
+    assert escalation_reason("Thought: enough\nAnswer: Leeds.") == "answer"
+    assert escalation_reason({"content": "Leeds fits.", "tool_calls": []}) == "answer"
+    call = {"id": "c1", "type": "function", "function": {"name": "search", "arguments": "{}"}}
+    assert escalation_reason({"content": None, "tool_calls": [call]}) is None
+
+
+def test_streamed_fast_answer_is_cut_before_it_is_shown(openrouter):
+    """The fast stream stops at "Answer:" and the strong model streams the turn"""
+    import main
+    from cascade import ModelCascade
+
+    FakeStream = openrouter.FakeStream
+    fast_stream = FakeStream(["Thought: enough\nAns", "wer: Lee", "ds.", " More text"])
+    openrouter.serve({
+        FAST: [fast_stream],
+        STRONG: [FakeStream(["Thought: summarise\n", "Answer: Leeds and York fit."])],
+    })
+    cascade = ModelCascade(FAST, STRONG)
+    agent = main.Agent("system prompt", cascade=cascade)
+    shown = []
+
+    text = agent.stream("Where with AAB?", on_token=shown.append)
+
+    assert text == "Thought: summarise\nAnswer: Leeds and York fit."
+    assert "".join(shown) == "Thought: enough\nThought: summarise\nAnswer: Leeds and York fit."
+    # Generation stopped as soon as the answer line began
+    assert fast_stream.read == ["Thought: enough\nAns", "wer: Lee"]
+    assert [r["model"] for r in openrouter.requests] == [FAST, STRONG]
+    assert cascade.stats()["escalations"] == {"answer": 1}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the local course catalogue and the lookup action
+"""
+
+import datetime
+
+COURSES = [
+    {"university": "Alpha University", "course": "BSc Computer Science", "subject": "Computer Science",
+     "offer": "AAA", "url": "https://alpha.ac.uk/", "updated": "2026-06-01"},
+    {"university": "Beta University", "course": "BSc Computer Science", "subject": "Computer Science",
+     "offer": "BBB", "url": "https://beta.ac.uk/", "updated": "2026-06-01", "keywords": ["computing"]},
+    {"university": "Beta University", "course": "BSc Economics", "subject": "Economics",
+     "offer": "ABB", "url": "https://beta.ac.uk/", "updated": "2026-06-01"},
+    {"university": "Gamma University", "course": "BSc Economics", "subject": "Economics",
+     "tariff": 112, "offer": "112 points", "url": "https://gamma.ac.uk/", "updated": "2024-01-01"},
+]
+
+
+def test_lookup_intersects_keywords_and_tariff_range():
+    """Subject keywords and a points range narrow the catalogue together"""
+    from catalogue import CourseCatalogue
+
+    print("\n=== TESTING COURSE CATALOGUE LOOKUP ===\n")
+
+    catalogue = CourseCatalogue(COURSES, today=datetime.date(2026, 10, 1))
+    assert catalogue.courses[0]["tariff"] == 144
+    assert catalogue.in_tariff_range(120, 130) == {1, 2}
+
+    matches = catalogue.search("courses accepting ~120 points in Computer Science")
+    assert [c["university"] for c in matches] == ["Beta University"]
+    # Grades are converted to points; the closest tariff comes first
+    matches = catalogue.search("computing ABB")
+    assert [c["offer"] for c in matches] == ["BBB"]
+    matches = catalogue.search("Computer Science at Alpha")
+    assert [c["offer"] for c in matches] == ["AAA"]
+    print(catalogue.lookup("Computer Science 140"))
+    assert "Alpha University — BSc Computer Science: typical offer AAA (144 points)" in catalogue.lookup(
+        "Computer Science 140"
+    )
+
+
+def test_gaps_and_stale_records_return_none():
+    """Unknown subjects, empty intersections and stale records are gaps"""
+    from catalogue import CourseCatalogue
+
+    catalogue = CourseCatalogue(COURSES, today=datetime.date(2026, 10, 1))
+    assert catalogue.search("Physics 120") is None
+    assert catalogue.search("Computer Science 56") is None
+    assert catalogue.search("") is None
+    # Gamma's record is more than a year old
+    assert catalogue.search("Economics 112") is None
+    assert catalogue.search("Economics 128") is None
+    assert catalogue.search("Economics at Beta") is not None
+
+
+def test_lookup_action_falls_back_to_search(monkeypatch):
+    """The lookup action answers locally and only searches for gaps"""
+    import main
+    from catalogue import CourseCatalogue
+
+    searched = []
+    monkeypatch.setattr(
+        main, "course_catalogue", CourseCatalogue(COURSES, today=datetime.date(2026, 10, 1))
+    )
+    monkeypatch.setattr(main, "search_tavily", lambda q: searched.append(q) or {"results": []})
+
+    assert "Beta University" in main.lookup_courses("Computer Science 120")
+    assert searched == []
+    main.run_action("lookup", "Medicine AAA")
+    assert searched == ["Medicine AAA entry requirements"]
+
+
+def test_bundled_sample_is_labelled_indicative():
+    """The bundled sample has no check dates and never reads as checked"""
+    from catalogue import CourseCatalogue
+
+    catalogue = CourseCatalogue.load()
+    assert catalogue.indicative
+    assert all("updated" not in course for course in catalogue.courses)
+    observation = catalogue.lookup("Computer Science AAA")
+    print(observation)
+    assert "indicative offers, not checked" in observation
+    assert "checked 20" not in observation
+
+    undated = dict(COURSES[0])
+    del undated["updated"]
+    observation = CourseCatalogue([undated]).lookup("Computer Science")
+    assert observation.endswith("(indicative)")
+    checked = CourseCatalogue(COURSES, today=datetime.date(2026, 10, 1)).lookup("Computer Science at Alpha")
+    assert checked.endswith("(checked 2026-06-01)")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared connection pools and the background connection warmer
+"""
+
+import time
+
+
+def test_warmer_pings_only_while_idle():
+    """Connections are opened at start, then pinged only while the student is idle"""
+    from connections import Warmer
+
+    print("\n=== TESTING CONNECTION WARMER ===\n")
+
+    calls = []
+
+    def broken():
+        raise ConnectionError("down")
+
+    warmer = Warmer([lambda: calls.append(time.monotonic()), broken], interval=0.02)
+    warmer.busy()
+    warmer.start()
+    time.sleep(0.1)
+    # Only the start-up warm-up ran while busy; the broken target did not stop it
+    assert len(calls) == 1
+    assert warmer.pings == 1 and warmer.failures == 1
+    warmer.idle()
+    time.sleep(0.1)
+    warmer.stop()
+    assert len(calls) >= 3
+    assert warmer.failures == len(calls)
+
+
+def test_pools_have_connect_and_read_timeouts():
+    """Every provider request gets a short connect timeout and a longer read timeout"""
+    import connections
+
+    print("\n=== TESTING CONNECTION POOL SETTINGS ===\n")
+
+    timeout = connections.request_timeout(30)
+    assert (timeout.connect, timeout.read) == (connections.CONNECT_TIMEOUT, 30)
+    assert connections.request_timeout(None) is None
+    assert connections.split_timeout(20) == (connections.CONNECT_TIMEOUT, 20)
+    assert connections.split_timeout(2) == (2, 2)
+    assert connections.split_timeout((1, 4)) == (1, 4)
+
+    client = connections.openai_http_client()
+    try:
+        assert client.timeout.connect == connections.CONNECT_TIMEOUT
+        assert client.timeout.read == connections.READ_TIMEOUT
+    finally:
+        client.close()
+    session = connections.tavily_session()
+    adapter = session.get_adapter("https://api.tavily.com")
+    assert adapter._pool_maxsize == connections.MAX_KEEPALIVE_CONNECTIONS
+    session.close()
+
+
+def test_prewarm_connections_reach_both_providers(monkeypatch):
+    """prewarm_connections() pings the configured OpenRouter and Tavily hosts"""
+    import loadtest
+    import main
+
+    for name in ("OPENROUTER_API_KEY", "TAVILY_API_KEY", "OPENROUTER_BASE_URL", "TAVILY_BASE_URL"):
+        monkeypatch.setenv(name, "unset")
+    for name in ("client", "tavily_client", "search_cache", "http_client", "search_session"):
+        monkeypatch.setattr(main, name, None)
+    monkeypatch.setattr(main, "SearchCache", lambda path: None)
+
+    with loadtest.OpenRouterStandIn() as llm, loadtest.TavilyStandIn() as search:
+        loadtest.connect(llm.url, search.url)
+        warmer = main.prewarm_connections()
+        deadline = time.monotonic() + 5
+        while warmer.pings + warmer.failures < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        warmer.stop()
+        main.http_client.close()
+        main.search_session.close()
+    assert (warmer.pings, warmer.failures) == (2, 0)
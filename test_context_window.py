@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted context window
+"""
+
+
+def make_conversation(turns):
+    messages = [{"role": "system", "content": "You are an advisor."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}. " + "detail " * 50})
+        messages.append({"role": "assistant", "content": f"Answer {i}. " + "words " * 50})
+    return messages
+
+
+def test_short_conversations_are_sent_unchanged():
+    """Below the budget the request is the message list itself"""
+    from context_window import ContextWindow
+
+    messages = make_conversation(2)
+    assert ContextWindow(budget=10000).build(messages) is messages
+
+
+def test_budget_keeps_system_prompt_and_latest_turns():
+    """Long conversations are folded so the request stays within budget"""
+    from context_window import ContextWindow, SUMMARY_HEADER
+
+    print("\n=== TESTING CONTEXT WINDOW BUDGET ===\n")
+
+    window = ContextWindow(budget=1200, keep_recent=4, fold_size=4, summary_budget=300)
+    sizes = []
+    for turns in (10, 40, 160):
+        messages = make_conversation(turns)
+        request = window.build(messages)
+        sizes.append(window.last_request_tokens)
+        # The summary is part of the system message, not a user turn
+        assert request[0]["role"] == "system"
+        assert request[0]["content"].startswith(messages[0]["content"] + "\n\n" + SUMMARY_HEADER)
+        assert request[1]["role"] == "user"
+        assert all(a["role"] != b["role"] for a, b in zip(request[1:], request[2:]))
+        assert request[-4:] == messages[-4:]
+        assert window.last_request_tokens <= 1200
+    print(f"  request tokens for 10/40/160 turns: {sizes}")
+    # The newest folded turns are the ones that survive in the summary
+    assert "Question 155" in window.build(make_conversation(160))[0]["content"]
+
+
+def test_block_summaries_are_cached():
+    """Each folded block is summarised only once across turns"""
+    from context_window import ContextWindow, summarise_locally
+
+    calls = []
+
+    def summariser(block):
+        calls.append(len(block))
+        return summarise_locally(block)
+
+    window = ContextWindow(budget=800, keep_recent=2, fold_size=2, summariser=summariser)
+    messages = make_conversation(20)
+    window.build(messages)
+    first = len(calls)
+    messages.append({"role": "user", "content": "one more"})
+    messages.append({"role": "assistant", "content": "Answer: sure"})
+    window.build(messages)
+    # Only the newly folded block(s) needed summarising
+    assert len(calls) - first <= 2
+
+
+def test_agent_requests_use_the_context_window():
+    """Agent.request_messages trims the request but not Agent.messages"""
+    from main import Agent
+    from context_window import ContextWindow
+
+    agent = Agent("system", model="test-model", context=ContextWindow(budget=500, keep_recent=2))
+    agent.messages.extend(make_conversation(20)[1:])
+    request = agent.request_messages()
+    assert len(request) < len(agent.messages)
+    assert len(agent.messages) == 41
+
+
+def test_kept_turns_start_with_a_user_message():
+    """A fold boundary on an assistant reply moves back to its question"""
+    from context_window import ContextWindow
+
+    window = ContextWindow(budget=600, keep_recent=3, fold_size=1, summary_budget=100)
+    messages = make_conversation(12)
+    request = window.build(messages)
+    assert window.folded_messages % 2 == 0
+    assert [m["role"] for m in request[:2]] == ["system", "user"]
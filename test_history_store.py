@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the append-only journaled conversation history
+"""
+
+
+def test_agent_appends_only_new_messages(tmp_path):
+    """Each save appends the new messages instead of rewriting the file"""
+    from main import Agent
+    from history_store import HistoryJournal
+
+    print("\n=== TESTING JOURNALED HISTORY APPENDS ===\n")
+
+    journal = HistoryJournal("student-1", directory=str(tmp_path))
+    agent = Agent("system prompt", history=journal)
+    agent.messages.append({"role": "user", "content": "hello"})
+    agent.save_history()
+    agent.messages.append({"role": "assistant", "content": "Answer: hi"})
+    agent.save_history()
+    journal.flush()
+
+    lines = open(journal.path).read().splitlines()
+    assert len(lines) == 3
+
+    resumed = Agent("system prompt", history=HistoryJournal("student-1", str(tmp_path)))
+    resumed.load_history()
+    assert resumed.messages == agent.messages
+
+
+def test_sessions_use_separate_files(tmp_path):
+    """Different session ids never share a journal file"""
+    from history_store import HistoryJournal
+
+    first = HistoryJournal("a", str(tmp_path))
+    second = HistoryJournal("b", str(tmp_path))
+    first.record([{"role": "user", "content": "one"}], 0)
+    second.record([{"role": "user", "content": "two"}], 0)
+    first.flush()
+    assert first.load() == [{"role": "user", "content": "one"}]
+    assert second.load() == [{"role": "user", "content": "two"}]
+
+
+def test_tail_load_keeps_system_prompt(tmp_path):
+    """A tail-only load reads the last messages and keeps the system prompt in front"""
+    import history_store
+    from main import Agent
+    from history_store import HistoryJournal
+
+    history_store._TAIL_BLOCK_SIZE = 64
+    try:
+        journal = HistoryJournal("long", str(tmp_path))
+        agent = Agent("system prompt", history=journal)
+        for i in range(200):
+            agent.messages.append({"role": "user", "content": f"message {i}"})
+        agent.save_history()
+        journal.flush()
+
+        resumed = Agent("system prompt", history=journal)
+        resumed.load_history(tail=3)
+        assert [m["content"] for m in resumed.messages] == [
+            "system prompt", "message 197", "message 198", "message 199"
+        ]
+        # A full load replaces the stored system prompt with the agent's own
+        tools = Agent("system prompt", history=journal, use_tools=True)
+        tools.load_history()
+        assert tools.messages[0]["content"] == tools.system != "system prompt"
+        assert len(tools.messages) == 201
+    finally:
+        history_store._TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def test_tail_load_starts_at_a_user_turn(tmp_path):
+    """A tail that lands on a tool result or an assistant reply starts at the next user turn"""
+    from main import Agent
+    from history_store import HistoryJournal
+
+    journal = HistoryJournal("tools", str(tmp_path))
+    turn = [
+        {"role": "user", "content": "question"},
+        {"role": "assistant", "content": None, "tool_calls": []},
+        {"role": "tool", "tool_call_id": "1", "content": "observation"},
+        {"role": "assistant", "content": "Answer: done"},
+    ]
+    journal.record([{"role": "system", "content": "system prompt"}] + turn * 3, 0)
+    journal.flush()
+
+    for tail in (2, 3, 6):
+        resumed = Agent("system prompt", history=journal)
+        resumed.load_history(tail=tail)
+        roles = [m["role"] for m in resumed.messages]
+        assert roles[:2] in (["system", "user"], ["system"]), (tail, roles)
+    resumed.load_history(tail=6)
+    assert [m["role"] for m in resumed.messages] == ["system", "user", "assistant", "tool", "assistant"]
+    # A tail reaching the start of the file keeps the stored conversation whole
+    assert journal.load(tail=13)[0]["role"] == "system"
+
+
+def test_reset_compaction_and_torn_lines(tmp_path):
+    """Replaced conversations are compacted away and a torn final line is skipped"""
+    from history_store import HistoryJournal
+
+    journal = HistoryJournal("s", str(tmp_path), compact_every=1000)
+    old = [{"role": "user", "content": f"old {i}"} for i in range(10)]
+    new = [{"role": "user", "content": "new"}]
+    count = journal.record(old, 0)
+    count = journal.record(new, count)
+    journal.flush()
+    assert journal.load() == new
+    assert journal.load(tail=5) == new
+
+    journal.compact()
+    journal.flush()
+    assert open(journal.path).read().splitlines() == ['{"role": "user", "content": "new"}']
+
+    # Simulate a crash mid-write, then keep appending
+    with open(journal.path, "a") as f:
+        f.write('{"role": "user", "con')
+    reopened = HistoryJournal("s", str(tmp_path))
+    reopened.record(new + [{"role": "assistant", "content": "after"}], 1)
+    reopened.flush()
+    assert reopened.load() == new + [{"role": "assistant", "content": "after"}]
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the completion cache's record and replay modes (fake client, no network)
+"""
+
+import pytest
+
+
+def test_record_then_replay_offline(tmp_path, monkeypatch, openrouter):
+    """A recorded run replays with no client at all and gives the same answer"""
+    import main
+    from llm_cache import CompletionCache
+
+    print("\n=== TESTING COMPLETION CACHE RECORD/REPLAY ===\n")
+
+    def run(cache):
+        agent = main.Agent("system", model="google/gemma-test", completion_cache=cache)
+        agent.save_history = lambda filename="history.json": None
+        answer = main.query("What is 48 + 40?", agent, max_turns=3, verbose=False)
+        return answer, agent
+
+    openrouter.serve(["Action: calculate: 48 + 40\nPAUSE", "Answer: 88 points."])
+    recorded = CompletionCache(str(tmp_path), mode="record")
+    answer, agent = run(recorded)
+    assert answer == "88 points."
+    assert len(openrouter.requests) == 2
+    # Merging the system prompt for gemma must not rewrite the history
+    assert agent.messages[1]["content"] == "What is 48 + 40?"
+
+    # Recording again serves every turn from disk
+    assert run(CompletionCache(str(tmp_path), mode="record"))[0] == answer
+    assert len(openrouter.requests) == 2
+
+    monkeypatch.setattr(main, "client", None)
+    replay = CompletionCache(str(tmp_path), mode="replay")
+    assert run(replay)[0] == answer
+    assert replay.stats() == {"hits": 2, "misses": 0, "mode": "replay"}
+
+
+def test_replay_miss_raises(tmp_path):
+    """Replay never falls through to the network"""
+    from llm_cache import CacheMiss, CompletionCache, completion_key
+
+    cache = CompletionCache(str(tmp_path), mode="replay")
+    messages = [{"role": "user", "content": "Hello"}]
+    with pytest.raises(CacheMiss):
+        cache.lookup("model", 0.2, messages)
+    assert completion_key("model", 0.2, messages) != completion_key("model", 0.3, messages)
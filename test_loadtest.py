@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the load-test stand-ins and driver (real clients over local HTTP)
+"""
+
+
+def test_load_run_through_stand_ins(monkeypatch):
+    """Concurrent students run the real Agent and search path against the stand-ins"""
+    import loadtest
+    import main
+    import resilience
+    import telemetry
+
+    print("\n=== TESTING LOAD-TEST HARNESS ===\n")
+
+    for name in ("OPENROUTER_API_KEY", "TAVILY_API_KEY", "OPENROUTER_BASE_URL", "TAVILY_BASE_URL"):
+        monkeypatch.setenv(name, "unset")
+    for name in ("client", "tavily_client", "search_cache"):
+        monkeypatch.setattr(main, name, None)
+    monkeypatch.setattr(resilience.openrouter, "limiter", None)
+    monkeypatch.setattr(resilience.tavily, "limiter", None)
+    monkeypatch.setattr(telemetry, "enabled", False)
+    monkeypatch.setattr(main, "SearchCache", lambda path: None)
+
+    llm = loadtest.OpenRouterStandIn(seed=1)
+    # Every search fails with a non-retryable status; the agent carries on
+    search = loadtest.TavilyStandIn(error_rate=1.0, error_status=400, seed=2)
+    try:
+        with llm, search:
+            loadtest.connect(llm.url, search.url)
+            report = loadtest.run_load(3, questions_per_user=2)
+            streamed = loadtest.run_load(2, questions_per_user=1, stream=True)
+    finally:
+        telemetry.clear()
+    print(loadtest.HEADER)
+    print(loadtest.format_row(report))
+
+    assert report["answered"] == 6 and report["failed"] == 0
+    # One turn per scripted reply
+    assert report["turns"] == 6 * len(loadtest.DEFAULT_SCRIPT)
+    assert report["turn_p50"] <= report["turn_p95"] <= report["turn_p99"]
+    assert streamed["answered"] == 2
+    assert llm.requests == 8 * len(loadtest.DEFAULT_SCRIPT)
+    assert search.requests == search.errors == 8 * 2
+
+
+def test_latency_and_percentiles():
+    """Lognormal latency hits its median; percentiles use nearest rank"""
+    import random
+    from loadtest import Latency, percentile
+
+    rng = random.Random(0)
+    samples = [Latency(0.2, 1.0).sample(rng) for _ in range(2000)]
+    assert 0.17 < percentile(samples, 0.5) < 0.23
+    assert 0.8 < percentile(samples, 0.95) < 1.25
+    assert Latency().sample(rng) == 0.0
+    assert percentile([3, 1, 2, 4], 0.5) == 2
+    assert percentile([], 0.99) is None
@@ -129,6 +129,7 @@ def test_prompt_contract_and_content():
         "You operate in a strict ReAct loop",
         "Action: calculate:",
         "Action: search:",
+        "Action: lookup:",
         "Answer:",
         "UCAS tariff",
         "A* = 56",
@@ -201,3 +202,164 @@ def test_query_flow_with_mock_agent_search():
     finally:
         if original_search is not None:
             known_actions["search"] = original_search
+
+def test_query_flow_fans_out_multiple_actions(monkeypatch):
+    """Several actions in one turn run concurrently and come back as one numbered observation"""
+    import threading
+    import time
+    import main
+
+    print("\n=== TESTING MULTI-ACTION FAN-OUT ===\n")
+
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_search(q):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.2 if "Slow" not in q else 1.0)
+        with lock:
+            in_flight[0] -= 1
+        return f"results for {q}"
+
+    monkeypatch.setitem(main.known_actions, "search", slow_search)
+    monkeypatch.setattr(main, "ACTION_TIMEOUT", 0.5)
+    prompts = []
+
+    class MockAgent:
+        def __init__(self):
+            self._responses = [
+                "Thought: compare three universities\n"
+                "Action: search: Leeds CS entry requirements\n"
+                "Action: search: Bristol CS entry requirements\n"
+                "Action: search: Slow CS entry requirements\n"
+                "Action: calculate: 48 + 40 + 40\n"
+                "Action: teleport: Edinburgh\nPAUSE",
+                "Answer: Leeds and Bristol both fit.",
+            ]
+
+        def __call__(self, message):
+            prompts.append(message)
+            return self._responses[len(prompts) - 1]
+
+        def save_history(self, filename="history.json"):
+            pass
+
+    start = time.perf_counter()
+    answer = main.query("Compare CS at Leeds, Bristol and Slow", MockAgent(), max_turns=3)
+    elapsed = time.perf_counter() - start
+
+    assert answer == "Leeds and Bristol both fit."
+    assert peak[0] == 3
+    assert elapsed < 0.9
+    observation = prompts[1]
+    assert observation.startswith("Observation: [1] search: Leeds")
+    order = [observation.index(f"[{i}]") for i in range(1, 6)]
+    assert order == sorted(order)
+    assert "results for Bristol CS entry requirements" in observation
+    assert "[3] search: Slow CS entry requirements\nsearch timed out after 0.5s" in observation
+    assert "[4] calculate: 48 + 40 + 40\n128" in observation
+    assert "Unknown action teleport" in observation
+
+def test_query_flow_streaming_stops_at_pause(monkeypatch, openrouter):
+    """Stream a reply through a fake client: the action starts before the stream closes and generation stops at PAUSE"""
+    import main
+
+    print("\n=== TESTING STREAMING QUERY FLOW ===\n")
+
+    events = []
+    FakeStream = openrouter.FakeStream
+    openrouter.serve([
+        FakeStream(
+            ["Thought: add up\nAc", "tion: calculate: (48 + 40", " + 32)\n", "PAUSE", "\nObservation: made up"],
+            events,
+        ),
+        FakeStream(["Answer: You have 120 UCAS points."], events),
+    ])
+    original_calculate = main.known_actions["calculate"]
+
+    def calculate(expression):
+        events.append("action")
+        return original_calculate(expression)
+
+    monkeypatch.setitem(main.known_actions, "calculate", calculate)
+    agent = main.Agent("system", model="test-model")
+    agent.save_history = lambda filename="history.json": None
+    main.query("How many points for ABC?", agent, max_turns=3, stream=True)
+
+    # The hallucinated observation after PAUSE is never generated or stored
+    assert "token:'\\nObservation: made up'" not in events
+    assert agent.messages[2]["content"].endswith("PAUSE")
+    assert agent.messages[3]["content"] == "Observation: 120.0"
+    # The action was dispatched mid-stream and not run a second time
+    assert events.count("action") == 1
+
+
+def test_streaming_dispatches_every_action_before_pause(openrouter):
+    """Each Action line of a streamed reply is dispatched as soon as it is complete"""
+    import main
+
+    openrouter.serve([openrouter.FakeStream([
+        "Thought: two searches\nAction: search: Leeds CS\n",
+        "Action: sea", "rch: Bristol CS\nPAUSE", "\nAction: search: made up",
+    ])])
+    dispatched = []
+    agent = main.Agent("system", model="test-model")
+    text = agent.stream("Compare", on_action=lambda *action: dispatched.append(action))
+
+    assert dispatched == [("search", "Leeds CS"), ("search", "Bristol CS")]
+    assert text.endswith("PAUSE")
+
+
+def test_import_main_skips_sdks():
+    """Importing main for its pure helpers does not load the SDKs or NumPy"""
+    import os
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, main; "
+        "print(sorted(m for m in ('openai', 'tavily', 'dotenv', 'numpy') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_request_assembly_is_incremental():
+    """The rewritten prefix is built once and later turns extend the same request"""
+    from main import Agent
+
+    print("\n=== TESTING INCREMENTAL REQUEST ASSEMBLY ===\n")
+
+    agent = Agent("system prompt", model="google/gemma-3n-e4b-it:free")
+    agent.messages.append({"role": "user", "content": "Hi"})
+    first = agent.request_messages()
+    assert first == [{"role": "user", "content": "SYSTEM: system prompt\n\nUSER: Hi"}]
+
+    for turn in range(3):
+        agent.messages.append({"role": "assistant", "content": f"Reply {turn}"})
+        agent.messages.append({"role": "user", "content": f"Question {turn}"})
+        request = agent.request_messages()
+        # Same list and head object: nothing is rebuilt or re-concatenated
+        assert request is first and request[0] is first[0]
+        assert request[1:] == agent.messages[2:]
+    assert agent.messages[1]["content"] == "Hi"
+    assert request[0]["content"].count("SYSTEM:") == 1
+
+    cached = Agent("system prompt", model="anthropic/claude-sonnet-4")
+    cached.messages.append({"role": "user", "content": "Hi"})
+    request = cached.request_messages()
+    assert request[0]["content"] == [
+        {"type": "text", "text": "system prompt", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert cached.messages[0]["content"] == "system prompt"
+    # Models without explicit cache breakpoints get the conversation as is
+    plain = Agent("system prompt", model="openai/gpt-4o-mini")
+    assert plain.request_messages() is plain.messages
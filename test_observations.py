@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for search observation compaction
+"""
+
+SAMPLE_RESPONSE = {
+    "query": "Computer Science entry requirements",
+    "results": [
+        {
+            "title": "Best CS degrees - Blog",
+            "url": "https://blog.example.com/cs",
+            "score": 0.9,
+            "content": "Our favourite picks. Computer Science entry requirements vary widely.",
+        },
+        {
+            "title": "BSc Computer Science | Example University",
+            "url": "https://www.example.ac.uk/courses/computer-science/",
+            "score": 0.6,
+            "content": (
+                "Welcome to our campus. The typical offer for Computer Science is AAB "
+                "including Maths. Our sports centre is open late. "
+                "Entry requirements: 136 UCAS tariff points."
+            ),
+        },
+        {
+            "title": "BSc Computer Science | Example University (duplicate)",
+            "url": "http://example.ac.uk/courses/computer-science",
+            "score": 0.5,
+            "content": "Duplicate page.",
+        },
+    ],
+}
+
+
+def test_compact_search_results():
+    """Results are de-duplicated, .ac.uk sources ranked first and trimmed to relevant sentences"""
+    from observations import compact_search_results
+
+    print("\n=== TESTING SEARCH OBSERVATION COMPACTION ===\n")
+
+    observation = compact_search_results(
+        '"Computer Science entry requirements site:*.ac.uk"', SAMPLE_RESPONSE
+    )
+    print(observation)
+    lines = observation.splitlines()
+    assert lines[0] == 'Search results for "Computer Science entry requirements site:*.ac.uk":'
+    assert lines[1].startswith("[1] BSc Computer Science | Example University —")
+    assert "duplicate" not in observation
+    assert "typical offer for Computer Science is AAB" in observation
+    assert "sports centre" not in observation
+    assert "'score'" not in observation
+
+
+def test_budget_limits_observation_size():
+    """Lower-ranked results are omitted once the token budget is spent"""
+    from context_window import count_tokens
+    from observations import compact_search_results
+
+    response = {
+        "results": [
+            {
+                "title": f"Result {i}",
+                "url": f"https://uni{i}.ac.uk/cs",
+                "content": "Computer Science requires AAA. " * 20,
+            }
+            for i in range(30)
+        ]
+    }
+    observation = compact_search_results("Computer Science", response, budget=200)
+    assert count_tokens(observation) <= 220
+    assert "lower-ranked results omitted" in observation
+
+
+def test_non_search_observations_pass_through():
+    """Actions without a formatter keep their plain text result"""
+    from observations import compact_observation
+
+    assert compact_observation("calculate", "(1 + 2)", 3.0) == "3.0"
+    assert compact_observation("search", "x", {"results": []}).endswith("No results found.")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative search prefetch (mock agent and search, no network)
+"""
+
+
+def test_predict_searches_from_question():
+    """Subject, grades and year come from cheap local parsing"""
+    from prefetch import predict_searches
+
+    print("\n=== TESTING SEARCH PREDICTION ===\n")
+
+    question = (
+        "I want to study Computer Science for 2026 entry. I have A-levels in "
+        "Maths (A), Physics (B), and English (C)."
+    )
+    print(predict_searches(question))
+    assert predict_searches(question) == [
+        "Computer Science degree entry requirements ABC 2026",
+        "Computer Science courses 120 UCAS points 2026",
+    ]
+    assert predict_searches("Is law a good choice with A*AB?")[0] == (
+        "Law degree entry requirements A*AB"
+    )
+    # The subject named before "courses" is the degree subject
+    assert predict_searches("I have Maths (A) and Physics (B), what engineering courses?") == [
+        "Engineering degree entry requirements AB",
+        "Engineering courses 88 UCAS points",
+    ]
+    # A-level subjects alone do not name a degree subject
+    assert predict_searches("I have Maths (A) and Physics (B). What next?") == []
+    assert predict_searches("How do I write a personal statement?") == []
+
+
+def test_query_serves_matching_search_from_prefetch(monkeypatch):
+    """The model's first search reuses the prefetched result"""
+    import main
+
+    searches = []
+
+    def search(query):
+        searches.append(query)
+        return {"results": [{"url": "https://www.ucas.com/cs", "title": "CS", "content": "ABC offers."}]}
+
+    class MockAgent:
+        def __init__(self):
+            self._responses = [
+                'Action: search: site:*.ac.uk "Computer Science" entry requirements ABC BBC\nPAUSE',
+                "Action: search: Computer Science tuition fees international students\nPAUSE",
+                "Answer: Apply widely.",
+            ]
+
+        def __call__(self, message):
+            return self._responses.pop(0)
+
+        def save_history(self, filename="history.json"):
+            pass
+
+    monkeypatch.setitem(main.known_actions, "search", search)
+    question = "I want to study Computer Science. I have Maths (A), Physics (B), English (C)."
+    answer = main.query(question, MockAgent(), prefetch=True, verbose=False)
+    assert answer == "Apply widely."
+    # Two prefetched searches, then only the unrelated fees search ran live
+    assert sorted(searches[:2]) == [
+        "Computer Science courses 120 UCAS points",
+        "Computer Science degree entry requirements ABC",
+    ]
+    assert searches[2:] == ["Computer Science tuition fees international students"]
+
+
+def test_streamed_query_claims_prefetched_search(monkeypatch, openrouter):
+    """A search dispatched mid-stream uses the prefetched result instead of a live call"""
+    import main
+
+    searches = []
+
+    def search(query):
+        searches.append(query)
+        return {"results": [{"url": "https://www.ucas.com/cs", "title": "CS", "content": "ABC offers."}]}
+
+    openrouter.serve([
+        openrouter.FakeStream("Action: search: Computer Science degree entry requirements ABC\nPAUSE"),
+        openrouter.FakeStream("Answer: Apply widely."),
+    ])
+    monkeypatch.setitem(main.known_actions, "search", search)
+    agent = main.Agent("system", model="test-model")
+    agent.save_history = lambda filename="history.json": None
+    question = "I want to study Computer Science. I have Maths (A), Physics (B), English (C)."
+    answer = main.query(question, agent, stream=True, prefetch=True, verbose=False)
+    assert answer == "Apply widely."
+    # Only the two prefetched searches ran; the streamed action claimed one
+    assert sorted(searches) == [
+        "Computer Science courses 120 UCAS points",
+        "Computer Science degree entry requirements ABC",
+    ]
+    assert "ABC offers." in agent.messages[3]["content"]
+
+
+def test_claim_is_symmetric_and_one_shot():
+    """Queries naming a university are not served the generic prefetch, and
+    a claimed search is only handed out once"""
+    from prefetch import SearchPrefetch
+
+    prefetched = SearchPrefetch(
+        "I want to study Computer Science. I have Maths (A), Physics (B), English (C).",
+        lambda query: query,
+    )
+    for university in ("University of Leeds", "Bristol", "Durham", "Imperial College London"):
+        query = f"Computer Science entry requirements ABC {university}"
+        assert prefetched.claim("search", query) is None, query
+    assert prefetched.claim("search", "computer science entry requirements abc at a uni") is None
+    assert prefetched.claim("search", "Computer Science") is None
+
+    query = "Computer Science degree entry requirements ABC"
+    assert prefetched.claim("search", query) == query
+    assert prefetched.claim("search", query) is None
+    assert prefetched.hits == 1
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the retry, backoff, rate limiting and hedging layer
+"""
+
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code, headers)
+
+
+def test_retries_honour_retry_after_and_fall_back():
+    """429s are retried after the server's Retry-After, rotating through fallback models"""
+    from resilience import CallPolicy
+
+    print("\n=== TESTING RETRIES AND FALLBACK MODELS ===\n")
+
+    sleeps = []
+    policy = CallPolicy("test", rate=None, sleep=sleeps.append)
+    calls = []
+
+    def make_call(model, timeout):
+        calls.append(model)
+        if len(calls) < 3:
+            raise FakeAPIError(429, {"retry-after": "7"})
+        return f"reply from {model}"
+
+    assert policy.call(make_call, variants=["small", "backup"]) == "reply from small"
+    assert calls == ["small", "backup", "small"]
+    assert all(delay >= 7 for delay in sleeps)
+    assert policy.counters["retries"] == 2
+
+
+def test_non_retryable_errors_fail_fast():
+    """A 400 is raised immediately without retries"""
+    from resilience import CallPolicy
+
+    policy = CallPolicy("test", rate=None, sleep=lambda s: None)
+    calls = []
+
+    def make_call(variant, timeout):
+        calls.append(variant)
+        raise FakeAPIError(400)
+
+    try:
+        policy.call(make_call)
+        assert False, "expected an error"
+    except FakeAPIError:
+        pass
+    assert len(calls) == 1 and policy.counters["failures"] == 1
+
+
+def test_deadline_bounds_total_time():
+    """Retries stop once the overall deadline would be passed"""
+    from resilience import CallPolicy
+
+    policy = CallPolicy(
+        "test", rate=None, max_retries=100, deadline=0.3, base_delay=0.05, max_delay=0.05
+    )
+
+    def make_call(variant, timeout):
+        raise TimeoutError("read timed out")
+
+    started = time.monotonic()
+    try:
+        policy.call(make_call)
+        assert False, "expected an error"
+    except TimeoutError:
+        pass
+    assert time.monotonic() - started < 1.0
+
+
+def test_hedged_request_beats_slow_primary():
+    """Once latency history exists, a slow attempt is hedged and the faster reply wins"""
+    from resilience import CallPolicy
+
+    policy = CallPolicy("test", rate=None, hedge_percentile=0.9)
+    for _ in range(50):
+        policy.latency.record(0.01)
+    release = threading.Event()
+
+    def make_call(model, timeout):
+        if model == "slow":
+            release.wait(2)
+            return "slow"
+        return "fast"
+
+    started = time.monotonic()
+    assert policy.call(make_call, variants=["slow", "fast"]) == "fast"
+    release.set()
+    assert time.monotonic() - started < 1.0
+    assert policy.counters["hedges"] == 1 and policy.counters["hedge_wins"] == 1
+
+
+def test_token_bucket_spaces_calls():
+    """The token bucket admits `rate` calls per second after the burst"""
+    from resilience import TokenBucket
+
+    bucket = TokenBucket(rate=100, burst=1)
+    started = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+    assert TokenBucket(rate=0.001, burst=1).acquire() is True
+    empty = TokenBucket(rate=0.001, burst=1)
+    empty.acquire()
+    assert empty.acquire(timeout=0.01) is False
+
+
+def test_async_calls_share_the_policy():
+    """call_async retries, rotates fallbacks and waits on the limiter without blocking the loop"""
+    import asyncio
+
+    from resilience import CallPolicy, is_retryable
+
+    sleeps = []
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+
+    policy = CallPolicy("test", rate=100, burst=1, async_sleep=record_sleep)
+    calls = []
+
+    async def make_call(model, timeout):
+        calls.append(model)
+        if len(calls) < 3:
+            raise FakeAPIError(429, {"retry-after": "7"})
+        return f"reply from {model}"
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        task = asyncio.create_task(ticker())
+        result = await policy.call_async(make_call, variants=["small", "backup"])
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == "reply from small"
+    assert calls == ["small", "backup", "small"]
+    assert all(delay >= 7 for delay in sleeps)
+    assert policy.counters["retries"] == 2
+    # Three calls through a 100/s bucket with no burst wait about 20 ms on the loop
+    assert ticks > 1
+
+    # Tavily raises its 429 as UsageLimitExceededError, with no status code
+    class UsageLimitExceededError(Exception):
+        pass
+
+    assert is_retryable(UsageLimitExceededError("rate limited"))
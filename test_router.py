@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-LLM router (no network)
+"""
+
+
+def test_route_paths():
+    """Off-topic, arithmetic and grade-only questions are answered locally"""
+    from main import prompt
+    from router import REFUSAL, route
+
+    print("\n=== TESTING PRE-LLM ROUTER ===\n")
+
+    assert REFUSAL in prompt
+    cases = [
+        ("Tell me a joke about football", "refuse"),
+        ("What's the weather like in Leeds?", "refuse"),
+        ("What is 48 + 40 + 32?", "arithmetic"),
+        ("what are my UCAS points for A*AB?", "ucas"),
+        ("How many UCAS points is Maths A, Physics B, English C?", "ucas"),
+        ("How many ucas points is a BTEC D*D*D?", "ucas"),
+        # Anything asking for advice, or ambiguous, goes to the model
+        ("What courses can I do with A*AB?", "agent"),
+        # Other letter-graded qualifications are not scored as A-levels
+        ("How many UCAS points for Higher AAB?", "agent"),
+        ("What are the UCAS points for Scottish Highers AAB", "agent"),
+        ("How many UCAS points is AAB at Pre-U?", "agent"),
+        # BTEC sizes, mixed A-level and AS grades and unknown words are not guessed
+        ("How many UCAS points is BTEC Foundation Diploma D", "agent"),
+        ("UCAS points for BTEC National Certificate D*", "agent"),
+        ("What are my UCAS points for A*AB and AS B", "agent"),
+        ("How many UCAS points is AAB plus a B at AS?", "agent"),
+        ("How many UCAS points is AAB and a distinction in piano?", "agent"),
+        ("What are my UCAS points for IB HL 766 and EPQ A?", "agent"),
+        ("Which universities would accept 120 UCAS points?", "agent"),
+        ("Is a film studies degree worth it?", "agent"),
+        ("Could a football scholarship help my university application?", "agent"),
+        ("How do I write a personal statement?", "agent"),
+    ]
+    for question, expected in cases:
+        path, answer = route(question)
+        print(f"  {question!r} -> {path}: {answer!r}")
+        assert path == expected, question
+        assert (answer is None) == (expected == "agent")
+
+    assert route("What is 48 + 40 + 32?")[1] == "48 + 40 + 32 = 120"
+    assert "144 UCAS points" in route("what are my UCAS points for A*AB?")[1]
+    assert "- Physics: B = 40 points" in route("How many UCAS points is Maths A, Physics B, English C?")[1]
+    answer = route("UCAS points for Maths A* Physics A Chemistry B?")[1]
+    assert "worth 144 UCAS points" in answer and "- Maths: A* = 56 points" in answer
+    assert "36 UCAS points" in route("How many UCAS points is AB at AS level?")[1]
+
+
+def test_query_answers_routed_questions_without_the_model():
+    """route=True keeps grade-only questions away from the agent but in its history"""
+    from main import query
+
+    class MockAgent:
+        def __init__(self):
+            self.messages = []
+            self.calls = 0
+
+        def __call__(self, message):
+            self.calls += 1
+            return "Answer: from the model"
+
+        def save_history(self, filename="history.json"):
+            pass
+
+    agent = MockAgent()
+    answer = query("What are my UCAS points for AAB?", agent, route=True, verbose=False)
+    assert answer == "AAB at A-level is worth 136 UCAS points (48 + 48 + 40 = 136)."
+    assert agent.calls == 0
+    assert agent.messages[-1] == {"role": "assistant", "content": f"Answer: {answer}"}
+
+    answer = query("Which courses suit AAB?", agent, route=True, verbose=False)
+    assert answer == "from the model" and agent.calls == 1
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent search result cache
+"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalise_query():
+    """Queries differing only in case, quotes and spacing share a key"""
+    from search_cache import normalise_query
+
+    print("\n=== TESTING QUERY NORMALISATION ===\n")
+
+    assert normalise_query('  "Computer  Science entry requirements 2026" ') == (
+        "computer science entry requirements 2026"
+    )
+    assert normalise_query("Computer Science entry requirements 2026?") == (
+        normalise_query("computer science   ENTRY requirements 2026")
+    )
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    """Repeat searches are served from the cache, including after a restart"""
+    from search_cache import SearchCache
+
+    print("\n=== TESTING SEARCH CACHE HITS AND PERSISTENCE ===\n")
+
+    calls = []
+
+    def fetch(query):
+        calls.append(query)
+        return {"query": query, "results": [{"url": "https://example.ac.uk"}]}
+
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SearchCache(path)
+    first = cache.get_or_fetch("CS entry requirements", fetch)
+    second = cache.get_or_fetch("cs entry  requirements", fetch)
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    cache.close()
+
+    restarted = SearchCache(path)
+    assert restarted.get_or_fetch("CS entry requirements", fetch) == first
+    assert len(calls) == 1
+    print(f"  stats after restart: {restarted.stats()}")
+    restarted.close()
+
+
+def test_lru_bound(tmp_path):
+    """The in-memory layer never holds more than max_entries"""
+    from search_cache import SearchCache
+
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for query in ["a", "b", "c"]:
+        cache.get_or_fetch(query, lambda q: {"q": q})
+    assert cache.stats()["memory_entries"] == 2
+    # Evicted entries are still found on disk
+    assert cache.get("a") == {"q": "a"}
+    cache.close()
+
+
+def test_stale_while_revalidate(tmp_path):
+    """Expired entries are served once more while a refresh runs in the background"""
+    from search_cache import SearchCache
+
+    clock = FakeClock()
+    cache = SearchCache(
+        str(tmp_path / "cache.sqlite3"), ttl=10, stale_ttl=100, clock=clock
+    )
+    versions = iter(["v1", "v2", "v3"])
+    fetch = lambda q: {"version": next(versions)}
+
+    assert cache.get_or_fetch("q", fetch) == {"version": "v1"}
+    clock.now += 20
+    assert cache.get_or_fetch("q", fetch) == {"version": "v1"}
+    cache.join_refreshes(timeout=5)
+    assert cache.get_or_fetch("q", fetch) == {"version": "v2"}
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["refreshes"] == 1
+
+    # Past the stale window the entry counts as a miss
+    clock.now += 500
+    assert cache.get_or_fetch("q", fetch) == {"version": "v3"}
+    cache.close()
+
+
+def test_expired_entries_are_purged_from_disk(tmp_path):
+    """Entries past their stale window leave the file on open and every few writes"""
+    import sqlite3
+    from search_cache import SearchCache
+
+    def rows(path):
+        with sqlite3.connect(path) as db:
+            return sorted(key for (key,) in db.execute("SELECT key FROM search_cache"))
+
+    clock = FakeClock()
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SearchCache(path, ttl=10, stale_ttl=10, clock=clock, purge_every=3)
+    cache.put("old", {"v": 1})
+    clock.now += 100
+    cache.put("a", {"v": 2})
+    assert rows(path) == ["a", "old"]
+    cache.put("b", {"v": 3})
+    assert rows(path) == ["a", "b"]
+    cache.close()
+
+    clock.now += 100
+    SearchCache(path, clock=clock).close()
+    assert rows(path) == []
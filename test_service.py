@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Tests for the async agent and the multi-session service (no network)
+"""
+
+import asyncio
+import json
+
+
+class MockAsyncAgent:
+    """Stands in for AsyncAgent; replies with a calculate action then an answer"""
+
+    def __init__(self):
+        from main import Agent
+
+        # Reuse the real history helpers on a plain Agent
+        self._agent = Agent("system")
+        self.messages = self._agent.messages
+
+    async def __call__(self, message):
+        self.messages.append({"role": "user", "content": message})
+        if message.startswith("Observation:"):
+            reply = f"Answer: total is {message.split(': ', 1)[1]}"
+        else:
+            reply = "Thought: add\nAction: calculate: (48 + 40 + 32)\nPAUSE"
+        self.messages.append({"role": "assistant", "content": reply})
+        return reply
+
+    def save_history(self, filename):
+        self._agent.messages = self.messages
+        self._agent.save_history(filename)
+
+    def load_history(self, filename):
+        self._agent.load_history(filename)
+        self.messages = self._agent.messages
+
+
+def test_async_query_with_mock_agent():
+    """async_query runs actions on a worker thread and returns the final answer"""
+    from async_agent import async_query
+
+    print("\n=== TESTING ASYNC QUERY WITH MOCK AGENT ===\n")
+
+    answer = asyncio.run(async_query("What are my points?", MockAsyncAgent()))
+    assert answer == "total is 120.0"
+
+
+def test_async_agent_calls_go_through_the_resilience_layer(monkeypatch, openrouter):
+    """AsyncAgent retries a 503 on the fallback model via the shared policy"""
+    import async_agent
+    import resilience
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(
+        resilience, "openrouter", resilience.CallPolicy("test", rate=None, async_sleep=no_sleep)
+    )
+    models = []
+
+    class Unavailable(Exception):
+        status_code = 503
+
+    async def create(**kwargs):
+        models.append(kwargs["model"])
+        if len(models) == 1:
+            raise Unavailable("busy")
+        return openrouter.completion("Answer: ok")
+
+    monkeypatch.setattr(async_agent, "async_client", openrouter.client(create))
+    agent = async_agent.AsyncAgent("system", model="main-model", fallback_models=["backup"])
+    assert asyncio.run(agent("hi")) == "Answer: ok"
+    assert models == ["main-model", "backup"]
+    assert resilience.openrouter.counters["retries"] == 1
+
+
+def test_async_agent_honours_cascade_and_tools(monkeypatch, openrouter):
+    """AsyncAgent routes through a cascade with max_tokens and calls tools natively"""
+    import async_agent
+    from async_agent import AsyncAgent, async_query
+    from cascade import ModelCascade
+    from test_tools import tool_call
+
+    async def create(**kwargs):
+        return openrouter.create(**kwargs)
+
+    monkeypatch.setattr(async_agent, "async_client", openrouter.client(create))
+    completion = openrouter.completion
+    openrouter.serve({
+        "fast": [
+            completion(tool_calls=[tool_call("c1", "calculate", expression="48 + 40 + 32")]),
+            "Answer: 120 points.",
+        ],
+        "strong": ["You have 120 UCAS points."],
+    })
+    cascade = ModelCascade("fast", "strong", fast_max_tokens=256)
+    agent = AsyncAgent("system", cascade=cascade, use_tools=True)
+    answer = asyncio.run(async_query("Points for ABC?", agent, verbose=False))
+
+    requests = openrouter.requests
+    assert answer == "You have 120 UCAS points."
+    assert [r["model"] for r in requests] == ["fast", "fast", "strong"]
+    assert [r.get("max_tokens") for r in requests] == [256, 256, None]
+    assert all("tools" in r for r in requests)
+    assert requests[1]["messages"][-1] == {"role": "tool", "tool_call_id": "c1", "content": "120.0"}
+    assert cascade.stats()["escalations"] == {"answer": 1}
+
+
+def test_async_query_runs_every_action(monkeypatch):
+    """Every Action line of a turn runs, and an unknown one is reported back"""
+    import main
+    from async_agent import async_query
+
+    monkeypatch.setitem(main.known_actions, "search", lambda query: f"results for {query}")
+    prompts = []
+    replies = iter([
+        "Action: search: Leeds CS\nAction: search: Bristol CS\n"
+        "Action: teleport: Leeds\nPAUSE",
+        "Answer: Both.",
+    ])
+
+    async def agent(message):
+        prompts.append(message)
+        return next(replies)
+
+    answer = asyncio.run(async_query("Compare Leeds and Bristol CS", agent, verbose=False))
+    assert answer == "Both."
+    observation = prompts[1]
+    assert "[1] search: Leeds CS\nresults for Leeds CS" in observation
+    assert "[2] search: Bristol CS\nresults for Bristol CS" in observation
+    assert "[3] teleport: Leeds\nUnknown action teleport" in observation
+
+
+def test_sessions_are_isolated_and_evicted(tmp_path):
+    """Each session keeps its own messages and survives eviction to disk"""
+    from service import SessionManager
+
+    print("\n=== TESTING SESSION ISOLATION AND EVICTION ===\n")
+
+    async def scenario():
+        manager = SessionManager(
+            str(tmp_path), idle_timeout=0, agent_factory=MockAsyncAgent
+        )
+        sessions = [manager.create() for _ in range(50)]
+        results = await asyncio.gather(
+            *(manager.ask(s, f"question {i}") for i, s in enumerate(sessions))
+        )
+        assert all(r["answer"] == "total is 120.0" for r in results)
+        assert all(len(s.agent.messages) == 5 for s in sessions)
+
+        assert manager.evict_idle() == 50
+        assert not manager.sessions
+        restored = manager.get(sessions[7].session_id)
+        assert restored.agent.messages[1]["content"] == "question 7"
+        assert manager.get("../etc/passwd") is None
+
+    asyncio.run(scenario())
+
+
+def test_http_and_websocket_endpoints(tmp_path):
+    """The HTTP and WebSocket endpoints drive a session end to end"""
+    from async_agent import async_query
+    from service import SessionManager, handle_connection, _read_frame
+
+    print("\n=== TESTING SERVICE ENDPOINTS ===\n")
+
+    async def failing_query(question, agent, verbose=False):
+        raise RuntimeError("429 rate limited")
+
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        raw = await reader.read()
+        writer.close()
+        head, _, data = raw.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(data) if data else None
+
+    async def scenario():
+        manager = SessionManager(str(tmp_path), agent_factory=MockAsyncAgent)
+        server = await asyncio.start_server(
+            lambda r, w: handle_connection(manager, r, w), "127.0.0.1", 0
+        )
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            status, created = await request(port, "POST", "/sessions")
+            assert status == 201
+            path = f"/sessions/{created['session_id']}"
+            status, result = await request(
+                port, "POST", f"{path}/messages", {"question": "points?"}
+            )
+            assert status == 200 and result["answer"] == "total is 120.0"
+            assert (await request(port, "GET", path))[1]["messages"] == 5
+            assert (await request(port, "GET", "/sessions/" + "0" * 32))[0] == 404
+
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(
+                f"GET {path}/ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+                "Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+                "\r\n".encode()
+            )
+            handshake = await reader.readuntil(b"\r\n\r\n")
+            assert b"s3pPLMBiTxaQ9kYGzzhZRbK+xOo=" in handshake
+            mask = b"\x01\x02\x03\x04"
+            text = b"again?"
+            masked = bytes(b ^ mask[i % 4] for i, b in enumerate(text))
+            writer.write(bytes([0x81, 0x80 | len(text)]) + mask + masked)
+            opcode, payload, _ = await _read_frame(reader)
+            assert opcode == 0x1
+            assert json.loads(payload)["answer"] == "total is 120.0"
+
+            # An open socket keeps its session in memory however idle it is
+            session = manager.sessions[created["session_id"]]
+            assert manager.evict_all() == 0
+            # A failing question comes back as a frame; the socket stays usable
+            manager.query_fn = failing_query
+            writer.write(bytes([0x81, 0x80 | len(text)]) + mask + masked)
+            opcode, payload, _ = await _read_frame(reader)
+            assert opcode == 0x1 and json.loads(payload) == {"error": "429 rate limited"}
+            manager.query_fn = async_query
+            writer.write(bytes([0x81, 0x80 | len(text)]) + mask + masked)
+            opcode, payload, _ = await _read_frame(reader)
+            assert json.loads(payload)["answer"] == "total is 120.0"
+            # A message fragmented across frames, with a ping in between
+            first, rest = masked[:3], bytes(b ^ mask[i % 4] for i, b in enumerate(text[3:]))
+            writer.write(bytes([0x01, 0x80 | 3]) + mask + first)
+            writer.write(bytes([0x89, 0x80]) + mask)
+            writer.write(bytes([0x80, 0x80 | len(rest)]) + mask + rest)
+            assert (await _read_frame(reader))[0] == 0xA
+            opcode, payload, _ = await _read_frame(reader)
+            assert json.loads(payload)["answer"] == "total is 120.0"
+            assert session.agent.messages[-4]["content"] == "again?"
+            writer.write(bytes([0x88, 0x80]) + mask)
+            assert (await _read_frame(reader))[0] == 0x8
+            writer.close()
+            await asyncio.sleep(0.05)
+            assert session.sockets == 0
+
+            # Binary messages are refused with 1003
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(
+                f"GET {path}/ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+                "Connection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+                "\r\n".encode()
+            )
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(bytes([0x82, 0x80 | len(text)]) + mask + masked)
+            opcode, payload, _ = await _read_frame(reader)
+            assert opcode == 0x8 and payload == (1003).to_bytes(2, "big")
+            writer.close()
+
+            assert (await request(port, "DELETE", path))[0] == 204
+
+    asyncio.run(scenario())
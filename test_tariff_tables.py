@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the local qualification tariff tables and the tariff action
+"""
+
+import json
+
+import pytest
+
+
+def test_tables_score_mixed_qualifications():
+    """IB, Scottish, BTEC, EPQ and Pre-U grades are scored from one index"""
+    from tariff_tables import TariffTables
+
+    print("\n=== TESTING TARIFF TABLES ===\n")
+
+    tables = TariffTables.load()
+    assert tables.points("IB HL", "7") == 56
+    assert tables.points("sl", "5") == 16
+    assert tables.points("Scottish Advanced Higher", "a") == 56
+    assert tables.points("BTEC Extended Diploma", "D*DD") == 152
+    assert tables.points("EPQ", "A*") == 28
+    assert tables.points("Pre-U", "D3") == 52
+    assert tables.points("IB HL", "2") is None
+    assert tables.points("Irish Leaving Certificate", "H1") is None
+
+    total, rows, unrecognised = tables.score("IB HL 7, 6, 6, SL 5, 5, 4, Extended Essay B, TOK A")
+    assert total == 56 + 48 + 48 + 16 + 16 + 12 + 10 + 10
+    assert [row[1] for row in rows][:4] == ["IB Higher Level"] * 3 + ["IB Standard Level"]
+    assert unrecognised == []
+
+    # "Advanced Higher" is not read as "Higher"; runs of grades are split
+    total, rows, _ = tables.score("Maths Advanced Higher A; Higher AAB")
+    assert total == 56 + 33 + 33 + 27
+    assert rows[0][:2] == ("Maths", "Scottish Advanced Higher")
+
+    # Subjects may follow the qualification name; unknown items are reported
+    total, rows, unrecognised = tables.score("BTEC Diploma DM and A-level Maths A, Irish H1")
+    assert total == 80 + 48
+    assert rows[1] == ("Maths", "A-level", "A", 48)
+    assert unrecognised == ["Irish H1"]
+
+
+def test_tariff_action_is_local(tmp_path, monkeypatch):
+    """The tariff action answers from the tables file without a search"""
+    import main
+
+    print("\n=== TESTING TARIFF ACTION ===\n")
+
+    path = tmp_path / "tables.json"
+    path.write_text(json.dumps({
+        "version": "test",
+        "qualifications": [
+            {"name": "Scottish Higher", "aliases": ["higher"], "grades": {"A": 33, "B": 27}},
+        ],
+    }))
+    monkeypatch.setenv("TARIFF_TABLES_PATH", str(path))
+    monkeypatch.setattr(main, "tariff_tables", None)
+    monkeypatch.setitem(main.known_actions, "search", lambda q: 1 / 0)
+
+    observation = main.known_actions["tariff"]("Higher AB")
+    print(observation)
+    assert observation.startswith("Total UCAS points: 60 (UCAS Tariff, tables vtest)")
+    assert "- Scottish Higher B = 27 points" in observation
+    assert "tariff" in main.local_actions
+    assert "No tariff entries recognised" in main.known_actions["tariff"]("IB HL 7")
+
+
+def test_cohort_tariffs_come_from_the_tables_file(tmp_path):
+    """tariffs.TARIFFS is built from the same file as the tariff action"""
+    from tariff_tables import TariffTables
+    from tariffs import TABLE_NAMES, TARIFFS, load_tariffs
+
+    tables = TariffTables.load()
+    for name, table in TABLE_NAMES.items():
+        assert TARIFFS[name] == tables.grades[table]
+
+    path = tmp_path / "tables.json"
+    revised = {**tables.grades, "A-level": {"A*": 60, "A": 50}}
+    path.write_text(json.dumps({
+        "qualifications": [{"name": n, "grades": g} for n, g in revised.items()],
+    }))
+    assert load_tariffs(str(path))["A-level"] == {"A*": 60, "A": 50}
+
+    # A file without one of the tables fails with a clear error
+    del revised["AS-level"]
+    path.write_text(json.dumps({
+        "qualifications": [{"name": n, "grades": g} for n, g in revised.items()],
+    }))
+    with pytest.raises(ValueError, match="no 'AS-level' table"):
+        load_tariffs(str(path))
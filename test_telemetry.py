@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for per-turn tracing and metrics (mock agent, no network)
+"""
+
+import json
+
+
+class MockAgent:
+    """Calculates once, then answers"""
+
+    def __init__(self):
+        self._responses = [
+            "Thought: compute points\nAction: calculate: (48 + 40 + 32)\nPAUSE",
+            "Answer: Your UCAS total is 120.",
+        ]
+
+    def __call__(self, message):
+        return self._responses.pop(0)
+
+    def save_history(self, filename="history.json"):
+        pass
+
+
+def test_disabled_telemetry_is_a_no_op():
+    """With telemetry off, spans are the shared no-op and nothing is recorded"""
+    import telemetry
+    from main import query
+
+    telemetry.clear()
+    assert telemetry.span("turn") is telemetry._NOOP_SPAN
+    query("What is my UCAS total?", MockAgent(), verbose=False)
+    assert telemetry.finished_spans() == []
+    assert telemetry.metrics.render_prometheus() == "\n"
+
+
+def test_query_records_nested_spans_and_metrics(tmp_path):
+    """A query produces query/turn/action spans and Prometheus histograms"""
+    import telemetry
+    from main import query
+
+    print("\n=== TESTING TELEMETRY SPANS AND METRICS ===\n")
+
+    telemetry.clear()
+    telemetry.enable(profile=True, memory=True)
+    try:
+        answer = query("What is my UCAS total?", MockAgent(), verbose=False)
+    finally:
+        telemetry.disable()
+    assert answer == "Your UCAS total is 120."
+
+    spans = telemetry.finished_spans()
+    names = [s["name"] for s in spans]
+    assert names == ["action", "turn", "turn", "query"]
+    action, first_turn, _, root = spans
+    assert action["parent_id"] == first_turn["span_id"]
+    assert first_turn["parent_id"] == root["span_id"]
+    assert len({s["trace_id"] for s in spans}) == 1
+    assert action["attributes"]["observation_chars"] == len("120.0")
+    assert "cumulative" in first_turn["attributes"]["profile"]
+    assert first_turn["attributes"]["peak_memory_bytes"] > 0
+
+    exposition = telemetry.metrics.render_prometheus()
+    print(exposition)
+    assert 'advisor_action_total{action="calculate"} 1' in exposition
+    assert 'advisor_turn_seconds_bucket{le="+Inf"} 2' in exposition
+    assert "advisor_observation_chars_count" in exposition
+
+    trace_path = tmp_path / "trace.json"
+    telemetry.export_json(str(trace_path))
+    assert [s["name"] for s in json.loads(trace_path.read_text())] == names
+    telemetry.clear()
+
+
+def test_pooled_actions_keep_queue_time(monkeypatch):
+    """Limiter waits on worker threads reach the action span; only early starts are marked"""
+    import main
+    import telemetry
+
+    def search(query):
+        # What resilience.tavily records while waiting on its rate limiter
+        telemetry.current_span().add("queue_seconds", 0.25)
+        return f"results for {query}"
+
+    monkeypatch.setitem(main.known_actions, "search", search)
+    telemetry.clear()
+    telemetry.enable()
+    try:
+        with telemetry.span("turn"):
+            started = {("search", "early"): main.start_action("search", "early")}
+            main.run_actions([("search", "early"), ("search", "a fresh one")], started)
+    finally:
+        telemetry.disable()
+
+    spans = telemetry.finished_spans()
+    actions = {s["attributes"]["observation_chars"]: s for s in spans if s["name"] == "action"}
+    early, fresh = actions[len("results for early")], actions[len("results for a fresh one")]
+    assert early["attributes"]["queue_seconds"] == fresh["attributes"]["queue_seconds"] == 0.25
+    assert early["attributes"]["started_early"] is True
+    assert "started_early" not in fresh["attributes"]
+    assert "queue_seconds" not in spans[-1]["attributes"]
+    telemetry.clear()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for native tool calling (fake client, no network)
+"""
+
+import json
+from types import SimpleNamespace
+
+
+def tool_call(call_id, name, **arguments):
+    function = SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    return SimpleNamespace(id=call_id, type="function", function=function)
+
+
+def test_tool_calls_are_dispatched_together(openrouter):
+    """Several structured calls in one turn run and report back by call id"""
+    import main
+
+    print("\n=== TESTING NATIVE TOOL CALLING ===\n")
+
+    completion = openrouter.completion
+    openrouter.serve([
+        completion(tool_calls=[
+            tool_call("c1", "calculate", expression="48 + 40 + 32"),
+            tool_call("c2", "lookup", query="Computer Science 120"),
+            tool_call("c3", "teleport", destination="Oxford"),
+        ]),
+        "Answer: 120 points; Kent and Brunel are realistic.",
+    ])
+    agent = main.Agent("system", model="openai/gpt-4o-mini", use_tools=True)
+    agent.save_history = lambda filename="history.json": None
+    answer = main.query("CS with ABC?", agent, max_turns=3, verbose=False)
+
+    requests = openrouter.requests
+    assert answer == "120 points; Kent and Brunel are realistic."
+    assert len(requests) == 2
+    assert [t["function"]["name"] for t in requests[0]["tools"]] == list(main.known_actions)
+    roles = [m["role"] for m in agent.messages]
+    assert roles == ["system", "user", "assistant", "tool", "tool", "tool", "assistant"]
+    results = {m["tool_call_id"]: m["content"] for m in agent.messages if m["role"] == "tool"}
+    assert results["c1"] == "120.0"
+    assert "Brunel University London" in results["c2"]
+    assert results["c3"].startswith("Unknown action teleport")
+    # The second request carries the tool results back to the model
+    assert requests[1]["messages"][-1]["role"] == "tool"
+
+
+def test_models_without_tools_fall_back_to_text(openrouter):
+    """A 404 for tool use switches the agent to Action lines for good"""
+    import main
+
+    class NoToolsError(Exception):
+        status_code = 404
+
+    openrouter.serve([
+        NoToolsError("No endpoints found that support tool use"),
+        "Action: calculate: 2 + 2\nPAUSE",
+        "Answer: 4",
+    ])
+    agent = main.Agent("system", model="google/gemma-3n-e4b-it:free", use_tools=True)
+    agent.save_history = lambda filename="history.json": None
+    answer = main.query("What is 2 + 2?", agent, max_turns=3, verbose=False)
+
+    assert answer == "4"
+    assert ["tools" in r for r in openrouter.requests] == [True, False, False]
+    assert agent.use_tools is False
+    assert agent.messages[-2]["content"] == "Observation: 4.0"
+    # The text protocol is no longer contradicted by the tool-mode note
+    assert agent.system == "system"
+    assert agent.messages[0] == {"role": "system", "content": "system"}